@@ -1,6 +1,7 @@
 import asyncio
 import json
 import logging
+import multiprocessing
 import os
 import sys
 import time
@@ -10,6 +11,9 @@ from pathlib import Path
 
 from platformdirs import user_data_dir
 
+from py_speech_service.file_recognition import FileRecognition
+from py_speech_service.grammar_benchmark import run_grammar_benchmark
+from py_speech_service.grammar_stats import GrammarStats
 from py_speech_service.grpc_server import GrpcServer
 from py_speech_service.speaker import Speaker, SpeechSettings
 from py_speech_service.speech_recognition import SpeechRecognition
@@ -17,6 +21,9 @@ from py_speech_service.version import Version
 
 
 def cli():
+    # Needed for the recognition worker process in frozen builds
+    multiprocessing.freeze_support()
+
     try:
 
         log_path = get_arg_value("-l")
@@ -53,11 +60,17 @@ def cli():
 
             grammar = ""
             model = ""
+            input_file = None
+            record_file = None
             for arg in arg_array:
                 if arg.startswith("-g="):
                     grammar = get_single_arg(arg, "-g")
                 elif arg.startswith("-m"):
                     model = get_single_arg(arg, "-m")
+                elif arg.startswith("-f="):
+                    input_file = get_single_arg(arg, "-f")
+                elif arg.startswith("-r="):
+                    record_file = get_single_arg(arg, "-r")
 
 
             if not grammar:
@@ -69,9 +82,80 @@ def cli():
             logging.info("model: " + model)
 
             speech_recognition = SpeechRecognition()
-            speech_recognition.set_speech_recognition_details(grammar, model)
+            speech_recognition.input_file = input_file
+            speech_recognition.set_speech_recognition_details(grammar, model, record_file=record_file)
             asyncio.run(speech_recognition.start_speech_recognition(None))
 
+        elif first_arg == "recognize-file" or second_arg == "recognize-file":
+            logging.info("Starting file recognition mode")
+
+            command_index = arg_array.index("recognize-file")
+            paths = [arg for arg in arg_array[command_index + 1:] if not arg.startswith("-")]
+            grammar = get_arg_value("-g")
+            if not grammar or len(paths) == 0:
+                print("A grammar file and at least one WAV file or directory are required")
+                return
+
+            required_confidence = get_arg_value("-c")
+            processes = get_arg_value("-p")
+            max_alternatives = get_arg_value("--max-alternatives")
+            endpoint_silence = get_arg_value("--endpoint-silence")
+            max_utterance_length = get_arg_value("--max-utterance-length")
+            results = FileRecognition.recognize_files(paths, grammar, get_arg_value("-m"),
+                                                      float(required_confidence) if required_confidence else 80,
+                                                      get_arg_flag("--vad"),
+                                                      int(processes) if processes else None,
+                                                      get_arg_flag("--phrase-grammar"),
+                                                      int(max_alternatives) if max_alternatives else 1,
+                                                      float(endpoint_silence) if endpoint_silence else 0,
+                                                      float(max_utterance_length) if max_utterance_length else 0,
+                                                      get_arg_flag("--grammar-endpoint"))
+
+            output_path = get_arg_value("-o")
+            if output_path:
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    json.dump(results, f, ensure_ascii=False, indent=4)
+            else:
+                print(json.dumps(results, indent=4))
+
+        elif first_arg == "benchmark-grammar" or second_arg == "benchmark-grammar":
+            logging.info("Starting grammar benchmark mode")
+
+            options = {}
+            for arg, option, value_type in [("--rules", "rule_count", int), ("--one-of", "one_of_count", int),
+                                            ("--one-of-size", "one_of_size", int), ("--optional", "optional_count", int),
+                                            ("--optional-size", "optional_size", int), ("--depth", "nesting_depth", int),
+                                            ("--branches", "nesting_branches", int),
+                                            ("--key-value-ratio", "key_value_ratio", float),
+                                            ("--key-value-size", "key_value_size", int),
+                                            ("--replacements", "replacement_count", int),
+                                            ("--utterances", "utterance_count", int), ("--noise", "noise", float),
+                                            ("--negatives", "negative_ratio", float), ("--seed", "seed", int),
+                                            ("--compile-workers", "compile_workers", int)]:
+                value = get_arg_value(arg)
+                if value:
+                    options[option] = value_type(value)
+
+            results = run_grammar_benchmark(options, get_arg_value("-g"), get_arg_value("--save-grammar"),
+                                            not get_arg_flag("--no-memory"))
+            print(json.dumps(results, indent=4))
+
+        elif first_arg == "grammar-stats" or second_arg == "grammar-stats":
+            logging.info("Starting grammar stats mode")
+
+            grammar = get_arg_value("-g")
+            if not grammar:
+                print("A grammar file is required")
+                return
+            with open(grammar, 'r') as fp:
+                grammar_json = json.load(fp)
+
+            samples = get_arg_value("--samples")
+            top = get_arg_value("--top")
+            grammar_stats = GrammarStats(samples_per_rule=int(samples) if samples else 10)
+            results = grammar_stats.analyze(grammar_json, int(top) if top else 10)
+            print(json.dumps(results, indent=4))
+
         elif first_arg == "test" or second_arg == "test":
 
             print("Starting Test")
@@ -90,7 +174,7 @@ def cli():
 
         elif first_arg == "service" or second_arg == "service":
             logging.info("Starting gRPC server mode")
-            server = GrpcServer()
+            server = GrpcServer(get_arg_flag("--preload"), get_arg_value("-m"))
             asyncio.run(server.start())
         else:
             logging.info("Printing documentation")
@@ -98,8 +182,22 @@ def cli():
             print("Usage: py-speech-service (speak/recognition/service)")
             print("  py-speech-service speak \"text to speech\"")
             print("  py-speech-service recognition -g \"path to grammar file\" -m \"path to VOSK model folder\"")
+            print("    -f: recognize speech from a WAV file instead of the microphone")
+            print("    -r: record the audio used for speech recognition to a WAV file")
+            print("  py-speech-service recognize-file -g \"path to grammar file\" -m \"path to VOSK model folder\" \"WAV files or folders\"")
+            print("    -c: required confidence, -p: number of processes, -o: path to write the JSON results to")
+            print("    --vad: only send audio louder than the background noise to VOSK")
+            print("    --phrase-grammar, --max-alternatives, --endpoint-silence, --max-utterance-length, --grammar-endpoint")
+            print("  py-speech-service benchmark-grammar --rules=100 --key-value-size=20 --replacements=50 --noise=0.1")
+            print("    -g: benchmark an existing grammar file instead of a generated one, --save-grammar: save the generated grammar")
+            print("    --no-memory: skip measuring memory, which slows down loading the grammar")
+            print("    --compile-workers: processes compiling large grammars, 1 to compile them serially to compare load times")
+            print("    --one-of, --one-of-size, --optional, --optional-size, --depth, --branches, --key-value-ratio, --utterances, --negatives, --seed")
+            print("  py-speech-service grammar-stats -g=\"path to grammar file\"")
+            print("    --samples: number of phrases to time per rule, --top: number of largest and slowest rules to list")
             print("  py-speech-service test")
             print("  py-speech-service service -g \"path to grammar file\" -m \"path to VOSK model folder\" -p \"preferred port\"")
+            print("    --preload: load the VOSK model in the background when the service starts")
 
     except Exception as e:
         logging.error(e)
@@ -0,0 +1,134 @@
+import itertools
+from collections import deque
+from typing import Iterable, Optional
+
+
+class AhoCorasickMatch:
+
+    def __init__(self, start: int, end: int, pattern: str):
+        self.start = start
+        self.end = end
+        self.pattern = pattern
+
+    start: int
+    end: int
+    pattern: str
+
+
+class AhoCorasick:
+
+    # Each node is a dict of character -> child node index. The fail and output arrays are indexed by node, where
+    # output holds the pattern ending at that node and dictionary_link points at the next node on the fail chain
+    # that also ends a pattern.
+    goto: list[dict[str, int]]
+    fail: list[int]
+    output: list[Optional[str]]
+    dictionary_link: list[int]
+
+    def __init__(self, patterns: Iterable[str]):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]
+        self.dictionary_link = [-1]
+
+        for pattern in patterns:
+            if pattern:
+                self.__add_pattern(pattern)
+
+        self.__build_links()
+
+    def __len__(self):
+        return sum(1 for pattern in self.output if pattern is not None)
+
+    def find_all(self, text: str) -> list[AhoCorasickMatch]:
+        # Returns leftmost-longest, non-overlapping matches that start and end on word boundaries
+        candidates: list[AhoCorasickMatch] = []
+        node = 0
+        for index, character in enumerate(text):
+            while node and character not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(character, 0)
+
+            match_node = node if self.output[node] is not None else self.dictionary_link[node]
+            while match_node > 0:
+                pattern = self.output[match_node]
+                end = index + 1
+                start = end - len(pattern)
+                if self.__is_word_boundary(text, start, end):
+                    candidates.append(AhoCorasickMatch(start, end, pattern))
+                match_node = self.dictionary_link[match_node]
+
+        candidates.sort(key=lambda candidate: (candidate.start, -candidate.end))
+        matches: list[AhoCorasickMatch] = []
+        last_end = 0
+        for candidate in candidates:
+            if candidate.start >= last_end:
+                matches.append(candidate)
+                last_end = candidate.end
+        return matches
+
+    def replace(self, text: str, replacements: dict[str, str]) -> str:
+        matches = self.find_all(text)
+        if len(matches) == 0:
+            return text
+        return self.__join(text, matches, [replacements[match.pattern] for match in matches])
+
+    def expand(self, text: str, alternatives: dict[str, list[str]]) -> list[str]:
+        # Every match is swapped for each of its alternatives, so two matches with two alternatives each produce
+        # four strings
+        matches = self.find_all(text)
+        if len(matches) == 0:
+            return [text]
+        return [self.__join(text, matches, selected) for selected in
+                itertools.product(*[alternatives[match.pattern] for match in matches])]
+
+    def __add_pattern(self, pattern: str):
+        node = 0
+        for character in pattern:
+            next_node = self.goto[node].get(character)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto[node][character] = next_node
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+                self.dictionary_link.append(-1)
+            node = next_node
+        self.output[node] = pattern
+
+    def __build_links(self):
+        node_queue = deque(self.goto[0].values())
+        while node_queue:
+            node = node_queue.popleft()
+            for character, child in self.goto[node].items():
+                fail_node = self.fail[node]
+                while fail_node and character not in self.goto[fail_node]:
+                    fail_node = self.fail[fail_node]
+                self.fail[child] = self.goto[fail_node].get(character, 0)
+                fail_target = self.fail[child]
+                self.dictionary_link[child] = fail_target if self.output[fail_target] is not None \
+                    else self.dictionary_link[fail_target]
+                node_queue.append(child)
+
+    @staticmethod
+    def __is_word_boundary(text: str, start: int, end: int) -> bool:
+        if start > 0 and AhoCorasick.__is_word_character(text[start - 1]):
+            return False
+        if end < len(text) and AhoCorasick.__is_word_character(text[end]):
+            return False
+        return True
+
+    @staticmethod
+    def __is_word_character(character: str) -> bool:
+        return character.isalnum() or character == "_"
+
+    @staticmethod
+    def __join(text: str, matches: list[AhoCorasickMatch], replacements: Iterable[str]) -> str:
+        parts: list[str] = []
+        last_end = 0
+        for match, replacement in zip(matches, replacements):
+            parts.append(text[last_end:match.start])
+            parts.append(replacement)
+            last_end = match.end
+        parts.append(text[last_end:])
+        return "".join(parts)
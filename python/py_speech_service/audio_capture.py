@@ -0,0 +1,141 @@
+import logging
+import threading
+from typing import Optional
+
+import numpy
+import sounddevice as sd
+
+from py_speech_service.audio_resampler import AudioResampler
+
+
+class AudioRingBuffer:
+
+    def __init__(self, capacity: int):
+        self.buffer = numpy.zeros(capacity, dtype=numpy.int16)
+        self.capacity = capacity
+        self.read_position = 0
+        self.size = 0
+        self.condition = threading.Condition()
+        self.overflow_count = 0
+        self.dropped_samples = 0
+
+    buffer: numpy.ndarray
+    capacity: int
+    read_position: int
+    size: int
+    condition: threading.Condition
+    overflow_count: int
+    dropped_samples: int
+
+    def write(self, samples: numpy.ndarray):
+        with self.condition:
+            if len(samples) > self.capacity:
+                self.dropped_samples += len(samples) - self.capacity
+                samples = samples[-self.capacity:]
+
+            # When the reader falls behind, the oldest audio is dropped so latency stays bounded
+            overflow = self.size + len(samples) - self.capacity
+            if overflow > 0:
+                self.overflow_count += 1
+                self.dropped_samples += overflow
+                self.read_position = (self.read_position + overflow) % self.capacity
+                self.size -= overflow
+
+            write_position = (self.read_position + self.size) % self.capacity
+            first_part = min(len(samples), self.capacity - write_position)
+            self.buffer[write_position:write_position + first_part] = samples[:first_part]
+            self.buffer[:len(samples) - first_part] = samples[first_part:]
+            self.size += len(samples)
+            self.condition.notify()
+
+    def read(self, max_samples: int, timeout: float) -> Optional[numpy.ndarray]:
+        with self.condition:
+            if self.size == 0 and not self.condition.wait_for(lambda: self.size > 0, timeout):
+                return None
+
+            count = min(self.size, max_samples)
+            first_part = min(count, self.capacity - self.read_position)
+            samples = numpy.empty(count, dtype=numpy.int16)
+            samples[:first_part] = self.buffer[self.read_position:self.read_position + first_part]
+            samples[first_part:] = self.buffer[:count - first_part]
+            self.read_position = (self.read_position + count) % self.capacity
+            self.size -= count
+            return samples
+
+    def clear(self):
+        with self.condition:
+            self.read_position = 0
+            self.size = 0
+
+
+class AudioCapture:
+
+    def __init__(self, device: Optional[int] = None, sample_rate: Optional[int] = None, channels: int = 1,
+                 buffer_seconds: float = 5, max_read_seconds: float = 0.1):
+        self.device = device if device is not None else sd.default.device[0]
+        device_info = sd.query_devices(self.device, 'input')
+        self.device_sample_rate = int(device_info['default_samplerate'])
+        self.channels = max(1, min(channels, int(device_info.get('max_input_channels', channels))))
+        self.sample_rate = sample_rate if sample_rate else self.device_sample_rate
+        # The device is opened at its native rate and converted to the rate the recognizer expects
+        self.resampler = AudioResampler(self.device_sample_rate, self.sample_rate) \
+            if self.sample_rate != self.device_sample_rate else None
+        self.ring_buffer = AudioRingBuffer(int(self.device_sample_rate * buffer_seconds))
+        self.max_read_samples = int(self.device_sample_rate * max_read_seconds)
+        self.stream = None
+        self.status_count = 0
+        self.is_finished = False
+
+    device: int
+    device_sample_rate: int
+    channels: int
+    sample_rate: int
+    resampler: Optional[AudioResampler]
+    ring_buffer: AudioRingBuffer
+    max_read_samples: int
+    stream: Optional[sd.RawInputStream]
+    status_count: int
+    # The microphone never runs out of audio, unlike file sources
+    is_finished: bool
+
+    def __enter__(self):
+        self.ring_buffer.clear()
+        self.stream = sd.RawInputStream(device=self.device,
+                                        samplerate=self.device_sample_rate,
+                                        dtype='int16',
+                                        channels=self.channels,
+                                        callback=self.__record_callback)
+        self.stream.start()
+        if self.resampler is not None or self.channels > 1:
+            logging.info("Capturing " + str(self.channels) + " channel audio at " + str(self.device_sample_rate) +
+                         "Hz and converting to mono " + str(self.sample_rate) + "Hz")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        if self.ring_buffer.overflow_count > 0 or self.status_count > 0:
+            logging.info("Audio capture dropped " + str(self.ring_buffer.dropped_samples) + " samples in " +
+                         str(self.ring_buffer.overflow_count) + " buffer overflows with " + str(self.status_count) +
+                         " stream status errors")
+
+    def read(self, timeout: float = 0.25) -> Optional[bytes]:
+        samples = self.ring_buffer.read(self.max_read_samples, timeout)
+        if samples is None:
+            return None
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+            if len(samples) == 0:
+                return None
+        return samples.tobytes()
+
+    def __record_callback(self, indata, frames, time, status):
+        if status:
+            self.status_count += 1
+            logging.error(str(status))
+        samples = numpy.frombuffer(indata, dtype=numpy.int16)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1).astype(numpy.int16)
+        self.ring_buffer.write(samples)
@@ -0,0 +1,96 @@
+import wave
+from typing import Optional
+
+import numpy
+
+from py_speech_service.audio_resampler import AudioResampler
+
+
+class WaveFileSource:
+    # Reads a WAV file the same way AudioCapture reads the microphone, as mono 16 bit audio at the requested sample
+    # rate, but as fast as it is read rather than in real time
+
+    def __init__(self, path: str, sample_rate: Optional[int] = None, chunk_seconds: float = 0.1):
+        self.path = path
+        with wave.open(path, 'rb') as wave_file:
+            self.file_sample_rate = wave_file.getframerate()
+            self.channels = wave_file.getnchannels()
+            self.sample_width = wave_file.getsampwidth()
+            self.duration_seconds = wave_file.getnframes() / self.file_sample_rate
+        if self.sample_width not in (1, 2, 4):
+            raise ValueError("Unsupported WAV sample width of " + str(self.sample_width * 8) + " bits in " + path)
+        self.sample_rate = sample_rate if sample_rate else self.file_sample_rate
+        self.resampler = AudioResampler(self.file_sample_rate, self.sample_rate) \
+            if self.sample_rate != self.file_sample_rate else None
+        self.chunk_frames = max(1, int(self.file_sample_rate * chunk_seconds))
+        self.wave_file = None
+        self.is_finished = False
+
+    path: str
+    file_sample_rate: int
+    channels: int
+    sample_width: int
+    duration_seconds: float
+    sample_rate: int
+    resampler: Optional[AudioResampler]
+    chunk_frames: int
+    wave_file: Optional[wave.Wave_read]
+    is_finished: bool
+
+    def __enter__(self):
+        self.wave_file = wave.open(self.path, 'rb')
+        self.is_finished = False
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.wave_file is not None:
+            self.wave_file.close()
+            self.wave_file = None
+
+    def read(self, timeout: float = 0.25) -> Optional[bytes]:
+        frames = self.wave_file.readframes(self.chunk_frames)
+        if not frames:
+            self.is_finished = True
+            return None
+
+        if self.sample_width == 1:
+            samples = (numpy.frombuffer(frames, dtype=numpy.uint8).astype(numpy.int16) - 128) << 8
+        elif self.sample_width == 4:
+            samples = (numpy.frombuffer(frames, dtype=numpy.int32) >> 16).astype(numpy.int16)
+        else:
+            samples = numpy.frombuffer(frames, dtype=numpy.int16)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1).astype(numpy.int16)
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+            if len(samples) == 0:
+                return None
+        return samples.tobytes()
+
+
+class WaveFileRecorder:
+    # Writes the audio given to the recognizer to a WAV file, so a session can be replayed with WaveFileSource
+
+    def __init__(self, path: str, sample_rate: int):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.wave_file = None
+
+    path: str
+    sample_rate: int
+    wave_file: Optional[wave.Wave_write]
+
+    def __enter__(self):
+        self.wave_file = wave.open(self.path, 'wb')
+        self.wave_file.setnchannels(1)
+        self.wave_file.setsampwidth(2)
+        self.wave_file.setframerate(self.sample_rate)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.wave_file is not None:
+            self.wave_file.close()
+            self.wave_file = None
+
+    def write(self, data: bytes):
+        self.wave_file.writeframes(data)
@@ -0,0 +1,60 @@
+import functools
+import math
+
+import numpy
+
+
+@functools.lru_cache(maxsize=8)
+def get_polyphase_filter(up: int, down: int, zero_crossings: int = 10, rolloff: float = 0.9) -> numpy.ndarray:
+    # Windowed sinc low pass filter at the upsampled rate, split into one row of taps per output phase
+    taps_per_phase = int(math.ceil(2 * zero_crossings * max(up, down) / up))
+    length = taps_per_phase * up
+    cutoff = 0.5 / max(up, down) * rolloff
+    positions = numpy.arange(length) - (length - 1) / 2
+    taps = 2 * cutoff * numpy.sinc(2 * cutoff * positions) * numpy.kaiser(length, 8.0)
+    taps *= up / numpy.sum(taps)
+    return taps.reshape(taps_per_phase, up).T.astype(numpy.float32).copy()
+
+
+class AudioResampler:
+
+    def __init__(self, input_rate: int, output_rate: int):
+        divisor = math.gcd(input_rate, output_rate)
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.filters = get_polyphase_filter(self.up, self.down)
+        self.taps_per_phase = self.filters.shape[1]
+        self.history = numpy.zeros(self.taps_per_phase, dtype=numpy.float32)
+        # Position of the next output sample in upsampled time, relative to the start of the history
+        self.time = self.taps_per_phase * self.up
+
+    input_rate: int
+    output_rate: int
+    up: int
+    down: int
+    filters: numpy.ndarray
+    taps_per_phase: int
+    history: numpy.ndarray
+    time: int
+
+    def process(self, samples: numpy.ndarray) -> numpy.ndarray:
+        buffer = numpy.concatenate((self.history, samples.astype(numpy.float32)))
+        last_time = (len(buffer) - 1) * self.up
+        output_count = (last_time - self.time) // self.down + 1 if last_time >= self.time else 0
+
+        output = numpy.zeros(0, dtype=numpy.int16)
+        if output_count > 0:
+            times = self.time + self.down * numpy.arange(output_count)
+            input_indexes = times // self.up
+            phases = times % self.up
+            windows = buffer[input_indexes[:, numpy.newaxis] - numpy.arange(self.taps_per_phase)[numpy.newaxis, :]]
+            values = numpy.einsum('ij,ij->i', windows, self.filters[phases])
+            output = numpy.clip(numpy.rint(values), -32768, 32767).astype(numpy.int16)
+            self.time += output_count * self.down
+
+        consumed = len(buffer) - self.taps_per_phase
+        self.history = buffer[consumed:]
+        self.time -= consumed * self.up
+        return output
@@ -0,0 +1,97 @@
+import logging
+from typing import Optional
+
+import numpy
+
+from py_speech_service.audio_capture import AudioRingBuffer
+from py_speech_service.audio_resampler import AudioResampler
+
+
+class ClientAudioSource:
+    # Audio streamed by a gRPC client instead of read from a local microphone. It is buffered like the microphone, so a
+    # client sending audio faster than it can be recognized loses its oldest audio rather than adding delay.
+
+    def __init__(self, client_sample_rate: int, channels: int = 1, buffer_seconds: float = 5,
+                 max_read_seconds: float = 0.1, status_seconds: float = 0.5):
+        self.client_sample_rate = client_sample_rate
+        self.channels = max(1, channels)
+        self.sample_rate = client_sample_rate
+        self.resampler = None
+        self.ring_buffer = AudioRingBuffer(int(client_sample_rate * (buffer_seconds if buffer_seconds > 0 else 5)))
+        self.max_read_samples = int(client_sample_rate * max_read_seconds)
+        self.status_samples = int(client_sample_rate * status_seconds)
+        self.samples_since_status = 0
+        self.remainder = b""
+        self.sequence = 0
+        self.received_samples = 0
+        self.end_of_stream = False
+        self.is_finished = False
+
+    client_sample_rate: int
+    channels: int
+    sample_rate: int
+    resampler: Optional[AudioResampler]
+    ring_buffer: AudioRingBuffer
+    max_read_samples: int
+    status_samples: int
+    samples_since_status: int
+    remainder: bytes
+    sequence: int
+    received_samples: int
+    end_of_stream: bool
+    # Set once the client has ended the stream and all of its audio has been read
+    is_finished: bool
+
+    def set_sample_rate(self, sample_rate: int):
+        # The recognizer's sample rate is only known once the model is loaded, which can be after audio starts arriving
+        self.sample_rate = sample_rate
+        self.resampler = AudioResampler(self.client_sample_rate, sample_rate) \
+            if sample_rate != self.client_sample_rate else None
+
+    def __enter__(self):
+        if self.resampler is not None or self.channels > 1:
+            logging.info("Receiving " + str(self.channels) + " channel client audio at " +
+                         str(self.client_sample_rate) + "Hz and converting to mono " + str(self.sample_rate) + "Hz")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        logging.info("Received " + str(round(self.received_samples / self.client_sample_rate, 1)) +
+                     " seconds of client audio, dropped " + str(self.ring_buffer.dropped_samples) + " samples in " +
+                     str(self.ring_buffer.overflow_count) + " buffer overflows")
+
+    def write(self, audio: bytes, sequence: int = 0, end_of_stream: bool = False) -> bool:
+        # Returns whether the client is due a status update
+        data = self.remainder + audio
+        # Frames can be split across messages, so partial samples are kept for the next message
+        usable_bytes = len(data) - len(data) % (2 * self.channels)
+        self.remainder = data[usable_bytes:]
+        samples = numpy.frombuffer(data[:usable_bytes], dtype=numpy.int16)
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1).astype(numpy.int16)
+        if len(samples) > 0:
+            self.ring_buffer.write(samples)
+
+        self.sequence = sequence
+        self.received_samples += len(samples)
+        self.samples_since_status += len(samples)
+        if end_of_stream:
+            self.end_of_stream = True
+        if end_of_stream or self.samples_since_status >= self.status_samples:
+            self.samples_since_status = 0
+            return True
+        return False
+
+    def read(self, timeout: float = 0.25) -> Optional[bytes]:
+        samples = self.ring_buffer.read(self.max_read_samples, timeout)
+        if samples is None:
+            if self.end_of_stream:
+                self.is_finished = True
+            return None
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+            if len(samples) == 0:
+                return None
+        return samples.tobytes()
+
+    def get_buffered_seconds(self) -> float:
+        return self.ring_buffer.size / self.client_sample_rate
@@ -0,0 +1,59 @@
+from collections import deque
+from typing import Optional
+
+import numpy
+
+
+class Endpointer:
+    # Ends utterances that VOSK hasn't ended yet, either because they went on for too long or because a partial result
+    # already matched a complete rule, and keeps track of how long after the end of speech each result was ready
+
+    def __init__(self, sample_rate: int, max_utterance_seconds: float = 0, grammar_endpoint: bool = False):
+        self.sample_rate = sample_rate
+        self.max_utterance_samples = int(sample_rate * max_utterance_seconds)
+        self.grammar_endpoint = grammar_endpoint
+        self.utterance = 0
+        self.utterance_samples = 0
+        self.complete_utterance = -1
+        self.endpoint_counts = {"recognizer": 0, "silence": 0, "max_length": 0, "grammar": 0, "speaking": 0}
+        self.latencies = deque(maxlen=1000)
+
+    sample_rate: int
+    max_utterance_samples: int
+    grammar_endpoint: bool
+    utterance: int
+    utterance_samples: int
+    complete_utterance: int
+    endpoint_counts: dict[str, int]
+    latencies: deque[float]
+
+    def add_audio(self, samples: int) -> Optional[str]:
+        # Returns why the current utterance should be ended now, if it should be
+        self.utterance_samples += samples
+        if self.grammar_endpoint and self.complete_utterance == self.utterance:
+            return "grammar"
+        if 0 < self.max_utterance_samples <= self.utterance_samples:
+            return "max_length"
+        return None
+
+    def set_complete(self, utterance: int):
+        # Called by the event loop once a partial result of the utterance has matched a complete rule
+        self.complete_utterance = utterance
+
+    def end_utterance(self, reason: str):
+        self.endpoint_counts[reason] += 1
+        self.utterance += 1
+        self.utterance_samples = 0
+
+    def add_latency(self, seconds: float):
+        self.latencies.append(seconds)
+
+    def get_stats(self) -> dict:
+        latencies = numpy.array(self.latencies) * 1000
+        return {
+            "endpoints": dict(self.endpoint_counts),
+            "measured_results": len(latencies),
+            "latency_p50_ms": round(float(numpy.percentile(latencies, 50))) if len(latencies) > 0 else 0,
+            "latency_p90_ms": round(float(numpy.percentile(latencies, 90))) if len(latencies) > 0 else 0,
+            "latency_max_ms": round(float(numpy.max(latencies))) if len(latencies) > 0 else 0
+        }
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from py_speech_service.audio_file import WaveFileSource
+from py_speech_service.grammar_element import GrammarElementMatch
+from py_speech_service.model_manager import ModelManager
+from py_speech_service.speech_recognition import SpeechRecognition
+
+
+class FileRecognition:
+    # Runs WAV files through the same listen loop and grammar matching as speech recognition, as fast as the CPU
+    # allows, with each file decoded in its own process. Every process loads the model and grammar once and reuses
+    # them for all of the files it is given.
+
+    worker: Optional["FileRecognition"] = None
+
+    def __init__(self, grammar_json: str, model_path: str, required_confidence: float = 80,
+                 voice_activity_detection: bool = False, phrase_grammar: bool = False, max_alternatives: int = 1,
+                 endpoint_silence: float = 0, max_utterance_length: float = 0, grammar_endpoint: bool = False):
+        self.speech_recognition = SpeechRecognition()
+        if not self.speech_recognition.set_speech_recognition_details(
+                None, model_path, required_confidence, voice_activity_detection=voice_activity_detection,
+                phrase_grammar=phrase_grammar, max_alternatives=max_alternatives, endpoint_silence=endpoint_silence,
+                max_utterance_length=max_utterance_length, grammar_endpoint=grammar_endpoint,
+                grammar_json=grammar_json):
+            raise ValueError("Unable to load the grammar")
+        self.speech_recognition.model = ModelManager().get_model(model_path)
+        self.speech_recognition.model_sample_rate = ModelManager.get_vosk_model_sample_rate(model_path)
+        self.speech_recognition.result_listener = self.__add_result
+        self.results = []
+
+    speech_recognition: SpeechRecognition
+    results: list[dict]
+
+    def recognize_file(self, path: str) -> dict:
+        start_time = time.perf_counter()
+        self.results = []
+        try:
+            # Read up front so a missing or unsupported file is reported, as the listen loop only logs its errors
+            audio_seconds = WaveFileSource(path).duration_seconds
+            asyncio.run(self.__recognize(path))
+
+            total_seconds = time.perf_counter() - start_time
+            return {
+                "file": path,
+                "successful": True,
+                "audio_seconds": round(audio_seconds, 3),
+                "decode_seconds": round(self.speech_recognition.decode_seconds, 3),
+                "match_seconds": round(sum(result["match_seconds"] for result in self.results), 4),
+                "total_seconds": round(total_seconds, 3),
+                "real_time_factor": round(total_seconds / audio_seconds, 4) if audio_seconds > 0 else 0,
+                "results": self.results
+            }
+        except Exception as e:
+            logging.error("Unable to recognize " + path + ": " + repr(e))
+            return {
+                "file": path,
+                "successful": False,
+                "error": repr(e),
+                "total_seconds": round(time.perf_counter() - start_time, 3),
+                "results": self.results
+            }
+
+    async def __recognize(self, path: str):
+        speech_recognition = self.speech_recognition
+        speech_recognition.input_file = path
+        speech_recognition.loop = asyncio.get_running_loop()
+        speech_recognition.recognition_queue = asyncio.Queue()
+
+        # Results are matched while the file is decoded, so partial results can still end utterances early
+        listen_task = asyncio.create_task(asyncio.to_thread(speech_recognition.listen))
+        while not listen_task.done() or not speech_recognition.recognition_queue.empty():
+            try:
+                item = await asyncio.wait_for(speech_recognition.recognition_queue.get(), timeout=0.1)
+            except asyncio.TimeoutError:
+                continue
+            await speech_recognition.process_speech(item)
+        await listen_task
+        if speech_recognition.listen_error is not None:
+            raise speech_recognition.listen_error
+
+    def __add_result(self, result_dict: dict, text_recognized: str, match: Optional[GrammarElementMatch],
+                     timings: dict[str, float]):
+        result = {
+            "heard_text": text_recognized,
+            "audio_position": result_dict.get("audio_position", 0),
+            "endpoint": result_dict.get("endpoint", ""),
+            "match_seconds": round(timings.get("find_match", 0), 4)
+        }
+        if match is not None:
+            result["recognized_text"] = match.matched_text
+            result["recognized_rule"] = match.rule
+            result["confidence"] = round(match.confidence, 2)
+            result["semantics"] = match.values
+        self.results.append(result)
+
+    @staticmethod
+    def find_wave_files(paths: list[str]) -> list[str]:
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for directory, _, file_names in sorted(os.walk(path)):
+                    files.extend(os.path.join(directory, file_name) for file_name in sorted(file_names)
+                                 if file_name.lower().endswith(".wav"))
+            else:
+                files.append(path)
+        return files
+
+    @staticmethod
+    def recognize_files(paths: list[str], grammar_file: str, vosk_model: Optional[str],
+                        required_confidence: float = 80, voice_activity_detection: bool = False,
+                        processes: Optional[int] = None, phrase_grammar: bool = False, max_alternatives: int = 1,
+                        endpoint_silence: float = 0, max_utterance_length: float = 0,
+                        grammar_endpoint: bool = False) -> dict:
+        start_time = time.perf_counter()
+        files = FileRecognition.find_wave_files(paths)
+        with open(grammar_file, 'r') as fp:
+            grammar_json = fp.read()
+
+        # The model is downloaded once up front, rather than by every process at the same time
+        model_path = ModelManager().resolve_model_path(vosk_model)
+        processes = processes if processes else min(os.cpu_count() or 1, max(len(files), 1))
+
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=FileRecognition.init_worker,
+                                 initargs=(grammar_json, model_path, required_confidence, voice_activity_detection,
+                                           phrase_grammar, max_alternatives, endpoint_silence, max_utterance_length,
+                                           grammar_endpoint)) as executor:
+            file_results = list(executor.map(FileRecognition.recognize_worker_file, files))
+
+        return {
+            "processes": processes,
+            "file_count": len(files),
+            "audio_seconds": round(sum(result.get("audio_seconds", 0) for result in file_results), 3),
+            "total_seconds": round(time.perf_counter() - start_time, 3),
+            "files": file_results
+        }
+
+    @staticmethod
+    def init_worker(grammar_json: str, model_path: str, required_confidence: float, voice_activity_detection: bool,
+                    phrase_grammar: bool, max_alternatives: int, endpoint_silence: float, max_utterance_length: float,
+                    grammar_endpoint: bool):
+        # The listen loop prints as it starts and stops, which would be mixed in with the results printed as JSON
+        sys.stdout = sys.stderr
+        FileRecognition.worker = FileRecognition(grammar_json, model_path, required_confidence,
+                                                 voice_activity_detection, phrase_grammar, max_alternatives,
+                                                 endpoint_silence, max_utterance_length, grammar_endpoint)
+
+    @staticmethod
+    def recognize_worker_file(path: str) -> dict:
+        return FileRecognition.worker.recognize_file(path)
@@ -0,0 +1,276 @@
+import json
+import logging
+import random
+import time
+import tracemalloc
+from typing import Optional
+
+import num2words
+import numpy
+
+from py_speech_service.grammar_element import GrammarElementType
+from py_speech_service.grammar_parser import GrammarParser
+
+
+class GrammarBenchmark:
+    # Generates a synthetic grammar and a corpus of heard text with speech recognition style errors, then measures how
+    # long the grammar takes to load, how much memory it uses, and how fast and accurately find_match matches the
+    # corpus. Everything is seeded, so runs can be compared before and after a change to the matcher.
+
+    vocabulary = ("open close start stop launch show hide play pause next previous turn light door window music video "
+                  "game map item key sword shield bow arrow bomb boots ring crystal heart potion red green blue yellow "
+                  "purple white black dark bright north south east west upper lower left right first second third "
+                  "last big small old new fast slow up down in out on off the a to of for with please now kitchen "
+                  "bedroom garage castle tower temple cave forest desert lake mountain village palace dungeon").split()
+    syllables = "ka zor bel dri vex tha mor lun qua rin sol gar pel xan ith oru fen dal".split()
+
+    def __init__(self, rule_count: int = 100, one_of_count: int = 1, one_of_size: int = 3, optional_count: int = 1,
+                 optional_size: int = 2, nesting_depth: int = 0, nesting_branches: int = 2,
+                 key_value_ratio: float = 0.5, key_value_size: int = 20, replacement_count: int = 50,
+                 prefix: str = "hey computer", utterance_count: int = 1000, noise: float = 0.1,
+                 negative_ratio: float = 0.1, seed: int = 0, compile_workers: int = 0):
+        self.rule_count = rule_count
+        self.one_of_count = one_of_count
+        self.one_of_size = one_of_size
+        self.optional_count = optional_count
+        self.optional_size = optional_size
+        self.nesting_depth = nesting_depth
+        self.nesting_branches = nesting_branches
+        self.key_value_ratio = key_value_ratio
+        self.key_value_size = key_value_size
+        self.replacement_count = replacement_count
+        self.prefix = prefix
+        self.utterance_count = utterance_count
+        self.noise = noise
+        self.negative_ratio = negative_ratio
+        self.random = random.Random(seed)
+        self.fantasy_names = []
+        self.compile_workers = compile_workers
+
+    rule_count: int
+    one_of_count: int
+    one_of_size: int
+    optional_count: int
+    optional_size: int
+    nesting_depth: int
+    nesting_branches: int
+    key_value_ratio: float
+    key_value_size: int
+    replacement_count: int
+    prefix: str
+    utterance_count: int
+    noise: float
+    negative_ratio: float
+    random: random.Random
+    fantasy_names: list[str]
+    # Processes compiling grammars that are large enough to compile in parallel, or 0 for the parser's default. 1
+    # compiles every grammar serially, for comparing load times with the parallel compile.
+    compile_workers: int
+
+    def generate_grammar(self) -> dict:
+        replacements = {}
+        self.fantasy_names = []
+        while len(replacements) < self.replacement_count:
+            name = "".join(self.random.sample(self.syllables, self.random.randint(2, 3)))
+            spoken = self.__words(2)
+            if spoken not in replacements:
+                replacements[spoken] = name
+                self.fantasy_names.append(name)
+
+        rules = []
+        for rule_index in range(self.rule_count):
+            rules.append({
+                "Type": GrammarElementType.Rule.value,
+                "Key": "rule " + str(rule_index),
+                "Data": self.__generate_rule_data(self.nesting_depth)
+            })
+
+        return {"Rules": rules, "Replacements": replacements, "Prefix": self.prefix}
+
+    def generate_corpus(self, grammar: dict) -> list[dict]:
+        spoken_forms = {}
+        for spoken, name in grammar.get("Replacements", {}).items():
+            spoken_forms.setdefault(str(name).lower(), []).append(str(spoken).lower())
+
+        corpus = []
+        rules = grammar["Rules"]
+        for _ in range(self.utterance_count):
+            if self.random.random() < self.negative_ratio:
+                # Speech that isn't in the grammar, which should not match anything
+                corpus.append({"text": self.__words(self.random.randint(3, 8)), "rule": None, "semantics": {}})
+                continue
+            rule = self.random.choice(rules)
+            words = []
+            semantics = {}
+            self.__speak_elements(rule["Data"], words, semantics, spoken_forms)
+            corpus.append({"text": self.__add_noise(" ".join(words)), "rule": rule["Key"], "semantics": semantics})
+        return corpus
+
+    def run(self, grammar: Optional[dict] = None, use_match_cache: bool = False, measure_memory: bool = True) -> dict:
+        if grammar is None:
+            grammar = self.generate_grammar()
+        corpus = self.generate_corpus(grammar)
+        # The parser changes the grammar it is given, so it loads a copy of the JSON
+        grammar_json = json.dumps(grammar)
+
+        # Tracing allocations slows the load down, so it can be turned off when comparing load times
+        if measure_memory:
+            tracemalloc.start()
+        load_start = time.perf_counter()
+        grammar_parser = GrammarParser()
+        if self.compile_workers > 0:
+            grammar_parser.compile_workers = self.compile_workers
+        grammar_parser.set_grammar_json(grammar_json)
+        load_seconds = time.perf_counter() - load_start
+        memory_bytes, peak_memory_bytes = (0, 0)
+        if measure_memory:
+            memory_bytes, peak_memory_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        if not use_match_cache:
+            grammar_parser.match_cache_size = 0
+
+        latencies = numpy.zeros(len(corpus))
+        rule_correct = 0
+        semantics_correct = 0
+        false_matches = 0
+        misses = 0
+        positive_count = 0
+        for index, utterance in enumerate(corpus):
+            match_start = time.perf_counter()
+            match = grammar_parser.find_match(utterance["text"])
+            latencies[index] = time.perf_counter() - match_start
+
+            if utterance["rule"] is None:
+                if match is not None:
+                    false_matches += 1
+                continue
+            positive_count += 1
+            if match is None:
+                misses += 1
+            elif match.rule == utterance["rule"]:
+                rule_correct += 1
+                if match.values == utterance["semantics"]:
+                    semantics_correct += 1
+
+        negative_count = len(corpus) - positive_count
+        return {
+            "rules": len(grammar["Rules"]),
+            "replacements": len(grammar.get("Replacements", {})),
+            "phrases": sum(len(items) for items in grammar_parser.rule_items.values()),
+            "vocabulary": len(grammar_parser.all_words),
+            "load_seconds": round(load_seconds, 4),
+            "compile_workers": grammar_parser.compile_workers
+            if len(grammar["Rules"]) >= grammar_parser.parallel_min_rules else 1,
+            "memory_mb": round(memory_bytes / 1048576, 2) if measure_memory else None,
+            "peak_memory_mb": round(peak_memory_bytes / 1048576, 2) if measure_memory else None,
+            "utterances": len(corpus),
+            "noise": self.noise,
+            "latency_ms": {
+                "mean": round(float(numpy.mean(latencies)) * 1000, 3) if len(corpus) > 0 else 0,
+                "p50": round(float(numpy.percentile(latencies, 50)) * 1000, 3) if len(corpus) > 0 else 0,
+                "p90": round(float(numpy.percentile(latencies, 90)) * 1000, 3) if len(corpus) > 0 else 0,
+                "p99": round(float(numpy.percentile(latencies, 99)) * 1000, 3) if len(corpus) > 0 else 0,
+                "max": round(float(numpy.max(latencies)) * 1000, 3) if len(corpus) > 0 else 0
+            },
+            "rule_accuracy": round(rule_correct / positive_count, 4) if positive_count > 0 else 0,
+            "semantics_accuracy": round(semantics_correct / positive_count, 4) if positive_count > 0 else 0,
+            "miss_rate": round(misses / positive_count, 4) if positive_count > 0 else 0,
+            "false_match_rate": round(false_matches / negative_count, 4) if negative_count > 0 else 0
+        }
+
+    def __generate_rule_data(self, depth: int) -> list[dict]:
+        if depth > 0:
+            return [{
+                "Type": GrammarElementType.GrammarElementList.value,
+                "Key": None,
+                "Data": [{"Data": self.__generate_rule_data(depth - 1)} for _ in range(self.nesting_branches)]
+            }]
+
+        data = [{"Type": GrammarElementType.String.value, "Key": None,
+                 "Data": (self.prefix + " " if self.prefix else "") + self.__words(self.random.randint(1, 3))}]
+        for _ in range(self.one_of_count):
+            data.append({"Type": GrammarElementType.OneOf.value, "Key": None,
+                         "Data": [self.__words(self.random.randint(1, 2)) for _ in range(self.one_of_size)]})
+        for _ in range(self.optional_count):
+            data.append({"Type": GrammarElementType.Optional.value, "Key": None,
+                         "Data": [self.__words(self.random.randint(1, 2)) for _ in range(self.optional_size)]})
+        if self.random.random() < self.key_value_ratio:
+            keys = set()
+            while len(keys) < self.key_value_size:
+                choice = self.random.random()
+                if choice < 0.2 and len(self.fantasy_names) > 0:
+                    keys.add(self.random.choice(self.fantasy_names))
+                elif choice < 0.3:
+                    keys.add(str(self.random.randint(1, 200)))
+                else:
+                    keys.add(self.__words(self.random.randint(1, 3)))
+            data.append({"Type": GrammarElementType.KeyValue.value, "Key": "value",
+                         "Data": [{"Key": key, "Value": key.upper()} for key in sorted(keys)]})
+            if self.random.random() < 0.5:
+                data.append({"Type": GrammarElementType.String.value, "Key": None, "Data": self.__words(1)})
+        return data
+
+    def __speak_elements(self, elements: list[dict], words: list[str], semantics: dict[str, str],
+                         spoken_forms: dict[str, list[str]]):
+        for element in elements:
+            element_type = GrammarElementType(element["Type"])
+            if element_type == GrammarElementType.String:
+                words.append(element["Data"].lower())
+            elif element_type == GrammarElementType.OneOf:
+                words.append(self.random.choice(element["Data"]).lower())
+            elif element_type == GrammarElementType.Optional:
+                if self.random.random() < 0.5:
+                    words.append(self.random.choice(element["Data"]).lower())
+            elif element_type == GrammarElementType.KeyValue:
+                item = self.random.choice(element["Data"])
+                key = str(item["Key"])
+                spoken = num2words.num2words(key).replace("-", " ") if key.isnumeric() else key.lower()
+                for name, forms in spoken_forms.items():
+                    if name in spoken.split():
+                        spoken = " ".join(self.random.choice(forms) if word == name else word
+                                          for word in spoken.split())
+                words.append(spoken)
+                semantics[element["Key"]] = item["Value"]
+            elif element_type == GrammarElementType.GrammarElementList:
+                self.__speak_elements(self.random.choice(element["Data"])["Data"], words, semantics, spoken_forms)
+                return
+
+    def __add_noise(self, text: str) -> str:
+        # Substitutions, deletions, insertions and misspellings, roughly the kind of mistakes VOSK makes
+        words = []
+        for word in text.split():
+            if self.random.random() >= self.noise:
+                words.append(word)
+                continue
+            error = self.random.random()
+            if error < 0.4:
+                words.append(self.random.choice(self.vocabulary))
+            elif error < 0.6:
+                continue
+            elif error < 0.8:
+                words.append(word)
+                words.append(self.random.choice(self.vocabulary))
+            else:
+                position = self.random.randrange(len(word))
+                words.append(word[:position] + self.random.choice("aeiourstnl") + word[position + 1:])
+        return " ".join(words) if len(words) > 0 else text
+
+    def __words(self, count: int) -> str:
+        return " ".join(self.random.choice(self.vocabulary) for _ in range(count))
+
+
+def run_grammar_benchmark(options: dict, grammar_file: Optional[str] = None,
+                          save_grammar_file: Optional[str] = None, measure_memory: bool = True) -> dict:
+    benchmark = GrammarBenchmark(**options)
+    grammar = None
+    if grammar_file:
+        with open(grammar_file, 'r') as fp:
+            grammar = json.load(fp)
+    else:
+        grammar = benchmark.generate_grammar()
+        if save_grammar_file:
+            with open(save_grammar_file, 'w', encoding='utf-8') as f:
+                json.dump(grammar, f, ensure_ascii=False, indent=4)
+    logging.info("Running grammar benchmark with " + str(len(grammar["Rules"])) + " rules")
+    return benchmark.run(grammar, measure_memory=measure_memory)
@@ -0,0 +1,108 @@
+import gzip
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from enum import Enum
+from typing import Optional
+
+from py_speech_service.grammar_parser import GrammarParser
+
+
+class GrammarCompression(Enum):
+    NoCompression = 0
+    Gzip = 1
+
+
+class CachedGrammar:
+    __slots__ = ("grammar_json", "grammar_parser", "size_bytes")
+
+    def __init__(self, grammar_json: Optional[str], grammar_parser: Optional[GrammarParser], size_bytes: int = 0):
+        self.grammar_json = grammar_json
+        self.grammar_parser = grammar_parser
+        self.size_bytes = size_bytes
+
+    grammar_json: Optional[str]
+    grammar_parser: Optional[GrammarParser]
+    size_bytes: int
+
+
+class GrammarCache:
+    # Grammars by the SHA-256 hash of their JSON, so a client starting recognition again with the same grammar can send
+    # just the hash, and the service can skip reading and compiling it. Cached parsers aren't copied, so every session
+    # using a grammar shares its parser, and a session has to copy it before changing it. The least recently used
+    # grammars are dropped once there are more than max_grammars or they use more than max_bytes together, going by the
+    # parser's estimate of its size, since measuring it exactly would slow starting recognition with a large grammar.
+
+    def __init__(self, max_grammars: int = 4, max_bytes: int = 256 * 1024 * 1024):
+        self.max_grammars = max_grammars
+        self.max_bytes = max_bytes
+        self.grammars = OrderedDict()
+        self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    max_grammars: int
+    max_bytes: int
+    grammars: OrderedDict[str, CachedGrammar]
+    total_bytes: int
+    lock: threading.Lock
+    hits: int
+    misses: int
+
+    def contains(self, grammar_hash: str) -> bool:
+        with self.lock:
+            return grammar_hash.lower() in self.grammars
+
+    def get(self, grammar_hash: str) -> Optional[CachedGrammar]:
+        grammar_hash = grammar_hash.lower()
+        with self.lock:
+            cached_grammar = self.grammars.get(grammar_hash)
+            if cached_grammar is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.grammars.move_to_end(grammar_hash)
+            return cached_grammar
+
+    def add(self, grammar_hash: str, grammar_json: Optional[str], grammar_parser: Optional[GrammarParser] = None):
+        size_bytes = len(grammar_json) if grammar_json else 0
+        if grammar_parser:
+            size_bytes += grammar_parser.get_estimated_bytes()
+        cached_grammar = CachedGrammar(grammar_json, grammar_parser, size_bytes)
+        grammar_hash = grammar_hash.lower()
+        with self.lock:
+            previous_grammar = self.grammars.pop(grammar_hash, None)
+            if previous_grammar is not None:
+                self.total_bytes -= previous_grammar.size_bytes
+            self.grammars[grammar_hash] = cached_grammar
+            self.total_bytes += size_bytes
+            # The grammar just added is always kept, even when it is larger than max_bytes on its own
+            while len(self.grammars) > 1 and \
+                    (len(self.grammars) > self.max_grammars or self.total_bytes > self.max_bytes):
+                removed_hash, removed_grammar = self.grammars.popitem(last=False)
+                self.total_bytes -= removed_grammar.size_bytes
+                logging.info("Removed grammar " + removed_hash + " from the cache")
+
+    def get_stats(self) -> dict[str, float]:
+        with self.lock:
+            return {
+                "grammars": len(self.grammars),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    @staticmethod
+    def get_hash(grammar_json: str) -> str:
+        return hashlib.sha256(grammar_json.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def decode(grammar_data: bytes, compression: int = 0) -> str:
+        if GrammarCompression(compression) == GrammarCompression.Gzip:
+            decompressed = gzip.decompress(grammar_data)
+            logging.info("Decompressed " + str(len(grammar_data)) + " byte grammar to " + str(len(decompressed)) +
+                         " bytes")
+            grammar_data = decompressed
+        return grammar_data.decode("utf-8")
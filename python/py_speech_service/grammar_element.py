@@ -1,5 +1,7 @@
 from enum import Enum
 
+import numpy
+
 class GrammarElementType(Enum):
     Rule = 0
     String = 1
@@ -8,24 +10,66 @@ class GrammarElementType(Enum):
     KeyValue = 4
     GrammarElementList = 5
 
+class GrammarSlot:
+    # Large grammars have one of these for every rule element after a KeyValue, and identical ones are shared between
+    # rules, so __slots__ is used to keep them small
+    __slots__ = ("type", "key", "texts", "squashed_texts", "values", "squashed_groups", "lengths", "word_counts",
+                 "min_word_count", "max_word_count", "extendable")
+
+    def __init__(self, element_type: GrammarElementType, key: str = None):
+        self.type = element_type
+        self.key = key
+        self.texts = []
+        self.squashed_texts = []
+        self.values = []
+        self.squashed_groups = []
+        self.lengths = numpy.zeros(0, dtype=numpy.int32)
+        self.word_counts = numpy.zeros(0, dtype=numpy.int32)
+        self.min_word_count = 0
+        self.max_word_count = 0
+        self.extendable = numpy.zeros(0, dtype=bool)
+
+    type: GrammarElementType
+    key: str
+    # Normalized candidate text with a trailing space, matching how phrases are built
+    texts: list[str]
+    squashed_texts: list[str]
+    # Semantic value for each candidate (KeyValue slots only)
+    values: list[str]
+    # Indexes of the candidates that share each candidate's squashed text
+    squashed_groups: list[tuple[int, ...]]
+    lengths: numpy.ndarray
+    word_counts: numpy.ndarray
+    min_word_count: int
+    max_word_count: int
+    # Whether each candidate is the first words of another candidate, such as "red" for "red potion"
+    extendable: numpy.ndarray
+
 class GrammarRuleElement:
-    def __init(self, rule_name: str):
+    __slots__ = ("rule", "slots")
+
+    def __init__(self, rule_name: str = ""):
         self.rule = rule_name
-        self.data = []
+        self.slots = []
 
-    rule: str = ""
-    data = []
+    rule: str
+    # Compiled elements starting at the first KeyValue, used when the element is not an exact phrase
+    slots: list[GrammarSlot]
 
 class GrammarElementLookupItem:
+    # There is one of these for every phrase in the grammar
+    __slots__ = ("rule_name", "phrase", "word_count", "grammar_element", "is_full_match")
 
     def __init__(self, rule_name: str, phrase: str, element: GrammarRuleElement, full_match: bool):
         self.rule_name = rule_name
         self.grammar_element = element
         self.is_full_match = full_match
         self.phrase = phrase
+        self.word_count = len(phrase.split())
 
     rule_name: str
     phrase: str
+    word_count: int
     grammar_element: GrammarRuleElement
     is_full_match: bool
 
@@ -39,9 +83,12 @@ class GrammarElementMatch:
         self.matched_text = matched_text.strip()
         self.confidence = confidence
         self.values = values
+        self.is_complete = True
 
     rule: str = ""
     stated_text: str = ""
     matched_text: str = ""
     confidence: float
-    values: dict[str, str]
\ No newline at end of file
+    values: dict[str, str]
+    # False when more words could still extend the match, such as another phrase or a longer item continuing it
+    is_complete: bool
\ No newline at end of file
@@ -1,50 +1,89 @@
 import json
 import logging
+import multiprocessing
+import os
 import random
 import re
+import sys
+import time
 import typing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from enum import Enum
 
 import num2words
-from rapidfuzz import process
+import numpy
+from rapidfuzz import process, fuzz
 
+from py_speech_service.aho_corasick import AhoCorasick
 from py_speech_service.grammar_element import GrammarRuleElement, GrammarElementType, GrammarElementLookupItem, \
-    GrammarElementMatch
+    GrammarElementMatch, GrammarSlot
 
 
 class GrammarParser:
 
-    phrase_map: dict[str, list[GrammarElementLookupItem]] = {}
-    leading_phrases: list[str] = []
+    def __init__(self):
+        self.clear()
+
+    phrase_map: dict[str, list[GrammarElementLookupItem]]
+    leading_phrases: list[str]
     pattern = re.compile('[^\\w ]+')
-    max_phrase_word_count: int = 0
-    all_words: list[str] = []
+    max_phrase_word_count: int
+    all_words: list[str]
     phrase_replacement_map: dict[str, list[str]]
-    phrase_replacement_regex: str
+    phrase_replacement_matcher: typing.Optional[AhoCorasick]
     replacement_map: dict[str, str]
-    replacement_regex: str
+    replacement_matcher: typing.Optional[AhoCorasick]
     has_replacements: bool = False
     prefix: list[str]
-
-    def set_grammar_file(self, file_path: str):
+    replacement_words: list[str]
+    rule_items: dict[str, list[GrammarElementLookupItem]]
+    rule_words: dict[str, set[str]]
+    disabled_rules: set[str]
+    # Each match along with the best confidence of the candidates that were below the threshold
+    match_cache: OrderedDict[tuple[str, float, float], tuple[typing.Optional[GrammarElementMatch], float]]
+    match_cache_size: int = 512
+    match_cache_hits: int = 0
+    match_cache_misses: int = 0
+    continued_phrases: typing.Optional[set[str]] = None
+    # Seconds spent in each stage of the last find_match or find_best_match call
+    match_timings: dict[str, float]
+    # The best confidence of a candidate that was below the threshold by no more than the margin in the last call, or 0
+    # if none came that close
+    below_threshold_confidence: float = 0
+    below_threshold_margin: float = 20
+    # Compiled slots by their type, key and items, so rules with the same list of items share one slot
+    slot_pool: dict[tuple, GrammarSlot]
+    # Grammars with at least this many rules are compiled by a pool of processes. Each process takes about half a
+    # second to start, and sending the compiled rules back costs about a third as long as compiling them, so the pool
+    # needs both a large grammar and at least 3 processes to finish sooner than compiling serially.
+    parallel_min_rules: int = 5000
+    compile_workers: int = min(8, (os.cpu_count() or 2) - 1) if (os.cpu_count() or 2) > 3 else 1
+    progress_interval: float = 0.1
+
+    def set_grammar_file(self, file_path: str,
+                         progress_callback: typing.Optional[typing.Callable[[int, int], None]] = None):
         with open(file_path, 'r') as fp:
             lines = fp.read()
 
-        self.all_words = []
-        self.replacement_map = {}
-        self.replacement_regex = ""
-        self.phrase_replacement_map = {}
-        self.phrase_replacement_regex = ""
+        self.set_grammar_json(lines, progress_callback)
+        logging.info("Loaded grammar json data file " + file_path)
 
-        json_data = json.loads(lines)
+    def set_grammar_json(self, lines: str,
+                         progress_callback: typing.Optional[typing.Callable[[int, int], None]] = None):
+        self.set_grammar_data(json.loads(lines), progress_callback)
 
-        logging.info("Loaded grammar json data file " + file_path)
+    def set_grammar_data(self, json_data: dict,
+                         progress_callback: typing.Optional[typing.Callable[[int, int], None]] = None):
+        # Anything from a previously loaded grammar is dropped first
+        self.clear()
 
         if "Replacements" in json_data and json_data["Replacements"] and len(json_data["Replacements"]) > 0:
             for find_text, replace_with in json_data["Replacements"].items():
                 find_text_str = str(find_text).lower()
                 replace_with_str = str(replace_with).lower()
                 self.replacement_map[find_text_str] = replace_with_str
-                self.all_words.append(find_text_str)
+                self.replacement_words.append(find_text_str)
 
                 if not self.phrase_replacement_map.__contains__(replace_with_str):
                     self.phrase_replacement_map[replace_with_str] = []
@@ -52,56 +91,354 @@ class GrammarParser:
 
             logging.info("Loaded " + str(len(json_data["Replacements"])) + " replacements")
 
-            sorted_replacement_keys = sorted(self.replacement_map.keys(), key=len, reverse=True)
-            self.replacement_regex = r'(' + '|'.join(map(re.escape, sorted_replacement_keys)) + r')'
+            self.replacement_matcher = AhoCorasick(self.replacement_map.keys())
+            self.phrase_replacement_matcher = AhoCorasick(self.phrase_replacement_map.keys())
 
-            sorted_replacement_keys = sorted(self.phrase_replacement_map.keys(), key=len, reverse=True)
-            self.phrase_replacement_regex = r'\b(' + '|'.join(map(re.escape, sorted_replacement_keys)) + r')\b'
-
-        for rule in json_data["Rules"]:
-            rule_name: str = rule["Key"]
-            self.__parse_rule_element(rule_name, rule)
+        rules = json_data["Rules"]
+        # Daemon processes, such as the recognition worker, aren't allowed to start the compile processes
+        if len(rules) >= self.parallel_min_rules and self.compile_workers > 1 \
+                and not multiprocessing.current_process().daemon:
+            self.__add_rules_in_parallel(json_data.get("Replacements"), rules, progress_callback)
+        else:
+            progress_step = max(100, int(len(rules) * self.progress_interval))
+            for index, rule in enumerate(rules):
+                self.__add_rule(rule)
+                if progress_callback and (index + 1) % progress_step == 0 and index + 1 < len(rules):
+                    progress_callback(index + 1, len(rules))
+        if progress_callback:
+            progress_callback(len(rules), len(rules))
 
-        logging.info("Loaded " + str(len(json_data["Rules"])) + " rules")
+        logging.info("Loaded " + str(len(rules)) + " rules")
 
         if "Prefix" in json_data:
             self.prefix = json_data["Prefix"].lower().split()
         else:
             self.prefix = []
 
-        self.all_words = list(set(self.all_words))
-        updated_words = []
-        for word in self.all_words:
-            updated_words += self.pattern.sub('', word).lower().split()
-        self.all_words = list(set(updated_words))
+        self.__update_all_words()
+        self.clear_match_cache()
+
+    def clear(self):
+        self.phrase_map = {}
+        self.leading_phrases = []
+        self.max_phrase_word_count = 0
+        self.all_words = []
+        self.match_cache = OrderedDict()
+        self.match_cache_hits = 0
+        self.match_cache_misses = 0
+        self.continued_phrases = None
+        self.match_timings = self.__get_empty_match_timings()
+        self.below_threshold_confidence = 0
+        self.replacement_words = []
+        self.rule_items = {}
+        self.rule_words = {}
+        self.disabled_rules = set()
+        self.replacement_map = {}
+        self.replacement_matcher = None
+        self.phrase_replacement_map = {}
+        self.phrase_replacement_matcher = None
+        self.has_replacements = False
+        self.prefix = []
+        self.slot_pool = {}
+
+    def copy(self) -> 'GrammarParser':
+        # Compiled rules aren't changed once parsed, so the copy shares them and only gets its own lookup tables, which
+        # adding, removing, enabling and disabling rules change
+        grammar_parser = GrammarParser()
+        grammar_parser.phrase_map = {phrase: list(items) for phrase, items in self.phrase_map.items()}
+        grammar_parser.leading_phrases = list(self.leading_phrases)
+        grammar_parser.max_phrase_word_count = self.max_phrase_word_count
+        grammar_parser.all_words = list(self.all_words)
+        grammar_parser.match_cache_size = self.match_cache_size
+        grammar_parser.replacement_words = list(self.replacement_words)
+        grammar_parser.rule_items = dict(self.rule_items)
+        grammar_parser.rule_words = dict(self.rule_words)
+        grammar_parser.disabled_rules = set(self.disabled_rules)
+        grammar_parser.replacement_map = self.replacement_map
+        grammar_parser.replacement_matcher = self.replacement_matcher
+        grammar_parser.phrase_replacement_map = self.phrase_replacement_map
+        grammar_parser.phrase_replacement_matcher = self.phrase_replacement_matcher
+        grammar_parser.has_replacements = self.has_replacements
+        grammar_parser.prefix = list(self.prefix)
+        grammar_parser.slot_pool = dict(self.slot_pool)
+        return grammar_parser
+
+    def compile_rules(self, rules: list[dict]) -> list[tuple[str, list[GrammarElementLookupItem], set[str]]]:
+        # Parses the rules without adding them to this parser's lookup tables, so they can be compiled in another
+        # process and merged by the parser that will match against them
+        compiled_rules = []
+        for rule in rules:
+            self.__add_rule(rule)
+            rule_name = sys.intern(str(rule["Key"]))
+            # Each rule is returned on its own, even when an earlier rule had the same key
+            compiled_rules.append((rule_name, self.rule_items.pop(rule_name), self.rule_words.pop(rule_name)))
+            self.phrase_map.clear()
+            self.leading_phrases.clear()
+        return compiled_rules
+
+    def add_rules(self, rules: list[dict]):
+        # Rules with a key that is already loaded replace the existing rule
+        self.remove_rules([rule["Key"] for rule in rules if rule["Key"] in self.rule_items])
+        for rule in rules:
+            self.__add_rule(rule)
+        self.__update_all_words()
+        self.clear_match_cache()
+        logging.info("Added " + str(len(rules)) + " rules")
+
+    def remove_rules(self, rule_names: list[str]):
+        removed_phrases: set[str] = set()
+        for rule_name in rule_names:
+            items = self.rule_items.pop(rule_name, None)
+            self.rule_words.pop(rule_name, None)
+            if items is None:
+                continue
+            if rule_name in self.disabled_rules:
+                self.disabled_rules.remove(rule_name)
+            else:
+                removed_phrases.update(self.__remove_lookup_items(rule_name, items))
+        self.__remove_leading_phrases(removed_phrases)
+        self.__update_all_words()
+        self.clear_match_cache()
+
+    def set_rules_enabled(self, rule_names: list[str], enabled: bool):
+        removed_phrases: set[str] = set()
+        for rule_name in rule_names:
+            items = self.rule_items.get(rule_name)
+            if items is None or (rule_name not in self.disabled_rules) == enabled:
+                continue
+            if enabled:
+                self.disabled_rules.remove(rule_name)
+                for item in items:
+                    self.__add_lookup_item(item)
+            else:
+                self.disabled_rules.add(rule_name)
+                removed_phrases.update(self.__remove_lookup_items(rule_name, items))
+        self.__remove_leading_phrases(removed_phrases)
+        self.__update_all_words()
+        self.clear_match_cache()
 
     def find_match(self, stated_text: str, min_threshold: float = 80, min_prefix_threshold: float = 60):
+        self.match_timings = self.__get_empty_match_timings()
+        self.below_threshold_confidence = 0
+        return self.__copy_match(stated_text,
+                                 self.__find_cached_match(stated_text, min_threshold, min_prefix_threshold))
+
+    def find_partial_match(self, stated_text: str, min_threshold: float = 80, min_prefix_threshold: float = 60):
+        # Matches text that is still being spoken, for early matches and ending utterances early. An optional element
+        # that matches as well as the text before it is taken, since the speaker is likely saying it, so whether the
+        # match is complete accounts for it.
+        self.match_timings = self.__get_empty_match_timings()
+        self.below_threshold_confidence = 0
+        return self.__copy_match(stated_text,
+                                 self.__find_cached_match(stated_text, min_threshold, min_prefix_threshold,
+                                                          is_partial=True))
+
+    def find_best_match(self, stated_texts: list[str], min_threshold: float = 80, min_prefix_threshold: float = 60):
+        # Matches every hypothesis of an utterance and returns the index of the best one along with its match. The
+        # hypotheses usually share most of their words, so the leading phrase lookups they need are done once, in a
+        # single batch.
+        self.match_timings = self.__get_empty_match_timings()
+        self.below_threshold_confidence = 0
+        queries: set[str] = set()
+        for stated_text in stated_texts:
+            search_text = self.pattern.sub('', stated_text).lower().strip()
+            if (search_text, min_threshold, min_prefix_threshold) in self.match_cache:
+                continue
+            search = self.__get_search_words(search_text, min_prefix_threshold)
+            if search is not None:
+                search_words = search[0]
+                queries.update(" ".join(search_words[0:i]) for i in range(len(search_words), 1, -1))
+        start = time.perf_counter()
+        leading_phrase_matches = self.__find_closest_leading_phrases(list(queries))
+        self.__add_match_timing("candidate_search", start)
+
+        best_index = -1
+        best_match = None
+        for index, stated_text in enumerate(stated_texts):
+            match = self.__find_cached_match(stated_text, min_threshold, min_prefix_threshold, leading_phrase_matches)
+            if match is not None and (best_match is None or match.confidence > best_match.confidence):
+                best_index = index
+                best_match = match
+
+        if best_match is None:
+            return -1, None
+        return best_index, self.__copy_match(stated_texts[best_index], best_match)
+
+    def get_memory_stats(self) -> dict:
+        # Estimates the memory used by the loaded grammar. Anything shared between rules is counted for the first rule
+        # that uses it, and the phrase table only counts what isn't already counted for a rule.
+        seen: set[int] = set()
+        bytes_per_rule = {}
+        for rule_name, items in self.rule_items.items():
+            bytes_per_rule[rule_name] = self.__get_size(items, seen) + self.__get_size(self.rule_words.get(rule_name),
+                                                                                     seen)
+        phrase_table_bytes = self.__get_size(self.phrase_map, seen) + self.__get_size(self.leading_phrases, seen)
+        other_bytes = self.__get_size([self.all_words, self.replacement_map, self.replacement_matcher,
+                                       self.phrase_replacement_map, self.phrase_replacement_matcher,
+                                       self.match_cache], seen)
+        rule_bytes = sum(bytes_per_rule.values())
+        return {
+            "rules": len(self.rule_items),
+            "lookup_items": sum(len(items) for items in self.rule_items.values()),
+            "phrases": len(self.phrase_map),
+            "leading_phrases": len(self.leading_phrases),
+            "rule_bytes": rule_bytes,
+            "phrase_table_bytes": phrase_table_bytes,
+            "other_bytes": other_bytes,
+            "total_bytes": rule_bytes + phrase_table_bytes + other_bytes,
+            "bytes_per_rule": bytes_per_rule
+        }
+
+    def get_estimated_bytes(self) -> int:
+        # A quick estimate of the total from get_memory_stats, which walks every object in the grammar and takes too long
+        # for starting recognition with a large grammar. Only the containers are measured, and what they hold is counted
+        # at a typical size.
+        string_bytes = sys.getsizeof("")
+        size = sys.getsizeof(self.phrase_map) + sys.getsizeof(self.leading_phrases) + sys.getsizeof(self.all_words)
+        size += len(self.phrase_map) * (sys.getsizeof([None]) + string_bytes + 32)
+        size += len(self.all_words) * (string_bytes + 8)
+        item_count = 0
+        for rule_name, items in self.rule_items.items():
+            words = self.rule_words.get(rule_name, ())
+            size += sys.getsizeof(items) + sys.getsizeof(words) + len(words) * (string_bytes + 8)
+            item_count += len(items)
+        # Each item usually has its own element, with a list of slots
+        size += item_count * (sys.getsizeof(GrammarElementLookupItem.__new__(GrammarElementLookupItem)) +
+                              sys.getsizeof(GrammarRuleElement()) + sys.getsizeof([]) + 8)
+        for slot in self.slot_pool.values():
+            size += sys.getsizeof(slot) + slot.lengths.nbytes + slot.word_counts.nbytes + slot.extendable.nbytes
+            size += 3 * sys.getsizeof(numpy.zeros(0)) + 2 * sys.getsizeof(slot.texts) + sys.getsizeof(slot.values)
+            size += len(slot.texts) * (2 * string_bytes + 32)
+        return size
+
+    @staticmethod
+    def __get_size(root, seen: set[int]) -> int:
+        size = 0
+        pending = [root]
+        while len(pending) > 0:
+            obj = pending.pop()
+            if obj is None or id(obj) in seen or isinstance(obj, (type, Enum, re.Pattern)):
+                continue
+            seen.add(id(obj))
+            # Includes the data of numpy arrays that own it
+            size += sys.getsizeof(obj)
+            if isinstance(obj, dict):
+                pending.extend(obj.keys())
+                pending.extend(obj.values())
+            elif isinstance(obj, (list, tuple, set, frozenset)):
+                pending.extend(obj)
+            elif isinstance(obj, numpy.ndarray) or isinstance(obj, (str, bytes, int, float, bool)):
+                continue
+            else:
+                if hasattr(obj, "__dict__"):
+                    pending.append(obj.__dict__)
+                for slot in getattr(type(obj), "__slots__", ()):
+                    pending.append(getattr(obj, slot, None))
+        return size
+
+    def __find_cached_match(self, stated_text: str, min_threshold: float, min_prefix_threshold: float,
+                            leading_phrase_matches: typing.Optional[dict] = None, is_partial: bool = False):
         search_text = self.pattern.sub('', stated_text).lower().strip()
-        search_words = search_text.split()
-        search_word_count = len(search_words)
-        if search_word_count > 30:
+        cache_key = (search_text, min_threshold, min_prefix_threshold, is_partial)
+        if cache_key in self.match_cache:
+            self.match_cache.move_to_end(cache_key)
+            self.match_cache_hits += 1
+            cached_match, below_threshold_confidence = self.match_cache[cache_key]
+            self.below_threshold_confidence = max(self.below_threshold_confidence, below_threshold_confidence)
+            return cached_match
+
+        self.match_cache_misses += 1
+        previous_below_threshold_confidence = self.below_threshold_confidence
+        self.below_threshold_confidence = 0
+        cached_match = self.__find_match(search_text, min_threshold, min_prefix_threshold, leading_phrase_matches,
+                                         is_partial)
+        self.match_cache[cache_key] = (cached_match, self.below_threshold_confidence)
+        self.below_threshold_confidence = max(self.below_threshold_confidence, previous_below_threshold_confidence)
+        if len(self.match_cache) > self.match_cache_size:
+            self.match_cache.popitem(last=False)
+        return cached_match
+
+    @staticmethod
+    def __copy_match(stated_text: str, cached_match: typing.Optional[GrammarElementMatch]):
+        if cached_match is None:
             return None
 
-        if len(self.prefix) > 0:
-            prefix_search = " ".join(search_words[:len(self.prefix)])
-            prefix_result = self.__find_closest_sentence([" ".join(self.prefix)], prefix_search)
-            if prefix_result is None:
-                return None
-            if prefix_result[1] < min_prefix_threshold:
-                return None
-            index = 0
-            for word in self.prefix:
-                search_words[index] = word
-                index = index + 1
-            search_text = " ".join(search_words)
-            logging.info("Matched prefix " + " ".join(self.prefix))
+        selected_match = GrammarElementMatch(cached_match.rule, stated_text, cached_match.matched_text,
+                                             cached_match.confidence, dict(cached_match.values))
+        selected_match.is_complete = cached_match.is_complete
+        if selected_match.confidence > 98:
+            selected_match.confidence = selected_match.confidence - random.uniform(0.5, 2.5)
+        return selected_match
+
+    def clear_match_cache(self):
+        self.match_cache = OrderedDict()
+        self.continued_phrases = None
+
+    def get_match_cache_stats(self) -> dict[str, float]:
+        lookups = self.match_cache_hits + self.match_cache_misses
+        return {
+            "size": len(self.match_cache),
+            "hits": self.match_cache_hits,
+            "misses": self.match_cache_misses,
+            "hit_rate": self.match_cache_hits / lookups if lookups > 0 else 0
+        }
+
+    def get_recognizer_phrases(self, max_expanded_phrases: int = 1000) -> list[str]:
+        # Whole phrases for the VOSK grammar, so it can only hear text that is in the grammar. VOSK lets its phrases be
+        # said one after another, so phrases with too many combinations are split into the words before the first key
+        # value and the options of each element after it.
+        phrases: set[str] = set()
+        for rule_name, items in self.rule_items.items():
+            if rule_name in self.disabled_rules:
+                continue
+            for item in items:
+                expanded_phrases = [item.phrase]
+                slots = item.grammar_element.slots if not item.is_full_match else []
+                combination_count = 1
+                for slot in slots:
+                    combination_count *= len(slot.texts) + (1 if slot.type == GrammarElementType.Optional else 0)
+
+                if combination_count <= max_expanded_phrases:
+                    for slot in slots:
+                        options = slot.texts + ([""] if slot.type == GrammarElementType.Optional else [])
+                        expanded_phrases = [phrase + text for phrase in expanded_phrases for text in options]
+                else:
+                    for slot in slots:
+                        expanded_phrases += slot.texts
+
+                for phrase in expanded_phrases:
+                    phrase = " ".join(phrase.split())
+                    if phrase == "":
+                        continue
+                    phrases.add(phrase)
+                    if self.phrase_replacement_matcher:
+                        phrases.update(self.phrase_replacement_matcher.expand(phrase, self.phrase_replacement_map))
+
+        return sorted(phrases) + ["[unk]"]
+
+    def __find_match(self, search_text: str, min_threshold: float, min_prefix_threshold: float,
+                     leading_phrase_matches: typing.Optional[dict] = None, is_partial: bool = False):
+        search = self.__get_search_words(search_text, min_prefix_threshold)
+        if search is None:
+            return None
+        search_words, search_text = search
+        search_word_count = len(search_words)
+
+        start = time.perf_counter()
+        search_queries = self.__build_search_queries(search_words)
 
         possibilities: [(str, float)] = []
         for i in range(search_word_count, 1, -1):
             search_phrase = " ".join(search_words[0:i])
-            search_result = self.__find_closest_sentence(self.leading_phrases, search_phrase)
+            if leading_phrase_matches is not None and search_phrase in leading_phrase_matches:
+                search_result = leading_phrase_matches[search_phrase]
+            else:
+                search_result = self.__find_closest_sentence(self.leading_phrases, search_phrase)
             if search_result is not None and search_result[1] > min_threshold:
                 possibilities.append(search_result)
+            elif search_result is not None:
+                self.__set_below_threshold_confidence(search_result[1], min_threshold)
+        self.__add_match_timing("candidate_search", start)
 
         matches: dict[str, GrammarElementMatch] = {}
         searched_phrases: [str] = []
@@ -116,14 +453,19 @@ class GrammarParser:
             for possible_element in possible_elements:
                 if possible_element.is_full_match:
                     if initial_confidence > min_threshold:
-                        match = GrammarElementMatch(possible_element.rule_name, stated_text, search_phrase, initial_confidence)
+                        match = GrammarElementMatch(possible_element.rule_name, search_text, search_phrase, initial_confidence)
                         matches[match.matched_text] = match
                 else:
-                    best_item = self.__find_best_element(search_text, search_phrase, possible_element)
+                    start = time.perf_counter()
+                    best_item = self.__find_best_element(search_queries, possible_element, is_partial)
+                    self.__add_match_timing("key_value_scoring", start)
                     if best_item is not None and best_item[1] > min_threshold:
-                        match = GrammarElementMatch(possible_element.rule_name, stated_text, best_item[0],
+                        match = GrammarElementMatch(possible_element.rule_name, search_text, best_item[0],
                                                     best_item[1], best_item[2])
+                        match.is_complete = not best_item[3]
                         matches[match.matched_text] = match
+                    elif best_item is not None:
+                        self.__set_below_threshold_confidence(best_item[1], min_threshold)
 
         if len(matches) == 0:
             return None
@@ -133,28 +475,185 @@ class GrammarParser:
                 return None
             selected_match = matches[closest_sentence[0]]
             selected_match.confidence = (closest_sentence[1] + selected_match.confidence) / 2
+            # A match is only complete once nothing more could be said that would change it. That isn't the case
+            # when a chosen item is the start of another item, such as "red" and "red potion", an optional element at
+            # the end was skipped, the text heard so far is shorter than the match, or another phrase continues it.
+            selected_match.is_complete = selected_match.is_complete \
+                and len(search_text.split()) >= len(selected_match.matched_text.split()) \
+                and not self.__is_continued_phrase(selected_match.matched_text)
+
+            if self.replacement_matcher:
+                start = time.perf_counter()
+                selected_match.matched_text = self.replacement_matcher.replace(selected_match.matched_text,
+                                                                               self.replacement_map)
+                self.__add_match_timing("replacements", start)
 
-            if selected_match.confidence > 98:
-                selected_match.confidence = selected_match.confidence - random.uniform(0.5, 2.5)
+            return selected_match
 
-            if self.replacement_regex:
-                selected_match.matched_text = re.sub(self.replacement_regex, lambda regex_match: self.replacement_map[regex_match.group(0)],
-                                     selected_match.matched_text)
+    def __get_search_words(self, search_text: str, min_prefix_threshold: float) -> typing.Optional[tuple[list[str], str]]:
+        search_words = search_text.split()
+        if len(search_words) > 30:
+            return None
 
-            return selected_match
+        if len(self.prefix) > 0:
+            start = time.perf_counter()
+            prefix_search = " ".join(search_words[:len(self.prefix)])
+            prefix_result = self.__find_closest_sentence([" ".join(self.prefix)], prefix_search)
+            self.__add_match_timing("prefix", start)
+            if prefix_result is None:
+                return None
+            if prefix_result[1] < min_prefix_threshold:
+                return None
+            index = 0
+            for word in self.prefix:
+                search_words[index] = word
+                index = index + 1
+            search_text = " ".join(search_words)
+            logging.info("Matched prefix " + " ".join(self.prefix))
+
+        return search_words, search_text
+
+    def __set_below_threshold_confidence(self, confidence: float, min_threshold: float):
+        if confidence >= min_threshold - self.below_threshold_margin:
+            self.below_threshold_confidence = max(self.below_threshold_confidence, confidence)
+
+    def __add_match_timing(self, stage: str, start: float):
+        self.match_timings[stage] += time.perf_counter() - start
+
+    @staticmethod
+    def __get_empty_match_timings() -> dict[str, float]:
+        return {"prefix": 0.0, "candidate_search": 0.0, "key_value_scoring": 0.0, "replacements": 0.0}
+
+    def __find_closest_leading_phrases(self, queries: list[str]) -> dict:
+        # The same as calling __find_closest_sentence with the leading phrases for each query, but the lengths and
+        # squashed text of the leading phrases are only worked out once for all the queries
+        if len(queries) == 0:
+            return {}
+        lengths = numpy.array([len(phrase) for phrase in self.leading_phrases], dtype=numpy.int32)
+        squashed_phrases = [phrase.replace(" ", "") for phrase in self.leading_phrases]
+        squashed_indexes: dict[str, list[int]] = {}
+        for index, squashed_phrase in enumerate(squashed_phrases):
+            squashed_indexes.setdefault(squashed_phrase, []).append(index)
+
+        results = {}
+        for query in queries:
+            indexes = numpy.flatnonzero(numpy.abs(lengths - len(query)) <= 4)
+            response = process.extractOne(query.replace(" ", ""), [squashed_phrases[index] for index in indexes])
+            if response is None:
+                results[query] = None
+                continue
+            # Sentences that squash to the same text resolve to the last of them, as in __find_closest_sentence
+            index = max(index for index in squashed_indexes[response[0]] if abs(lengths[index] - len(query)) <= 4)
+            results[query] = (self.leading_phrases[index], response[1])
+        return results
+
+    def __is_continued_phrase(self, phrase: str) -> bool:
+        if self.continued_phrases is None:
+            continued_phrases: set[str] = set()
+            for leading_phrase in self.leading_phrases:
+                words = leading_phrase.split()
+                for i in range(1, len(words)):
+                    continued_phrases.add(" ".join(words[:i]))
+                if any(not item.is_full_match for item in self.phrase_map[leading_phrase]):
+                    continued_phrases.add(" ".join(words))
+            self.continued_phrases = continued_phrases
+        return phrase in self.continued_phrases
+
+    def __add_rule(self, rule):
+        rule_name: str = sys.intern(str(rule["Key"]))
+        # Grammars can repeat a key, in which case the rules are kept together under it
+        self.rule_items.setdefault(rule_name, [])
+        self.rule_words.setdefault(rule_name, set())
+        self.__parse_rule_element(rule_name, rule)
+
+    def __add_rules_in_parallel(self, replacements: typing.Optional[dict], rules: list[dict],
+                                progress_callback: typing.Optional[typing.Callable[[int, int], None]]):
+        # Rules are split into contiguous shards and merged back in order, so the tables end up the same as when the
+        # rules are compiled one at a time
+        shard_count = min(self.compile_workers * 4, max(1, len(rules) // 250))
+        shard_size = -(-len(rules) // shard_count)
+        shards = [rules[start:start + shard_size] for start in range(0, len(rules), shard_size)]
+        compiled_shards: list[typing.Optional[tuple]] = [None] * len(shards)
+        compiled_count = 0
+
+        # Spawn rather than fork, as forking a process with running gRPC threads is unsafe
+        with ProcessPoolExecutor(max_workers=min(self.compile_workers, len(shards)),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {executor.submit(compile_rule_shard, replacements, shard): index
+                       for index, shard in enumerate(shards)}
+            for future in as_completed(futures):
+                index = futures[future]
+                compiled_shards[index] = future.result()
+                compiled_count += len(shards[index])
+                if progress_callback and compiled_count < len(rules):
+                    progress_callback(compiled_count, len(rules))
+
+        # Slots unpickled from different shards are separate copies, so each shard's pool is merged into this parser's
+        # pool, which later calls to add_rules also reuse, and every slot is swapped for the pooled one
+        for compiled_rules, shard_slot_pool in compiled_shards:
+            pooled_slots: dict[int, GrammarSlot] = {}
+            for pool_key, slot in shard_slot_pool.items():
+                pooled_slots[id(slot)] = self.slot_pool.setdefault(pool_key, slot)
+            for rule_name, items, words in compiled_rules:
+                rule_name = sys.intern(rule_name)
+                self.rule_items.setdefault(rule_name, []).extend(items)
+                self.rule_words.setdefault(rule_name, set()).update(words)
+                elements = set()
+                for item in items:
+                    item.rule_name = rule_name
+                    item.phrase = sys.intern(item.phrase)
+                    if item.word_count > self.max_phrase_word_count:
+                        self.max_phrase_word_count = item.word_count
+                    self.__add_lookup_item(item)
+                    if id(item.grammar_element) not in elements:
+                        elements.add(id(item.grammar_element))
+                        item.grammar_element.rule = rule_name
+                        item.grammar_element.slots = [pooled_slots[id(slot)] for slot in item.grammar_element.slots]
+
+    def __add_lookup_item(self, match_details: GrammarElementLookupItem):
+        phrase = match_details.phrase
+        if self.phrase_map.__contains__(phrase):
+            self.phrase_map[phrase].append(match_details)
+        else:
+            self.phrase_map[phrase] = [ match_details ]
+            self.leading_phrases.append(phrase)
+
+    def __remove_lookup_items(self, rule_name: str, items: list[GrammarElementLookupItem]) -> set[str]:
+        emptied_phrases: set[str] = set()
+        for phrase in set(item.phrase for item in items):
+            remaining = [item for item in self.phrase_map.get(phrase, []) if item.rule_name != rule_name]
+            if len(remaining) > 0:
+                self.phrase_map[phrase] = remaining
+            else:
+                self.phrase_map.pop(phrase, None)
+                emptied_phrases.add(phrase)
+        return emptied_phrases
+
+    def __remove_leading_phrases(self, phrases: set[str]):
+        if len(phrases) > 0:
+            self.leading_phrases = [phrase for phrase in self.leading_phrases if phrase not in phrases]
+
+    def __update_all_words(self):
+        words: set[str] = set()
+        for word in self.replacement_words:
+            words.update(self.pattern.sub('', word).lower().split())
+        for rule_name, rule_words in self.rule_words.items():
+            if rule_name not in self.disabled_rules:
+                words.update(rule_words)
+        self.all_words = list(words)
 
     def __parse_rule_element(self, rule_name: str, rule_element):
 
-        element = GrammarRuleElement()
-        element.rule = rule_name
-        element.data = []
+        element = GrammarRuleElement(rule_name)
+        # The JSON is only needed until the slots are compiled, so it isn't kept on the element
+        element_data = []
         element_phrases: list[str] = [""]
 
         is_exact: bool = True
         words = []
 
         for sub_element_json in rule_element['Data']:
-            element.data.append(sub_element_json)
+            element_data.append(sub_element_json)
 
             element_type: GrammarElementType = GrammarElementType(sub_element_json['Type'])
 
@@ -183,12 +682,10 @@ class GrammarParser:
                         key = num2words.num2words(key).replace("-", " ")
                     key = str(key).lower()
 
-                    if self.phrase_replacement_regex:
-                        match = re.search(self.phrase_replacement_regex, key)
-                        if match:
-                            replacements = self.phrase_replacement_map[match.group()]
-                            for replacement in replacements:
-                                new_key = str(key).replace(match.group(), replacement)
+                    if self.phrase_replacement_matcher:
+                        new_keys = self.phrase_replacement_matcher.expand(key, self.phrase_replacement_map)
+                        if new_keys[0] != key:
+                            for new_key in new_keys:
                                 items.append({ "Key": new_key, "Value" : key_value_json['Value']})
                                 words.append(new_key)
                         else:
@@ -204,19 +701,21 @@ class GrammarParser:
                     self.__parse_rule_element(rule_name, grammar_list_item)
                 return
 
-        self.all_words += words
+        if not is_exact:
+            element.slots = self.__compile_slots(element_data)
+        for word in words:
+            self.rule_words[rule_name].update(self.pattern.sub('', word).lower().split())
         for phrase in element_phrases:
+            # The same phrase in several rules is stored once
+            phrase = sys.intern(phrase)
             match_details = GrammarElementLookupItem(rule_name, phrase, element, is_exact)
             word_count = len(phrase.split())
             if phrase.strip() == "" or word_count < 2:
                 continue
             if word_count > self.max_phrase_word_count:
                 self.max_phrase_word_count = word_count
-            if self.phrase_map.__contains__(phrase):
-                self.phrase_map[phrase].append(match_details)
-            else:
-                self.phrase_map[phrase] = [ match_details ]
-                self.leading_phrases.append(phrase)
+            self.rule_items[rule_name].append(match_details)
+            self.__add_lookup_item(match_details)
 
     def __permutate_elements(self, initial_items: [str], additional_items: [str]):
         initial_count = len(initial_items)
@@ -232,38 +731,28 @@ class GrammarParser:
                 index = index + 1
         return to_return
 
-    def __find_best_element(self, search_text: str, current_phrase: str, element: GrammarElementLookupItem):
-        hit_key_value = False
-        search_phrase = current_phrase
-        selected_values: dict[str, str] = {}
-        confidence = 0
-        search_words = search_text.split()
-
-        for sub_element_json in element.grammar_element.data:
+    def __compile_slots(self, element_data: list) -> list[GrammarSlot]:
+        slots: list[GrammarSlot] = []
+        for sub_element_json in element_data:
             element_type: GrammarElementType = GrammarElementType(sub_element_json['Type'])
-            if not hit_key_value:
-                if element_type == GrammarElementType.KeyValue:
-                    hit_key_value = True
-                else:
-                    continue
+            if len(slots) == 0 and element_type != GrammarElementType.KeyValue:
+                continue
 
+            if element_type == GrammarElementType.KeyValue:
+                pool_key = (element_type, str(sub_element_json['Key']),
+                            tuple((str(item['Key']), str(item['Value'])) for item in sub_element_json['Data']))
+            elif element_type == GrammarElementType.String:
+                pool_key = (element_type, str(sub_element_json['Key']), sub_element_json['Data'])
+            else:
+                pool_key = (element_type, str(sub_element_json['Key']), tuple(sub_element_json['Data']))
+            slot = self.slot_pool.get(pool_key)
+            if slot is not None:
+                slots.append(slot)
+                continue
+
+            slot = GrammarSlot(element_type, sys.intern(str(sub_element_json['Key'])))
             if element_type == GrammarElementType.String:
-                text = self.pattern.sub('', sub_element_json['Data'].strip() + " ").lower()
-                search_phrase += text
-            elif element_type == GrammarElementType.OneOf:
-                items: [str] = sub_element_json['Data']
-                match = self.__find_best_element_sub_phrase(search_phrase, search_words, items)
-                if match is None:
-                    return None
-                else:
-                    search_phrase = match[0]
-                    confidence = match[1]
-            elif element_type == GrammarElementType.Optional:
-                items: [str] = sub_element_json['Data']
-                match = self.__find_best_element_sub_phrase(search_phrase, search_words, items)
-                if match is not None and match[1] > confidence:
-                    search_phrase = match[0]
-                    confidence = match[1]
+                self.__set_slot_items(slot, [sub_element_json['Data']])
             elif element_type == GrammarElementType.KeyValue:
                 keys: [str] = []
                 key_values: dict[str, str] = {}
@@ -273,52 +762,143 @@ class GrammarParser:
                         key = num2words.num2words(key).replace("-", " ")
                     keys.append(key)
                     key_values[key] = key_value_json['Value']
-                match = self.__find_best_element_sub_phrase(search_phrase, search_words, keys)
-                if match is None:
-                    return None
-                else:
-                    search_phrase = match[0]
-                    confidence = match[1]
-                    selected_values[str(sub_element_json['Key'])] = str(key_values[match[2]])
+                self.__set_slot_items(slot, keys)
+                # Later items with the same text win, so each candidate gets the value of the last duplicate
+                text_keys: dict[str, str] = {}
+                for text, key in zip(slot.texts, keys):
+                    text_keys[text] = key
+                slot.values = [sys.intern(str(key_values[text_keys[text]])) for text in slot.texts]
+            else:
+                self.__set_slot_items(slot, sub_element_json['Data'])
+            self.slot_pool[pool_key] = slot
+            slots.append(slot)
+        return slots
+
+    def __set_slot_items(self, slot: GrammarSlot, items: [str]):
+        slot.texts = [sys.intern(self.pattern.sub('', item.strip() + " ").lower()) for item in items]
+        slot.squashed_texts = [sys.intern(text.replace(" ", "")) for text in slot.texts]
+        slot.lengths = numpy.array([len(text) for text in slot.texts], dtype=numpy.int32)
+        slot.word_counts = numpy.array([len(text.split()) for text in slot.texts], dtype=numpy.int32)
+        if len(slot.texts) > 0:
+            slot.min_word_count = int(slot.word_counts.min())
+            slot.max_word_count = int(slot.word_counts.max())
+
+        groups: dict[str, list[int]] = {}
+        for index, squashed_text in enumerate(slot.squashed_texts):
+            groups.setdefault(squashed_text, []).append(index)
+        group_tuples = {squashed_text: tuple(indexes) for squashed_text, indexes in groups.items()}
+        slot.squashed_groups = [group_tuples[squashed_text] for squashed_text in slot.squashed_texts]
+
+        # Texts that start with another text sort straight after it, so only neighbours need to be compared
+        sorted_texts = sorted(set(slot.texts))
+        extended_texts = {text for text, next_text in zip(sorted_texts, sorted_texts[1:]) if next_text.startswith(text)}
+        slot.extendable = numpy.array([text in extended_texts for text in slot.texts], dtype=bool)
+
+    @staticmethod
+    def __build_search_queries(search_words: [str]) -> (list[int], list[str]):
+        # Lengths and squashed text of the first n heard words for every n, shared by all slot lookups
+        lengths = [0]
+        squashed = [""]
+        for word in search_words:
+            lengths.append(lengths[-1] + len(word) + (1 if len(lengths) > 1 else 0))
+            squashed.append(squashed[-1] + word)
+        return lengths, squashed
+
+    def __find_best_element(self, search_queries: (list[int], list[str]), element: GrammarElementLookupItem,
+                            is_partial: bool = False):
+        search_phrase = element.phrase
+        squashed_phrase = search_phrase.replace(" ", "")
+        phrase_word_count = element.word_count
+        selected_values: dict[str, str] = {}
+        confidence = 0
+        # Whether more words could still change the match, because the last item chosen is the start of another item
+        # or an optional element was skipped after it
+        can_continue = False
+
+        for slot in element.grammar_element.slots:
+            if slot.type == GrammarElementType.String:
+                search_phrase += slot.texts[0]
+                squashed_phrase += slot.squashed_texts[0]
+                phrase_word_count += int(slot.word_counts[0])
+                can_continue = False
+                continue
+
+            match = self.__find_best_slot_item(search_queries, search_phrase, squashed_phrase, phrase_word_count, slot)
+            if match is None:
+                if slot.type == GrammarElementType.Optional:
+                    can_continue = True
+                    continue
+                return None
+            index, match_confidence = match
+            # Final results skip an optional element that only matches as well as the text before it
+            if slot.type == GrammarElementType.Optional and \
+                    (match_confidence < confidence or (match_confidence == confidence and not is_partial)):
+                can_continue = True
+                continue
+
+            if not search_phrase.endswith(" "):
+                search_phrase += " "
+            search_phrase += slot.texts[index]
+            squashed_phrase += slot.squashed_texts[index]
+            phrase_word_count += int(slot.word_counts[index])
+            confidence = match_confidence
+            can_continue = bool(slot.extendable[index])
+            if slot.type == GrammarElementType.KeyValue:
+                selected_values[slot.key] = slot.values[index]
 
-        return search_phrase, confidence, selected_values
+        return search_phrase, confidence, selected_values, can_continue
 
-    def __find_best_element_sub_phrase(self, search_phrase: str, search_words: [str], items: [str]):
+    @staticmethod
+    def __find_best_slot_item(search_queries: (list[int], list[str]), search_phrase: str, squashed_phrase: str,
+                              phrase_word_count: int, slot: GrammarSlot):
+        if len(slot.texts) == 0:
+            return None
         if not search_phrase.endswith(" "):
             search_phrase = search_phrase + " "
-        possible_phrases: [str] = []
-        phrase_addition_map: dict[str, str] = {}
-        max_word_count = 0
-        min_word_count = 10000
-        for item in items:
-            text = self.pattern.sub('', item.strip() + " ").lower()
-            new_phrase = search_phrase + text
-            possible_phrases.append(new_phrase)
-            phrase_addition_map[new_phrase] = item
-            new_phrase_word_count = len(new_phrase.split())
-            if new_phrase_word_count < min_word_count:
-                min_word_count = new_phrase_word_count
-            if new_phrase_word_count > max_word_count:
-                max_word_count = new_phrase_word_count
 
-        best_result = None
-        previous_search_phrase = ""
-        for num_words in range(min_word_count, max_word_count+2):
-            new_search_phrase = " ".join(search_words[0:num_words])
-            if new_search_phrase == previous_search_phrase:
+        query_lengths, query_squashed = search_queries
+        max_query_words = len(query_lengths) - 1
+        query_word_counts: list[int] = []
+        previous_word_count = 0
+        for num_words in range(phrase_word_count + slot.min_word_count, phrase_word_count + slot.max_word_count + 2):
+            word_count = min(num_words, max_query_words)
+            if word_count == previous_word_count:
                 break
-            previous_search_phrase = new_search_phrase
-            result = self.__find_closest_sentence(possible_phrases, new_search_phrase)
-            if result is not None:
-                if best_result is None:
-                    best_result = result
-                elif result[1] >= best_result[1] - 2:
-                    best_result = result
+            previous_word_count = word_count
+            query_word_counts.append(word_count)
+
+        if len(query_word_counts) == 0:
+            return None
+
+        # Same length filter as __find_closest_sentence, evaluated for every query and candidate at once
+        candidate_lengths = slot.lengths + len(search_phrase)
+        lengths = numpy.array([query_lengths[word_count] for word_count in query_word_counts], dtype=numpy.int32)
+        allowed = numpy.abs(candidate_lengths[numpy.newaxis, :] - lengths[:, numpy.newaxis]) <= 4
+        candidate_indexes = numpy.flatnonzero(allowed.any(axis=0))
+        if len(candidate_indexes) == 0:
+            return None
+
+        candidates = [squashed_phrase + slot.squashed_texts[index] for index in candidate_indexes]
+        queries = [query_squashed[word_count] for word_count in query_word_counts]
+        scores = process.cdist(queries, candidates, scorer=fuzz.WRatio)
+        scores = numpy.where(allowed[:, candidate_indexes], scores, -1)
+
+        best_result = None
+        for row_index, row in enumerate(scores):
+            column = int(numpy.argmax(row))
+            score = float(row[column])
+            if score < 0:
+                continue
+            if best_result is None or score >= best_result[1] - 2:
+                # Candidates with the same squashed text score the same, and the last allowed one is the one kept
+                index = next(index for index in reversed(slot.squashed_groups[candidate_indexes[column]])
+                             if allowed[row_index, index])
+                best_result = (index, score)
 
         if best_result is None:
             return None
 
-        return best_result[0], best_result[1], phrase_addition_map[best_result[0]]
+        return best_result[0], best_result[1]
 
     def __find_closest_sentence(self, sentences: [str], query: str) -> (str, float):
         filtered_sentences = self.__filter_by_length(sentences, query)
@@ -343,3 +923,14 @@ class GrammarParser:
         if times < 1:
             return []  # Return an empty list if times is less than 1
         return [element for element in items for _ in range(times)]
+
+
+def compile_rule_shard(replacements: typing.Optional[dict], rules: list[dict]) \
+        -> tuple[list[tuple[str, list[GrammarElementLookupItem], set[str]]], dict[tuple, GrammarSlot]]:
+    # Runs in a compile process, which needs the replacements as they change how KeyValue items are expanded. The slot
+    # pool is returned along with the rules, so the slots keep being shared once they are merged.
+    parser = GrammarParser()
+    parser.compile_workers = 1
+    parser.set_grammar_data({"Replacements": replacements, "Rules": []})
+    compiled_rules = parser.compile_rules(rules)
+    return compiled_rules, parser.slot_pool
@@ -0,0 +1,174 @@
+import copy
+import time
+import tracemalloc
+
+import numpy
+
+from py_speech_service.grammar_benchmark import GrammarBenchmark
+from py_speech_service.grammar_element import GrammarElementType
+from py_speech_service.grammar_parser import GrammarParser
+
+
+class GrammarStats:
+    # Reports what each rule in a grammar costs, so rules that expand into too many phrases can be found before the
+    # grammar is used for speech recognition
+
+    def __init__(self, samples_per_rule: int = 10, noise: float = 0.1, max_expanded_phrases: int = 10000,
+                 max_lookup_phrases: int = 1000, max_key_values: int = 1000, max_latency_ms: float = 20,
+                 seed: int = 0):
+        self.samples_per_rule = samples_per_rule
+        self.noise = noise
+        self.max_expanded_phrases = max_expanded_phrases
+        self.max_lookup_phrases = max_lookup_phrases
+        self.max_key_values = max_key_values
+        self.max_latency_ms = max_latency_ms
+        self.seed = seed
+
+    samples_per_rule: int
+    noise: float
+    max_expanded_phrases: int
+    max_lookup_phrases: int
+    max_key_values: int
+    max_latency_ms: float
+    seed: int
+
+    def analyze(self, grammar: dict, top: int = 10) -> dict:
+        rules = grammar["Rules"]
+        base_grammar = {key: value for key, value in grammar.items() if key != "Rules"}
+        base_grammar["Rules"] = []
+
+        # Each rule is compiled on its own, without adding it to the lookup tables and vocabulary that adding rules
+        # rebuilds, so its time doesn't depend on how many rules came before it. The parser changes the rules it is
+        # given, so it is always given copies.
+        parse_seconds = {}
+        compiler = GrammarParser()
+        compiler.set_grammar_data(base_grammar)
+        for rule in rules:
+            rule_copy = copy.deepcopy(rule)
+            parse_start = time.perf_counter()
+            compiler.compile_rules([rule_copy])
+            parse_seconds[rule["Key"]] = parse_seconds.get(rule["Key"], 0) + time.perf_counter() - parse_start
+
+        # Memory is measured by compiling the rules again with tracing on, since tracing slows the parsing down. The
+        # compiled rules are kept until the end, so what each one holds on to is still allocated.
+        memory_bytes = {}
+        compiled_rules = []
+        compiler = GrammarParser()
+        compiler.set_grammar_data(base_grammar)
+        tracemalloc.start()
+        for rule in rules:
+            rule_copy = copy.deepcopy(rule)
+            memory_before = tracemalloc.get_traced_memory()[0]
+            compiled_rules.extend(compiler.compile_rules([rule_copy]))
+            memory_bytes[rule["Key"]] = memory_bytes.get(rule["Key"], 0) + tracemalloc.get_traced_memory()[0] - \
+                memory_before
+        tracemalloc.stop()
+        compiled_rules.clear()
+
+        # The grammar is then loaded the way the service loads it, which builds the vocabulary once
+        grammar_parser = GrammarParser()
+        grammar_parser.set_grammar_data(copy.deepcopy(grammar))
+
+        latencies = self.__measure_latencies(grammar, grammar_parser)
+
+        rule_stats = []
+        for rule in rules:
+            name = rule["Key"]
+            expanded_phrases, key_values = self.__count_phrases(rule["Data"], grammar_parser)
+            rule_latencies = latencies.get(name, [])
+            stats = {
+                "rule": name,
+                "expanded_phrases": expanded_phrases,
+                "lookup_phrases": len(grammar_parser.rule_items.get(name, [])),
+                "key_values": key_values,
+                "vocabulary": len(grammar_parser.rule_words.get(name, [])),
+                "memory_kb": round(memory_bytes[name] / 1024, 1),
+                "parse_ms": round(parse_seconds[name] * 1000, 3),
+                "match_p50_ms": round(float(numpy.percentile(rule_latencies, 50)) * 1000, 3)
+                if len(rule_latencies) > 0 else 0,
+                "match_max_ms": round(float(numpy.max(rule_latencies)) * 1000, 3) if len(rule_latencies) > 0 else 0,
+            }
+            stats["warnings"] = self.__get_warnings(stats)
+            rule_stats.append(stats)
+
+        rule_stats.sort(key=lambda stats: stats["expanded_phrases"], reverse=True)
+        return {
+            "rules": len(rules),
+            "replacements": len(grammar.get("Replacements", {}) or {}),
+            "expanded_phrases": sum(stats["expanded_phrases"] for stats in rule_stats),
+            "lookup_phrases": sum(len(items) for items in grammar_parser.rule_items.values()),
+            "leading_phrases": len(grammar_parser.leading_phrases),
+            "vocabulary": len(grammar_parser.all_words),
+            "memory_kb": round(sum(memory_bytes.values()) / 1024, 1),
+            "parse_ms": round(sum(parse_seconds.values()) * 1000, 3),
+            "largest_rules": [stats["rule"] for stats in rule_stats[:top]],
+            "slowest_rules": [stats["rule"] for stats in
+                              sorted(rule_stats, key=lambda stats: stats["match_p50_ms"], reverse=True)[:top]],
+            "flagged_rules": [stats["rule"] for stats in rule_stats if len(stats["warnings"]) > 0],
+            "rule_stats": rule_stats
+        }
+
+    def __measure_latencies(self, grammar: dict, grammar_parser: GrammarParser) -> dict[str, list[float]]:
+        # Each rule gets its own sample phrases, and the time to match them is attributed to that rule
+        match_cache_size = grammar_parser.match_cache_size
+        grammar_parser.match_cache_size = 0
+        benchmark = GrammarBenchmark(utterance_count=self.samples_per_rule, noise=self.noise, negative_ratio=0,
+                                     seed=self.seed)
+        latencies = {}
+        for rule in grammar["Rules"]:
+            rule_latencies = []
+            for utterance in benchmark.generate_corpus({"Rules": [rule],
+                                                        "Replacements": grammar.get("Replacements", {}) or {}}):
+                match_start = time.perf_counter()
+                grammar_parser.find_match(utterance["text"])
+                rule_latencies.append(time.perf_counter() - match_start)
+            latencies[rule["Key"]] = rule_latencies
+        grammar_parser.match_cache_size = match_cache_size
+        grammar_parser.clear_match_cache()
+        return latencies
+
+    def __count_phrases(self, elements: list[dict], grammar_parser: GrammarParser) -> (int, int):
+        phrase_count = 1
+        key_value_count = 0
+        for element in elements:
+            element_type = GrammarElementType(element["Type"])
+            if element_type == GrammarElementType.OneOf:
+                phrase_count *= max(len(element["Data"]), 1)
+            elif element_type == GrammarElementType.Optional:
+                phrase_count *= len(element["Data"]) + 1
+            elif element_type == GrammarElementType.KeyValue:
+                # Replacements turn a key into every combination of the ways it can be heard
+                keys = 0
+                for item in element["Data"]:
+                    key = str(item["Key"]).lower()
+                    if grammar_parser.phrase_replacement_matcher:
+                        keys += len(grammar_parser.phrase_replacement_matcher.expand(
+                            key, grammar_parser.phrase_replacement_map))
+                    else:
+                        keys += 1
+                phrase_count *= max(keys, 1)
+                key_value_count += keys
+            elif element_type == GrammarElementType.GrammarElementList:
+                # Matches the parser, which only uses the nested lists of a rule once it finds them
+                phrase_count = 0
+                for item in element["Data"]:
+                    item_phrases, item_key_values = self.__count_phrases(item["Data"], grammar_parser)
+                    phrase_count += item_phrases
+                    key_value_count += item_key_values
+                return phrase_count, key_value_count
+        return phrase_count, key_value_count
+
+    def __get_warnings(self, stats: dict) -> list[str]:
+        warnings = []
+        if stats["expanded_phrases"] > self.max_expanded_phrases:
+            warnings.append("Expands into " + str(stats["expanded_phrases"]) + " phrases. Consider replacing "
+                            "OneOf and Optional elements with a KeyValue element or splitting the rule.")
+        if stats["lookup_phrases"] > self.max_lookup_phrases:
+            warnings.append("Has " + str(stats["lookup_phrases"]) + " lookup phrases, which are all compared "
+                            "against everything that is heard. Consider moving OneOf and Optional elements after "
+                            "the first KeyValue element.")
+        if stats["key_values"] > self.max_key_values:
+            warnings.append("Has " + str(stats["key_values"]) + " key values after replacements are applied.")
+        if stats["match_p50_ms"] > self.max_latency_ms:
+            warnings.append("Takes " + str(stats["match_p50_ms"]) + "ms to match.")
+        return warnings
@@ -6,10 +6,13 @@ import sys
 import time
 import traceback
 from asyncio import Server, Queue
+from typing import Optional
 
 from grpc import aio
 
 from py_speech_service import speech_service_pb2_grpc, speech_service_pb2
+from py_speech_service.recognition_metrics import RecognitionMetrics
+from py_speech_service.recognition_worker import RecognitionWorker
 from py_speech_service.speaker import Speaker, SpeechSettings
 from py_speech_service.speech_recognition import SpeechRecognition
 from py_speech_service.version import Version
@@ -18,16 +21,23 @@ from py_speech_service.version import Version
 class GrpcServer:
 
     speaker: Speaker
-    speech_recognition: SpeechRecognition
+    sessions: dict[str, SpeechRecognition | RecognitionWorker]
+    max_sessions: int = 8
+    # How long writing speech recognized responses to the stream takes, which is added to each session's metrics
+    emit_metrics: RecognitionMetrics
     server: Server
     shutdown_event = asyncio.Event()
     response_queue = Queue()
     speech_initialized = False
     last_message = time.time()
 
-    def __init__(self):
+    def __init__(self, preload_vosk_model: bool = False, vosk_model: Optional[str] = None):
         self.speaker = Speaker()
-        self.speech_recognition = SpeechRecognition()
+        self.sessions = {}
+        self.emit_metrics = RecognitionMetrics()
+        self.speaker.add_speaking_listener(self.__set_speaking)
+        if preload_vosk_model:
+            SpeechRecognition.model_manager.preload(vosk_model)
 
     async def start(self):
         server = aio.server()
@@ -47,14 +57,15 @@ class GrpcServer:
         self.speaker.start()
         await self.shutdown_event.wait()
         self.speaker.shutdown()
-        if self.speech_recognition:
-            self.speech_recognition.shutdown()
+        for session in self.sessions.values():
+            session.shutdown()
         await server.stop(5)
         time.sleep(1)
 
     async def StartSpeechService(self, request_iterator, context):
         self.speaker.set_grpc_response_queue(self.response_queue)
-        self.speech_recognition.set_grpc_response_queue(self.response_queue)
+        for session in self.sessions.values():
+            session.set_grpc_response_queue(self.response_queue)
         asyncio.create_task(self.process_queue(context))
         self.last_message = time.time()
 
@@ -62,7 +73,8 @@ class GrpcServer:
             try:
                 self.last_message = time.time()
 
-                logging.debug(str(request))
+                if not request.HasField("client_audio"):
+                    logging.debug(str(request))
 
                 if request.HasField("start_speech_recognition"):
                     logging.info("Received gRPC start_speech_recognition request")
@@ -72,12 +84,65 @@ class GrpcServer:
                     grammar_file = request.start_speech_recognition.grammar_file if hasattr(request.start_speech_recognition, "grammar_file") else None
                     required_confidence = request.start_speech_recognition.required_confidence if hasattr(request.start_speech_recognition, "required_confidence") else 80
 
-                    successful = self.speech_recognition.set_speech_recognition_details(grammar_file, vosk_model, required_confidence)
+                    early_match = request.start_speech_recognition.early_match
+                    voice_activity_detection = request.start_speech_recognition.voice_activity_detection if request.start_speech_recognition.HasField("voice_activity_detection") else False
+
+                    input_channels = request.start_speech_recognition.input_channels
+                    record_file = request.start_speech_recognition.record_file
+                    wake_prefix = request.start_speech_recognition.wake_prefix
+                    wake_prefix_timeout = request.start_speech_recognition.wake_prefix_timeout
+                    phrase_grammar = request.start_speech_recognition.phrase_grammar
+                    max_alternatives = request.start_speech_recognition.max_alternatives
+                    endpoint_silence = request.start_speech_recognition.endpoint_silence
+                    max_utterance_length = request.start_speech_recognition.max_utterance_length
+                    grammar_endpoint = request.start_speech_recognition.grammar_endpoint
+
+                    client_sample_rate, client_channels, client_buffer_seconds = (0, 1, 5)
+                    if request.start_speech_recognition.HasField("client_audio"):
+                        client_sample_rate = request.start_speech_recognition.client_audio.sample_rate
+                        client_channels = request.start_speech_recognition.client_audio.channels
+                        client_buffer_seconds = request.start_speech_recognition.client_audio.buffer_seconds
+
+                    speaking_mode = request.start_speech_recognition.speaking_mode
+                    speaking_tail_seconds = request.start_speech_recognition.speaking_tail_seconds
+
+                    input_device = request.start_speech_recognition.input_device if request.start_speech_recognition.HasField("input_device") else None
+
+                    grammar_data = request.start_speech_recognition.grammar_data
+                    grammar_compression = request.start_speech_recognition.grammar_compression
+                    grammar_hash = request.start_speech_recognition.grammar_hash
+
+                    session_id = request.start_speech_recognition.session_id
+                    speech_recognition = self.__get_session(session_id, request.start_speech_recognition.separate_process)
+                    if speech_recognition is None:
+                        response = speech_service_pb2.SpeechServiceResponse()
+                        response.error.error_message = "Unable to start speech recognition session " + session_id + " as " + str(self.max_sessions) + " sessions are already running"
+                        await self.response_queue.put(response)
+                        response = speech_service_pb2.SpeechServiceResponse()
+                        response.speech_recognition_started.successful = False
+                        response.speech_recognition_started.session_id = session_id
+                        await self.response_queue.put(response)
+                        continue
+
+                    if not grammar_file and not grammar_data and not speech_recognition.has_cached_grammar(grammar_hash):
+                        # The client can start again with the grammar itself
+                        logging.info("Grammar " + grammar_hash + " is not cached")
+                        response = speech_service_pb2.SpeechServiceResponse()
+                        response.speech_recognition_started.successful = False
+                        response.speech_recognition_started.session_id = session_id
+                        response.speech_recognition_started.grammar_hash = grammar_hash
+                        response.speech_recognition_started.grammar_not_cached = True
+                        await self.response_queue.put(response)
+                        continue
+
+                    # Large grammars take a while to compile, so it is done off the event loop
+                    successful = await asyncio.to_thread(speech_recognition.set_speech_recognition_details, grammar_file, vosk_model, required_confidence, early_match, voice_activity_detection, input_channels, record_file, wake_prefix, wake_prefix_timeout, phrase_grammar, max_alternatives, endpoint_silence, max_utterance_length, grammar_endpoint, client_sample_rate, client_channels, client_buffer_seconds, speaking_mode, speaking_tail_seconds, input_device, grammar_data, grammar_compression, grammar_hash)
                     if successful:
-                        asyncio.create_task(self.speech_recognition.start_speech_recognition(context))
+                        asyncio.create_task(speech_recognition.start_speech_recognition(context))
                     else:
                         response = speech_service_pb2.SpeechServiceResponse()
                         response.speech_recognition_started.successful = False
+                        response.speech_recognition_started.session_id = session_id
                         await self.response_queue.put(response)
 
                 elif request.HasField("set_speech_settings"):
@@ -131,7 +196,36 @@ class GrpcServer:
                     await self.response_queue.put(response)
                 elif request.HasField("stop_speech_recognition"):
                     print("Received stop speech recognition request")
-                    self.speech_recognition.stop_speech_recognition()
+                    session = self.sessions.pop(request.stop_speech_recognition.session_id, None)
+                    if session is not None:
+                        session.stop_speech_recognition()
+                        session.shutdown()
+                elif request.HasField("update_speech_recognition_grammar"):
+                    logging.info("Received gRPC update_speech_recognition_grammar request")
+                    print("Received gRPC update_speech_recognition_grammar request")
+
+                    update_request = request.update_speech_recognition_grammar
+                    session = self.sessions.get(update_request.session_id)
+                    response = speech_service_pb2.SpeechServiceResponse()
+                    response.speech_recognition_grammar_updated.successful = session is not None and session.update_grammar(
+                        update_request.add_rules, update_request.remove_rules, update_request.enable_rules,
+                        update_request.disable_rules)
+                    response.speech_recognition_grammar_updated.session_id = update_request.session_id
+                    await self.response_queue.put(response)
+                elif request.HasField("client_audio"):
+                    session = self.sessions.get(request.client_audio.session_id)
+                    if session is not None:
+                        session.add_client_audio(request.client_audio.audio, request.client_audio.sequence,
+                                                 request.client_audio.end_of_stream)
+                elif request.HasField("get_recognition_metrics"):
+                    logging.info("Received gRPC get_recognition_metrics request")
+                    session = self.sessions.get(request.get_recognition_metrics.session_id)
+                    if session is not None:
+                        session.send_recognition_metrics()
+                    else:
+                        response = speech_service_pb2.SpeechServiceResponse()
+                        response.error.error_message = "No speech recognition session \"" + request.get_recognition_metrics.session_id + "\" is running"
+                        await self.response_queue.put(response)
                 elif request.HasField("set_volume"):
                     logging.info("Received set volume request")
                     self.speaker.set_volume(request.set_volume.volume)
@@ -150,10 +244,38 @@ class GrpcServer:
 
         self.shutdown_event.set()
 
+    def __get_session(self, session_id: str, separate_process: bool) -> Optional[SpeechRecognition | RecognitionWorker]:
+        session = self.sessions.get(session_id)
+        if session is not None and isinstance(session, RecognitionWorker) == separate_process:
+            return session
+        if session is None and len(self.sessions) >= self.max_sessions:
+            return None
+        if session is not None:
+            # Switching between running in this process and a separate process replaces the session
+            session.stop_speech_recognition()
+            session.shutdown()
+
+        session = RecognitionWorker(session_id) if separate_process else SpeechRecognition(session_id)
+        session.set_grpc_response_queue(self.response_queue)
+        session.set_speaking(self.speaker.is_speaking)
+        self.sessions[session_id] = session
+        logging.info("Created speech recognition session \"" + session_id + "\"")
+        return session
+
+    def __set_speaking(self, is_speaking: bool):
+        for session in self.sessions.values():
+            session.set_speaking(is_speaking)
+
     async def process_queue(self, context):
         while not self.shutdown_event.is_set():
             response = await self.response_queue.get()
+            if response.HasField("recognition_metrics"):
+                for stage, stage_stats in self.emit_metrics.get_stage_stats().items():
+                    response.recognition_metrics.stages[stage].CopyFrom(speech_service_pb2.StageLatency(**stage_stats))
+            write_start = time.perf_counter()
             await context.write(response)
+            if response.HasField("speech_recognized"):
+                self.emit_metrics.add_latency("grpc_emit", time.perf_counter() - write_start)
 
     async def monitor(self):
         logging.info("Starting monitor")
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from platformdirs import user_data_dir
+from vosk import Model
+
+from py_speech_service.downloader import get_json_data, download_and_extract
+
+
+class ModelManager:
+
+    default_model_name = "vosk-model-small-en-us-0.15"
+    vosk_model_folder = os.path.join(user_data_dir("py_speech_service"), "vosk")
+
+    def __init__(self, max_models: int = 2):
+        self.max_models = max_models
+        self.models = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    max_models: int
+    models: OrderedDict[str, Model]
+    loading: dict[str, threading.Event]
+    lock: threading.Lock
+
+    def resolve_model_path(self, vosk_model: Optional[str]) -> str:
+        if vosk_model is not None and vosk_model != "":
+            if vosk_model.count("/") > 0 or vosk_model.count("\\") > 0:
+                logging.info("Setting VOSK model path as " + vosk_model)
+                return vosk_model
+            logging.info("Downloading VOSK model " + vosk_model)
+            model_path = self.download_vosk_model(vosk_model)
+        else:
+            logging.info("Downloading default VOSK model " + self.default_model_name)
+            model_path = self.download_vosk_model(self.default_model_name)
+        logging.info("Setting VOSK model path as " + model_path)
+        return model_path
+
+    def get_model(self, model_path: str) -> Model:
+        # Blocks until the model is loaded. If another thread is already loading the same model, this waits for it
+        # instead of loading a second copy.
+        resolved_path = os.path.realpath(model_path)
+        with self.lock:
+            model = self.models.get(resolved_path)
+            if model is not None:
+                self.models.move_to_end(resolved_path)
+                return model
+            loaded_event = self.loading.get(resolved_path)
+            is_loader = loaded_event is None
+            if is_loader:
+                loaded_event = threading.Event()
+                self.loading[resolved_path] = loaded_event
+
+        if not is_loader:
+            loaded_event.wait()
+            return self.get_model(model_path)
+
+        try:
+            logging.info("Loading VOSK model " + resolved_path)
+            model = Model(resolved_path)
+            with self.lock:
+                self.models[resolved_path] = model
+                # Dropping the cache reference is safe, since running recognizers keep their own reference
+                while len(self.models) > self.max_models:
+                    self.models.popitem(last=False)
+            logging.info("Loaded VOSK model " + resolved_path)
+            return model
+        finally:
+            with self.lock:
+                self.loading.pop(resolved_path, None)
+            loaded_event.set()
+
+    async def load_model(self, vosk_model: Optional[str]) -> (str, Model):
+        def load():
+            model_path = self.resolve_model_path(vosk_model)
+            return model_path, self.get_model(model_path)
+        return await asyncio.to_thread(load)
+
+    def preload(self, vosk_model: Optional[str] = None) -> threading.Thread:
+        def load():
+            try:
+                self.get_model(self.resolve_model_path(vosk_model))
+            except Exception as e:
+                logging.error("Unable to preload VOSK model: " + repr(e))
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def is_loaded(self, model_path: str) -> bool:
+        with self.lock:
+            return os.path.realpath(model_path) in self.models
+
+    def download_vosk_model(self, model_name: Optional[str]) -> str:
+        model = model_name
+        if not model:
+            model = self.default_model_name
+        if os.path.exists(self.get_vosk_model_path(model)):
+            return self.get_vosk_model_path(model)
+        url = self.get_vosk_download_url_by_name(model)
+        download_and_extract(url, self.vosk_model_folder)
+        return self.get_vosk_model_path(model)
+
+    def get_vosk_model_path(self, model_name: Optional[str]) -> str:
+        return os.path.join(self.vosk_model_folder, model_name)
+
+    @staticmethod
+    def get_vosk_model_sample_rate(model_path: str) -> int:
+        try:
+            with open(os.path.join(model_path, "conf", "mfcc.conf"), 'r') as fp:
+                for line in fp:
+                    if line.strip().startswith("--sample-frequency="):
+                        return int(float(line.strip().split("=")[1]))
+        except Exception as e:
+            logging.info("Unable to read VOSK model sample rate: " + repr(e))
+        return 16000
+
+    @staticmethod
+    def get_vosk_download_url_by_name(vosk_model_name) -> str:
+        try:
+            json_data = get_json_data("https://alphacephei.com/vosk/models/model-list.json")
+            for record in json_data:
+                print(record.get('name') + " - " + record.get("obsolete") + " - " + record.get('url'))
+                if record.get('name') == vosk_model_name and record.get('obsolete') == "false":
+                    print('found!')
+                    return record.get('url')
+        except:
+            return "https://alphacephei.com/vosk/models/vosk-model-small-en-us-0.15.zip"
@@ -0,0 +1,47 @@
+from collections import deque
+
+import numpy
+
+
+class RecognitionMetrics:
+    # Counts how final results were handled and keeps the recent timings of each stage between the end of speech and
+    # the response, so it can be seen where the latency of a command goes
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self.counts = {"matched": 0, "rejected": 0, "below_threshold": 0}
+        self.stage_latencies = {}
+
+    max_samples: int
+    counts: dict[str, int]
+    stage_latencies: dict[str, deque[float]]
+
+    def add_count(self, result: str):
+        self.counts[result] += 1
+
+    def add_timings(self, timings: dict[str, float]):
+        for stage, seconds in timings.items():
+            self.add_latency(stage, seconds)
+
+    def add_latency(self, stage: str, seconds: float):
+        if stage not in self.stage_latencies:
+            self.stage_latencies[stage] = deque(maxlen=self.max_samples)
+        self.stage_latencies[stage].append(seconds)
+
+    def get_stage_stats(self) -> dict[str, dict[str, float]]:
+        stage_stats = {}
+        for stage, latencies in self.stage_latencies.items():
+            latencies_ms = numpy.array(latencies) * 1000
+            stage_stats[stage] = {
+                "count": len(latencies_ms),
+                "p50_ms": round(float(numpy.percentile(latencies_ms, 50)), 3),
+                "p90_ms": round(float(numpy.percentile(latencies_ms, 90)), 3),
+                "max_ms": round(float(numpy.max(latencies_ms)), 3)
+            }
+        return stage_stats
+
+    def get_stats(self) -> dict:
+        return {
+            "counts": dict(self.counts),
+            "stages": self.get_stage_stats()
+        }
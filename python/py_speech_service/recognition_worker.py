@@ -0,0 +1,366 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+from multiprocessing.connection import Connection
+from typing import Optional
+
+from py_speech_service import speech_service_pb2
+from py_speech_service.grammar_cache import GrammarCache
+
+
+class RecognitionWorker:
+    # Runs capture, VOSK decoding and grammar matching in a child process so they don't compete with text to speech
+    # and gRPC for the GIL. Responses come back over a pipe as serialized SpeechServiceResponse messages, followed by a
+    # stopped message when the child ends on purpose. A child that ends without one, whether it crashed or its listen
+    # loop failed, is restarted with its grammar updates replayed.
+
+    max_restarts: int = 5
+    restart_window_seconds: float = 60
+    stop_timeout_seconds: float = 3
+    # The child process compiles the grammar itself, so only the JSON is cached here
+    grammar_cache: GrammarCache = GrammarCache()
+
+    def __init__(self, session_id: str = ""):
+        self.session_id = session_id
+        self.settings = None
+        self.grammar_updates = []
+        self.grpc_response_queue = None
+        self.process = None
+        self.control_connection = None
+        self.stopping = False
+        self.restart_times = []
+        self.generation = 0
+        self.is_speaking = False
+
+    session_id: str
+    settings: Optional[dict]
+    grammar_updates: list[dict]
+    grpc_response_queue: Optional[asyncio.Queue]
+    process: Optional[multiprocessing.Process]
+    control_connection: Optional[Connection]
+    stopping: bool
+    restart_times: list[float]
+    generation: int
+    # Kept so a worker that is started or restarted while text to speech is playing starts out suppressing audio
+    is_speaking: bool
+
+    def set_grpc_response_queue(self, queue: asyncio.Queue):
+        self.grpc_response_queue = queue
+
+    def set_speech_recognition_details(self, grammar_file: str, vosk_model: str, required_confidence: float = 80,
+                                       early_match: bool = False, voice_activity_detection: bool = False,
+                                       input_channels: int = 1, record_file: Optional[str] = None,
+                                       wake_prefix: bool = False, wake_prefix_timeout: float = 10,
+                                       phrase_grammar: bool = False, max_alternatives: int = 1,
+                                       endpoint_silence: float = 0, max_utterance_length: float = 0,
+                                       grammar_endpoint: bool = False, client_sample_rate: int = 0,
+                                       client_channels: int = 1, client_buffer_seconds: float = 5,
+                                       speaking_mode: int = 0, speaking_tail_seconds: float = 0.3,
+                                       input_device: Optional[int] = None, grammar_data: Optional[bytes] = None,
+                                       grammar_compression: int = 0, grammar_hash: str = "") -> bool:
+        try:
+            # The grammar is kept in memory rather than as a path, since the file is deleted and a restarted worker
+            # needs to parse it again
+            if grammar_data:
+                grammar_json = GrammarCache.decode(grammar_data, grammar_compression)
+            elif grammar_file:
+                with open(grammar_file, 'r') as fp:
+                    grammar_json = fp.read()
+                try:
+                    os.remove(grammar_file)
+                except:
+                    logging.error(f"Unable to delete {grammar_file}")
+            else:
+                cached_grammar = self.grammar_cache.get(grammar_hash)
+                if cached_grammar is None:
+                    raise ValueError("Grammar " + grammar_hash + " is not cached")
+                grammar_json = cached_grammar.grammar_json
+            json.loads(grammar_json)
+            self.grammar_cache.add(GrammarCache.get_hash(grammar_json), grammar_json)
+
+            self.settings = {
+                "session_id": self.session_id,
+                "grammar_json": grammar_json,
+                "vosk_model": vosk_model,
+                "required_confidence": required_confidence,
+                "early_match": early_match,
+                "voice_activity_detection": voice_activity_detection,
+                "input_channels": input_channels,
+                "record_file": record_file,
+                "wake_prefix": wake_prefix,
+                "wake_prefix_timeout": wake_prefix_timeout,
+                "phrase_grammar": phrase_grammar,
+                "max_alternatives": max_alternatives,
+                "endpoint_silence": endpoint_silence,
+                "max_utterance_length": max_utterance_length,
+                "grammar_endpoint": grammar_endpoint,
+                "client_sample_rate": client_sample_rate,
+                "client_channels": client_channels,
+                "client_buffer_seconds": client_buffer_seconds,
+                "speaking_mode": speaking_mode,
+                "speaking_tail_seconds": speaking_tail_seconds,
+                "input_device": input_device
+            }
+            self.grammar_updates = []
+            return True
+        except Exception as e:
+            logging.error("Unable to start speech recognition worker: " + repr(e))
+            print("Unable to start speech recognition worker", str(e))
+            return False
+
+    def has_cached_grammar(self, grammar_hash: str) -> bool:
+        return self.grammar_cache.contains(grammar_hash)
+
+    def update_grammar(self, add_rules: str = "", remove_rules: Optional[list[str]] = None,
+                       enable_rules: Optional[list[str]] = None, disable_rules: Optional[list[str]] = None) -> bool:
+        if self.settings is None:
+            return False
+        try:
+            if add_rules:
+                json.loads(add_rules)
+            update = {
+                "add_rules": add_rules,
+                "remove_rules": list(remove_rules or []),
+                "enable_rules": list(enable_rules or []),
+                "disable_rules": list(disable_rules or [])
+            }
+            self.grammar_updates.append(update)
+            self.__send_control(("update_grammar", update))
+            return True
+        except Exception as e:
+            logging.error("Unable to update speech recognition worker grammar: " + repr(e))
+            return False
+
+    def add_client_audio(self, audio: bytes, sequence: int = 0, end_of_stream: bool = False):
+        self.__send_control(("client_audio", (audio, sequence, end_of_stream)))
+
+    def set_speaking(self, is_speaking: bool):
+        self.is_speaking = is_speaking
+        self.__send_control(("speaking", is_speaking))
+
+    def send_recognition_metrics(self):
+        # The child process sends the metrics back like any other response
+        self.__send_control(("metrics", None))
+
+    async def start_speech_recognition(self, context):
+        self.stop_speech_recognition()
+        await asyncio.to_thread(self.__wait_for_exit, self.process)
+        self.generation += 1
+        generation = self.generation
+        self.stopping = False
+        self.restart_times = []
+
+        while not self.stopping and generation == self.generation:
+            process, result_connection = self.__start_process()
+            stopped = await self.__read_results(process, result_connection)
+            await asyncio.to_thread(self.__wait_for_exit, process)
+            result_connection.close()
+
+            if self.stopping or generation != self.generation:
+                break
+            if stopped:
+                logging.info("Speech recognition worker exited")
+                break
+
+            logging.error("Speech recognition worker stopped unexpectedly with exit code " + str(process.exitcode))
+            print("Speech recognition worker stopped unexpectedly with exit code " + str(process.exitcode))
+            now = time.time()
+            self.restart_times = [restart for restart in self.restart_times if now - restart < self.restart_window_seconds]
+            if len(self.restart_times) >= self.max_restarts:
+                logging.error("Speech recognition worker crashed too often, giving up")
+                if self.grpc_response_queue:
+                    response = speech_service_pb2.SpeechServiceResponse()
+                    response.error.error_message = "Speech recognition worker crashed too often and was not restarted"
+                    await self.grpc_response_queue.put(response)
+                break
+            self.restart_times.append(now)
+            await asyncio.sleep(min(2 ** (len(self.restart_times) - 1), 10))
+
+    def stop_speech_recognition(self):
+        self.stopping = True
+        process = self.process
+        if process is None or not process.is_alive():
+            return
+        self.__send_control(("stop", None))
+
+        def terminate():
+            process.join(self.stop_timeout_seconds)
+            if process.is_alive():
+                logging.error("Speech recognition worker did not stop, terminating it")
+                process.terminate()
+        threading.Thread(target=terminate, daemon=True).start()
+
+    def shutdown(self):
+        self.stop_speech_recognition()
+
+    def __start_process(self) -> (multiprocessing.Process, Connection):
+        # Spawn rather than fork, as forking a process with running gRPC threads is unsafe
+        context = multiprocessing.get_context("spawn")
+        result_receiver, result_sender = context.Pipe(duplex=False)
+        control_receiver, control_sender = context.Pipe(duplex=False)
+        is_speaking = self.is_speaking
+        process = context.Process(target=run_recognition_worker,
+                                  args=(self.settings, list(self.grammar_updates), is_speaking, result_sender,
+                                        control_receiver, self.__get_log_path(), logging.getLogger().level),
+                                  daemon=True)
+        process.start()
+        # Closing the parent's copies means the result pipe reports EOF as soon as the child exits
+        result_sender.close()
+        control_receiver.close()
+        self.process = process
+        self.control_connection = control_sender
+        if self.is_speaking != is_speaking:
+            # Text to speech started or stopped while the process was starting
+            self.__send_control(("speaking", self.is_speaking))
+        logging.info("Started speech recognition worker process " + str(process.pid))
+        return process, result_receiver
+
+    async def __read_results(self, process: multiprocessing.Process, result_connection: Connection) -> bool:
+        # Returns whether the child said it stopped on purpose before its pipe closed
+        while True:
+            message = await asyncio.to_thread(self.__receive, process, result_connection)
+            if message is None:
+                return False
+            command, data = message
+            if command == "stopped":
+                return True
+            if self.grpc_response_queue and not self.stopping:
+                await self.grpc_response_queue.put(speech_service_pb2.SpeechServiceResponse.FromString(data))
+
+    @staticmethod
+    def __receive(process: multiprocessing.Process, result_connection: Connection) -> Optional[tuple]:
+        try:
+            while not result_connection.poll(0.5):
+                if not process.is_alive() and not result_connection.poll():
+                    return None
+            return result_connection.recv()
+        except (EOFError, OSError):
+            return None
+
+    def __send_control(self, message: tuple):
+        if self.control_connection is None or self.process is None or not self.process.is_alive():
+            return
+        try:
+            self.control_connection.send(message)
+        except (BrokenPipeError, OSError) as e:
+            logging.error("Unable to send message to speech recognition worker: " + repr(e))
+
+    def __wait_for_exit(self, process: Optional[multiprocessing.Process]):
+        if process is not None:
+            process.join(self.stop_timeout_seconds + 1)
+
+    @staticmethod
+    def __get_log_path() -> Optional[str]:
+        for handler in logging.getLogger().handlers:
+            if hasattr(handler, "baseFilename"):
+                return os.path.splitext(handler.baseFilename)[0] + "-recognition.log"
+        return None
+
+
+def run_recognition_worker(settings: dict, grammar_updates: list[dict], is_speaking: bool,
+                           result_connection: Connection, control_connection: Connection, log_path: Optional[str],
+                           log_level: int):
+    if log_path:
+        logging.basicConfig(
+            handlers=[RotatingFileHandler(log_path, maxBytes=500000, backupCount=3)],
+            level=log_level,
+            format="[%(asctime)s] %(levelname)s [%(name)s.%(funcName)s:%(lineno)d] %(message)s",
+            datefmt='%Y-%m-%d %H:%M:%S')
+    try:
+        asyncio.run(run_recognition(settings, grammar_updates, is_speaking, result_connection, control_connection))
+    except Exception as e:
+        logging.error("Speech recognition worker failed: " + repr(e))
+        logging.error(traceback.format_exc())
+        raise
+    finally:
+        result_connection.close()
+
+
+async def run_recognition(settings: dict, grammar_updates: list[dict], is_speaking: bool,
+                          result_connection: Connection, control_connection: Connection):
+    # Imported here so the parent process doesn't need VOSK loaded to supervise the worker
+    from py_speech_service.speech_recognition import SpeechRecognition
+
+    loop = asyncio.get_running_loop()
+    speech_recognition = SpeechRecognition(settings["session_id"])
+    response_queue = asyncio.Queue()
+    speech_recognition.set_grpc_response_queue(response_queue)
+
+    if not speech_recognition.set_speech_recognition_details(None, settings["vosk_model"],
+                                                             settings["required_confidence"], settings["early_match"],
+                                                             settings["voice_activity_detection"],
+                                                             settings["input_channels"], settings["record_file"],
+                                                             settings["wake_prefix"], settings["wake_prefix_timeout"],
+                                                             settings["phrase_grammar"], settings["max_alternatives"],
+                                                             settings["endpoint_silence"],
+                                                             settings["max_utterance_length"],
+                                                             settings["grammar_endpoint"],
+                                                             settings["client_sample_rate"],
+                                                             settings["client_channels"],
+                                                             settings["client_buffer_seconds"],
+                                                             settings["speaking_mode"],
+                                                             settings["speaking_tail_seconds"],
+                                                             settings["input_device"],
+                                                             grammar_json=settings["grammar_json"]):
+        response = speech_service_pb2.SpeechServiceResponse()
+        response.speech_recognition_started.successful = False
+        response.speech_recognition_started.session_id = settings["session_id"]
+        result_connection.send(("response", response.SerializeToString()))
+        # Starting again with the same settings would fail the same way
+        result_connection.send(("stopped", None))
+        return
+
+    for update in grammar_updates:
+        speech_recognition.update_grammar(**update)
+    speech_recognition.set_speaking(is_speaking)
+    stop_requested = False
+
+    def handle_control(message: tuple):
+        nonlocal stop_requested
+        command, data = message
+        if command == "update_grammar":
+            speech_recognition.update_grammar(**data)
+        elif command == "speaking":
+            speech_recognition.set_speaking(data)
+        elif command == "client_audio":
+            speech_recognition.add_client_audio(*data)
+        elif command == "metrics":
+            speech_recognition.send_recognition_metrics()
+        elif command == "stop":
+            stop_requested = True
+            speech_recognition.stop_speech_recognition()
+            speech_recognition.shutdown()
+
+    def read_control():
+        while True:
+            try:
+                message = control_connection.recv()
+            except (EOFError, OSError):
+                # The parent went away, so there is nobody left to send results to
+                message = ("stop", None)
+            loop.call_soon_threadsafe(handle_control, message)
+            if message[0] == "stop":
+                return
+
+    async def forward_responses():
+        while True:
+            response = await response_queue.get()
+            result_connection.send(("response", response.SerializeToString()))
+
+    threading.Thread(target=read_control, daemon=True).start()
+    forward_task = asyncio.create_task(forward_responses())
+    await speech_recognition.start_speech_recognition(None)
+
+    while not response_queue.empty():
+        await asyncio.sleep(0.05)
+    forward_task.cancel()
+
+    # The parent starts the worker again unless it was asked to stop or recognition ended without an error
+    if stop_requested or speech_recognition.listen_error is None:
+        result_connection.send(("stopped", None))
@@ -100,8 +100,10 @@ class Speaker:
     is_speaking = False
     volume: float = 1
     supported_sample_rate: int = 0
+    speaking_listeners: list[typing.Callable[[bool], None]]
 
     def __init__(self):
+        self.speaking_listeners = []
         folder = os.path.join(tempfile.gettempdir(), "py_speech_service")
         if not Path(folder).exists():
             Path(folder).mkdir()
@@ -274,6 +276,9 @@ class Speaker:
     def shutdown(self):
         self.shutdown_event.set()
 
+    def add_speaking_listener(self, listener: typing.Callable[[bool], None]):
+        self.speaking_listeners.append(listener)
+
     def set_volume(self, volume: float):
         self.volume = volume
 
@@ -434,7 +439,7 @@ class Speaker:
     async def __handle_play(self, request: PendingSpeechRequest):
         if self.stop_talking_event.is_set():
             return
-        self.is_speaking = True
+        self.__set_speaking(True)
         if hasattr(request, "message") and request.message:
             logging.debug("Playing " + request.message)
             await self.__send_response(request, True)
@@ -474,14 +479,14 @@ class Speaker:
                 stream.stop_stream()
                 stream.close()
                 p.terminate()
-                self.is_speaking = False
+                self.__set_speaking(False)
                 logging.info("Finished saying \"" + request.message + "\"")
 
             await asyncio.sleep(.5)
 
         elif hasattr(request, "silence_seconds") and request.silence_seconds:
             await asyncio.sleep(request.silence_seconds)
-            self.is_speaking = False
+            self.__set_speaking(False)
             if request.last_request_of_message:
                 await self.__send_response(request, False)
 
@@ -503,6 +508,16 @@ class Speaker:
         elif hasattr(request, "silence_seconds") and request.silence_seconds:
             await self.play_queue.put(request)
 
+    def __set_speaking(self, is_speaking: bool):
+        if is_speaking == self.is_speaking:
+            return
+        self.is_speaking = is_speaking
+        for listener in self.speaking_listeners:
+            try:
+                listener(is_speaking)
+            except Exception as e:
+                logging.error("Error notifying speaking listener: " + repr(e))
+
     def __write_sound_data(self, sound: AudioSegment, stream: pyaudio.Stream):
         for chunk in make_chunks(sound, 500):
             if not self.stop_talking_event.is_set() and not self.shutdown_event.is_set():
@@ -0,0 +1,67 @@
+import time
+from enum import Enum
+from typing import Optional
+
+
+class SpeakingMode(Enum):
+    Continue = 0
+    Pause = 1
+    Duck = 2
+
+
+class SpeakingGate:
+    # Keeps speech recognition from hearing the service's own text to speech. Pausing stops decoding while speaking, and
+    # ducking only lets through audio much louder than the speech, such as someone talking over it. Both carry on for a
+    # short time after speaking finishes, as the end of the speech can still be playing or echoing.
+
+    duck_threshold_boost: float = 4
+
+    def __init__(self, mode: SpeakingMode, sample_rate: int, tail_seconds: float = 0.3, is_speaking: bool = False):
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.tail_seconds = tail_seconds
+        self.is_speaking = is_speaking
+        self.speaking_end_time = 0
+        self.is_suppressing = False
+        self.suppressed_count = 0
+        self.suppressed_samples = 0
+        self.total_samples = 0
+        self.finished_utterances = 0
+
+    mode: SpeakingMode
+    sample_rate: int
+    tail_seconds: float
+    is_speaking: bool
+    speaking_end_time: float
+    is_suppressing: bool
+    suppressed_count: int
+    suppressed_samples: int
+    total_samples: int
+    finished_utterances: int
+
+    def set_speaking(self, is_speaking: bool):
+        # Called by the event loop when text to speech starts or stops playing
+        if self.is_speaking and not is_speaking:
+            self.speaking_end_time = time.perf_counter()
+        self.is_speaking = is_speaking
+
+    def process(self, samples: int) -> Optional[bool]:
+        # Returns True when suppressing starts, False when it ends, and None when nothing changed
+        self.total_samples += samples
+        is_suppressing = self.is_speaking or time.perf_counter() - self.speaking_end_time < self.tail_seconds
+        changed = is_suppressing != self.is_suppressing
+        self.is_suppressing = is_suppressing
+        if is_suppressing:
+            self.suppressed_samples += samples
+            if changed:
+                self.suppressed_count += 1
+        return is_suppressing if changed else None
+
+    def get_stats(self) -> dict:
+        return {
+            "mode": self.mode.name.lower(),
+            "speaking_count": self.suppressed_count,
+            "finished_utterances": self.finished_utterances,
+            "suppressed_seconds": round(self.suppressed_samples / self.sample_rate, 2),
+            "suppressed_ratio": round(self.suppressed_samples / self.total_samples, 3) if self.total_samples > 0 else 0
+        }
@@ -1,96 +1,233 @@
 import asyncio
+import contextlib
 import json
 import logging
 import os
-import queue
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
 
-import sounddevice as sd
-from platformdirs import user_data_dir
 from vosk import Model, KaldiRecognizer, SetLogLevel
 
 from py_speech_service import speech_service_pb2
-from py_speech_service.downloader import get_json_data, download_and_extract
+from py_speech_service.audio_capture import AudioCapture
+from py_speech_service.audio_file import WaveFileSource, WaveFileRecorder
+from py_speech_service.client_audio import ClientAudioSource
+from py_speech_service.endpointing import Endpointer
+from py_speech_service.grammar_cache import GrammarCache
+from py_speech_service.grammar_element import GrammarElementMatch
 from py_speech_service.grammar_parser import GrammarParser
+from py_speech_service.model_manager import ModelManager
+from py_speech_service.recognition_metrics import RecognitionMetrics
+from py_speech_service.speaking_gate import SpeakingGate, SpeakingMode
+from py_speech_service.voice_activity import VoiceActivityGate
+from py_speech_service.wake_prefix import WakePrefixGate
 
 
 class SpeechRecognition:
     model: Model
     grammar_parser: GrammarParser
     required_confidence: float = 80
-    stop_speech_recognition_event: Optional[asyncio.Event] = None
+    stop_speech_recognition_event: Optional[threading.Event] = None
     continue_speech_recognition: bool = True
     grpc_response_queue: Optional[asyncio.Queue] = None
-    shutdown_event = asyncio.Event()
-    recognition_queue = asyncio.Queue()
-    vosk_model_folder = os.path.join(user_data_dir("py_speech_service"), "vosk")
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    shutdown_event: asyncio.Event
+    recognition_queue: asyncio.Queue
+    # Shared by every session, so each model is only loaded once and sessions can't use every core for decoding
+    model_manager: ModelManager = ModelManager()
+    grammar_cache: GrammarCache = GrammarCache()
+    grammar_hash: str = ""
+    # Whether grammar_parser is the one in the grammar cache, which other sessions may also be using
+    grammar_parser_shared: bool = False
+    # Every session decodes on the same pool, so together they can't use every core. The listen threads only read
+    # audio and wait for the pool.
+    decode_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1),
+                                                             thread_name_prefix="vosk_decode")
+    session_id: str = ""
+    input_device: Optional[int] = None
+    vosk_model: Optional[str] = None
+    recognition_queue_task: Optional[asyncio.Task] = None
     stop_after_first_recognition: bool = False
+    pending_grammar_words: Optional[str] = None
+    early_match_enabled: bool = False
+    voice_activity_detection: bool = False
+    model_sample_rate: int = 16000
+    input_channels: int = 1
+    input_file: Optional[str] = None
+    record_file: Optional[str] = None
+    wake_prefix: bool = False
+    wake_prefix_timeout: float = 10
+    phrase_grammar: bool = False
+    max_alternatives: int = 1
+    endpoint_silence: float = 0.4
+    # Whether the endpoint silence was asked for, in which case it ends utterances even without voice activity detection
+    silence_endpoint: bool = False
+    max_utterance_length: float = 0
+    grammar_endpoint: bool = False
+    endpointer: Optional[Endpointer] = None
+    recognition_metrics: RecognitionMetrics
+    client_audio_source: Optional[ClientAudioSource] = None
+    speaking_mode: SpeakingMode = SpeakingMode.Continue
+    speaking_tail_seconds: float = 0.3
+    is_speaking: bool = False
+    speaking_gate: Optional[SpeakingGate] = None
+    early_match: Optional[GrammarElementMatch] = None
+    early_match_time: float = 0
+    early_match_count: int = 0
+    early_match_saved_seconds: float = 0
+    # Called with every final result, along with the text that was matched, the match if there was one, and the
+    # timings, so results can be collected without a gRPC client, such as by file recognition
+    result_listener: Optional[Callable[[dict, str, Optional[GrammarElementMatch], dict[str, float]], None]] = None
+    # Seconds of audio read and decoded by the current listen loop
+    audio_position: float = 0
+    decode_seconds: float = 0
+    # Set when the listen loop ended because of an error, rather than being stopped or running out of audio
+    listen_error: Optional[Exception] = None
 
-    def __init__(self):
+    def __init__(self, session_id: str = ""):
         SetLogLevel(-1)
         self.stop_speech_recognition_event = None
+        self.shutdown_event = asyncio.Event()
+        self.recognition_queue = asyncio.Queue()
+        self.session_id = session_id
+        self.recognition_metrics = RecognitionMetrics()
 
-    def download_vosk_model(self, model_name: Optional[str]) -> str:
-        model = model_name
-        if not model:
-            model = "vosk-model-small-en-us-0.15"
-        if os.path.exists(self.get_vosk_model_path(model)):
-            return self.get_vosk_model_path(model)
-        url = self.get_vosk_download_url_by_name(model)
-        download_and_extract(url, self.vosk_model_folder)
-        return self.get_vosk_model_path(model)
+    def set_speech_recognition_details(self, grammar_file: str, vosk_model: str, required_confidence: float = 80,
+                                       early_match: bool = False, voice_activity_detection: bool = False,
+                                       input_channels: int = 1, record_file: Optional[str] = None,
+                                       wake_prefix: bool = False, wake_prefix_timeout: float = 10,
+                                       phrase_grammar: bool = False, max_alternatives: int = 1,
+                                       endpoint_silence: float = 0, max_utterance_length: float = 0,
+                                       grammar_endpoint: bool = False, client_sample_rate: int = 0,
+                                       client_channels: int = 1, client_buffer_seconds: float = 5,
+                                       speaking_mode: int = 0, speaking_tail_seconds: float = 0.3,
+                                       input_device: Optional[int] = None, grammar_data: Optional[bytes] = None,
+                                       grammar_compression: int = 0, grammar_hash: str = "",
+                                       grammar_json: Optional[str] = None) -> bool:
+        try:
+            if vosk_model and (vosk_model.count("/") > 0 or vosk_model.count("\\") > 0) and not Path(vosk_model).exists():
+                logging.error("VOSK model path " + vosk_model + " does not exist")
+                return False
 
-    def get_vosk_model_path(self, model_name: Optional[str]) -> str:
-        return os.path.join(self.vosk_model_folder, model_name)
+            # The new grammar is compiled separately, so a running recognizer keeps matching against the previous
+            # grammar until the new one is ready
+            grammar_parser = self.__load_grammar(grammar_file, grammar_data, grammar_compression, grammar_hash,
+                                                 grammar_json)
+            self.grammar_parser_shared = True
+            self.grammar_parser = grammar_parser
 
-    def get_vosk_download_url_by_name(self, vosk_model_name) -> str:
-        try:
-            json_data = get_json_data("https://alphacephei.com/vosk/models/model-list.json")
-            for record in json_data:
-                print(record.get('name') + " - " + record.get("obsolete") + " - " + record.get('url'))
-                if record.get('name') == vosk_model_name and record.get('obsolete') == "false":
-                    print('found!')
-                    return record.get('url')
-        except:
-            return "https://alphacephei.com/vosk/models/vosk-model-small-en-us-0.15.zip"
-
-    def set_speech_recognition_details(self, grammar_file: str, vosk_model: str, required_confidence: float = 80) -> bool:
-        try:
-            self.grammar_parser = GrammarParser()
-            self.grammar_parser.set_grammar_file(grammar_file)
+            # The model is loaded by start_speech_recognition, so a running recognizer keeps listening with its
+            # current model, and the new grammar's vocabulary, until the new model is ready
+            self.phrase_grammar = phrase_grammar
+            self.pending_grammar_words = self.get_recognizer_grammar()
+            self.vosk_model = vosk_model
+            self.required_confidence = required_confidence
+            self.early_match_enabled = early_match
+            self.voice_activity_detection = voice_activity_detection
+            self.input_channels = input_channels if input_channels > 0 else 1
+            self.input_device = input_device
+            self.record_file = record_file if record_file else None
+            self.wake_prefix = wake_prefix
+            self.wake_prefix_timeout = wake_prefix_timeout if wake_prefix_timeout > 0 else 10
+            # Every alternative is matched against the grammar, so the number is capped to keep matching fast
+            self.max_alternatives = min(max(max_alternatives, 1), 10)
+            self.endpoint_silence = endpoint_silence if endpoint_silence > 0 else 0.4
+            self.silence_endpoint = endpoint_silence > 0
+            self.max_utterance_length = max(max_utterance_length, 0)
+            self.grammar_endpoint = grammar_endpoint
+            # Created now so audio the client sends while the model is loading is kept
+            self.client_audio_source = ClientAudioSource(client_sample_rate, client_channels, client_buffer_seconds) \
+                if client_sample_rate > 0 else None
+            self.speaking_mode = SpeakingMode(speaking_mode)
+            self.speaking_tail_seconds = speaking_tail_seconds if speaking_tail_seconds > 0 else 0.3
+            return True
+        except Exception as e:
+            logging.error("Unable to start speech recognition: " + repr(e))
+            print("Unable to start speech recognition", str(e))
+            return False
+
+    def has_cached_grammar(self, grammar_hash: str) -> bool:
+        return self.grammar_cache.contains(grammar_hash)
+
+    def __load_grammar(self, grammar_file: Optional[str], grammar_data: Optional[bytes], grammar_compression: int,
+                       grammar_hash: str, grammar_json: Optional[str]) -> GrammarParser:
+        if grammar_json is None and grammar_data:
+            grammar_json = GrammarCache.decode(grammar_data, grammar_compression)
+        elif grammar_json is None and grammar_file:
+            with open(grammar_file, 'r') as fp:
+                grammar_json = fp.read()
             try:
                 os.remove(grammar_file)
             except:
                 logging.error(f"Unable to delete {grammar_file}")
-            model_path = ""
 
-            if vosk_model is not None and vosk_model != "":
-                if vosk_model.count("/") > 0 or vosk_model.count("\\") > 0:
-                    logging.info("Setting VOSK model path as " + vosk_model)
-                    model_path = vosk_model
-                    self.model = Model(vosk_model)
-                else:
-                    logging.info("Downloading VOSK model " + vosk_model)
-                    model_path = self.download_vosk_model(vosk_model)
-                    logging.info("Setting VOSK model path as " + model_path)
-                    self.model = Model(model_path)
-            else:
-                logging.info("Downloading default VOSK model vosk-model-small-en-us-0.15")
-                model_path = self.download_vosk_model("vosk-model-small-en-us-0.15")
-                logging.info("Setting VOSK model path as " + model_path)
-                self.model = Model(model_path)
+        if grammar_json is not None:
+            grammar_hash = GrammarCache.get_hash(grammar_json)
+        self.grammar_hash = grammar_hash.lower()
 
-            self.required_confidence = required_confidence
-            return Path(model_path).exists()
+        cached_grammar = self.grammar_cache.get(self.grammar_hash) if self.grammar_hash else None
+        if cached_grammar is not None and cached_grammar.grammar_parser is not None:
+            logging.info("Using cached grammar " + self.grammar_hash)
+            self.__post_grammar_progress(len(cached_grammar.grammar_parser.rule_items),
+                                         len(cached_grammar.grammar_parser.rule_items))
+            return cached_grammar.grammar_parser
+        if grammar_json is None:
+            raise ValueError("Grammar " + self.grammar_hash + " is not cached")
+
+        grammar_parser = GrammarParser()
+        grammar_parser.set_grammar_json(grammar_json, self.__post_grammar_progress)
+        self.grammar_cache.add(self.grammar_hash, None, grammar_parser)
+        logging.info("Loaded grammar " + self.grammar_hash)
+        return grammar_parser
+
+    def update_grammar(self, add_rules: str = "", remove_rules: Optional[list[str]] = None,
+                       enable_rules: Optional[list[str]] = None, disable_rules: Optional[list[str]] = None) -> bool:
+        try:
+            if self.grammar_parser_shared:
+                # Copies the lookup tables the update changes, while the compiled rules stay shared with the cache
+                self.grammar_parser = self.grammar_parser.copy()
+                self.grammar_parser_shared = False
+            if remove_rules:
+                self.grammar_parser.remove_rules(list(remove_rules))
+            if add_rules:
+                self.grammar_parser.add_rules(json.loads(add_rules))
+            if enable_rules:
+                self.grammar_parser.set_rules_enabled(list(enable_rules), True)
+            if disable_rules:
+                self.grammar_parser.set_rules_enabled(list(disable_rules), False)
+
+            # Picked up by the listen thread, which swaps the vocabulary without reopening the microphone
+            self.pending_grammar_words = self.get_recognizer_grammar()
+            return True
         except Exception as e:
-            logging.error("Unable to start speech recognition: " + repr(e))
-            print("Unable to start speech recognition", str(e))
+            logging.error("Unable to update speech recognition grammar: " + repr(e))
+            logging.error(traceback.format_exc())
             return False
 
     async def start_speech_recognition(self, context):
-        asyncio.create_task(self.process_recognition_queue())
+        self.loop = asyncio.get_running_loop()
+
+        try:
+            model_path, model = await self.model_manager.load_model(self.vosk_model)
+        except Exception as e:
+            logging.error("Unable to load VOSK model: " + repr(e))
+            print("Unable to load VOSK model", str(e))
+            if self.grpc_response_queue:
+                response = speech_service_pb2.SpeechServiceResponse()
+                response.speech_recognition_started.successful = False
+                response.speech_recognition_started.session_id = self.session_id
+                await self.grpc_response_queue.put(response)
+            return
+
+        self.model = model
+        self.model_sample_rate = ModelManager.get_vosk_model_sample_rate(model_path)
+
+        if self.recognition_queue_task is None or self.recognition_queue_task.done():
+            self.recognition_queue_task = asyncio.create_task(self.process_recognition_queue())
         await asyncio.to_thread(self.listen)
         await asyncio.sleep(1)
 
@@ -111,74 +248,294 @@ class SpeechRecognition:
         if self.stop_speech_recognition_event:
             self.stop_speech_recognition_event.set()
 
-        stop_speech_recognition_event = asyncio.Event()
+        stop_speech_recognition_event = threading.Event()
         self.stop_speech_recognition_event = stop_speech_recognition_event
+        self.listen_error = None
 
-        device_info = sd.query_devices(sd.default.device[0], 'input')
-        samplerate = int(device_info['default_samplerate'])
-        speech_queue = queue.Queue()
+        try:
+            if self.client_audio_source:
+                audio_capture = self.client_audio_source
+                audio_capture.set_sample_rate(self.model_sample_rate)
+            elif self.input_file:
+                audio_capture = WaveFileSource(self.input_file, self.model_sample_rate)
+            else:
+                audio_capture = AudioCapture(device=self.input_device, sample_rate=self.model_sample_rate,
+                                             channels=self.input_channels)
+            recorder = WaveFileRecorder(self.record_file, audio_capture.sample_rate) if self.record_file else None
 
-        def record_callback(indata, frames, time, status):
-            if status:
-                logging.error(str(status))
-            speech_queue.put(bytes(indata))
+            self.pending_grammar_words = None
+            words_json = self.get_recognizer_grammar()
+            recognizer = KaldiRecognizer(self.model, audio_capture.sample_rate, words_json)
+            recognizer.SetWords(False)
+            recognizer.SetGrammar(words_json)
+            if self.max_alternatives > 1:
+                recognizer.SetMaxAlternatives(self.max_alternatives)
 
-        words_json = json.dumps(self.grammar_parser.all_words)
-        recognizer = KaldiRecognizer(self.model, samplerate, words_json)
-        recognizer.SetWords(False)
-        recognizer.SetGrammar(words_json)
+            voice_activity_gate = None
+            if self.voice_activity_detection or self.silence_endpoint:
+                # Without voice activity detection, every bit of audio still goes to VOSK, and the gate only ends the
+                # utterance once the endpoint silence has passed
+                voice_activity_gate = VoiceActivityGate(audio_capture.sample_rate,
+                                                        hangover_seconds=self.endpoint_silence,
+                                                        forward_silence=not self.voice_activity_detection)
+            endpointer = Endpointer(audio_capture.sample_rate, self.max_utterance_length, self.grammar_endpoint)
+            self.endpointer = endpointer
+            speaking_gate = None
+            if self.speaking_mode != SpeakingMode.Continue:
+                speaking_mode = self.speaking_mode
+                if speaking_mode == SpeakingMode.Duck and not self.voice_activity_detection:
+                    logging.warning("Ducking while speaking needs voice activity detection, so pausing instead")
+                    speaking_mode = SpeakingMode.Pause
+                speaking_gate = SpeakingGate(speaking_mode, audio_capture.sample_rate, self.speaking_tail_seconds,
+                                             self.is_speaking)
+            self.speaking_gate = speaking_gate
+            wake_prefix_gate = None
+            if self.wake_prefix and len(self.grammar_parser.prefix) > 0:
+                wake_prefix_gate = WakePrefixGate(self.model, audio_capture.sample_rate, self.grammar_parser.prefix,
+                                                  recognizer, self.wake_prefix_timeout, run_decoder=self.run_decoder)
+                logging.info("Waiting for the prefix \"" + wake_prefix_gate.prefix + "\" before recognizing the grammar")
+            last_partial_text = ""
+            decode_seconds = 0
+            decoded_samples = 0
+            self.audio_position = 0
+            self.decode_seconds = 0
 
-        try:
             logging.info("Started listening to voice via VOSK")
             print("Started listening to voice via VOSK")
-            with sd.RawInputStream(dtype='int16',
-                                   channels=1,
-                                   callback=record_callback):
+            with audio_capture, recorder if recorder else contextlib.nullcontext():
                 response = speech_service_pb2.SpeechServiceResponse()
                 response.speech_recognition_started.successful = True
+                response.speech_recognition_started.session_id = self.session_id
+                response.speech_recognition_started.grammar_hash = self.grammar_hash
                 if self.grpc_response_queue:
-                    asyncio.run(self.grpc_response_queue.put(response))
+                    self.post_to_loop(self.grpc_response_queue, response)
                 while not stop_speech_recognition_event.is_set() and not self.shutdown_event.is_set():
-                    data = speech_queue.get()
-                    if recognizer.AcceptWaveform(data):
-                        recognized_text = recognizer.Result()
-                        if recognized_text:
-                            asyncio.run(self.recognition_queue.put(recognized_text))
+                    data = audio_capture.read()
+                    if data is None:
+                        if audio_capture.is_finished:
+                            self.__post_result(self.run_decoder(recognizer.FinalResult), "recognizer",
+                                               voice_activity_gate)
+                            break
+                        continue
+                    self.audio_position += len(data) // 2 / audio_capture.sample_rate
+                    if recorder:
+                        recorder.write(data)
+                    if self.pending_grammar_words is not None:
+                        words_json, self.pending_grammar_words = self.pending_grammar_words, None
+                        self.run_decoder(recognizer.SetGrammar, words_json)
+                        logging.info("Updated VOSK grammar vocabulary")
+                        if wake_prefix_gate and len(self.grammar_parser.prefix) > 0:
+                            wake_prefix_gate.set_prefix(self.grammar_parser.prefix)
+                        elif wake_prefix_gate:
+                            logging.info("The new grammar has no prefix, so the full grammar is always recognized")
+                            wake_prefix_gate = None
+
+                    if speaking_gate:
+                        suppressing = speaking_gate.process(len(data) // 2)
+                        if suppressing and speaking_gate.mode == SpeakingMode.Pause:
+                            # Anything said before the speech started is recognized now, rather than being joined to
+                            # whatever is heard after it
+                            if endpointer.utterance_samples > 0:
+                                speaking_gate.finished_utterances += 1
+                                recognized_text = self.run_decoder(recognizer.FinalResult)
+                                self.__post_result(recognized_text, "speaking", voice_activity_gate)
+                                last_partial_text = ""
+                                if wake_prefix_gate and self.get_result_texts(json.loads(recognized_text)):
+                                    wake_prefix_gate.sleep(True)
+                            if voice_activity_gate:
+                                voice_activity_gate.reset()
+                        elif suppressing is not None and speaking_gate.mode == SpeakingMode.Duck:
+                            voice_activity_gate.threshold_boost = SpeakingGate.duck_threshold_boost if suppressing else 1
+                        if speaking_gate.is_suppressing and speaking_gate.mode == SpeakingMode.Pause:
+                            continue
+
+                    chunks = voice_activity_gate.process(data) if voice_activity_gate else [data]
+                    if wake_prefix_gate:
+                        chunks = [forwarded for chunk in chunks for forwarded in wake_prefix_gate.process(chunk)]
+                    for chunk in chunks:
+                        if chunk is None:
+                            # The speech region ended, so finish the utterance rather than waiting for more audio
+                            recognized_text = self.run_decoder(recognizer.FinalResult)
+                            self.__post_result(recognized_text, "silence", voice_activity_gate)
+                            last_partial_text = ""
+                            if wake_prefix_gate and self.get_result_texts(json.loads(recognized_text)):
+                                wake_prefix_gate.sleep(True)
+                            continue
+
+                        accepted, chunk_decode_seconds = self.run_decoder(self.__decode, recognizer, chunk)
+                        decode_seconds += chunk_decode_seconds
+                        self.decode_seconds = decode_seconds
+                        decoded_samples += len(chunk) // 2
+                        endpoint_reason = endpointer.add_audio(len(chunk) // 2)
+
+                        if accepted or endpoint_reason:
+                            get_result = recognizer.Result if accepted else recognizer.FinalResult
+                            recognized_text = self.run_decoder(get_result)
+                            last_partial_text = ""
+                            if recognized_text:
+                                self.__post_result(recognized_text, endpoint_reason or "recognizer",
+                                                   voice_activity_gate)
+                                if wake_prefix_gate and self.get_result_texts(json.loads(recognized_text)):
+                                    wake_prefix_gate.sleep(True)
+                        elif self.early_match_enabled or self.grammar_endpoint:
+                            partial_result = json.loads(self.run_decoder(recognizer.PartialResult))
+                            partial_text = partial_result.get("partial", "")
+                            if partial_text and partial_text != last_partial_text:
+                                last_partial_text = partial_text
+                                partial_result["utterance"] = endpointer.utterance
+                                self.post_to_loop(self.recognition_queue, json.dumps(partial_result))
+            if recorder:
+                logging.info("Recorded speech recognition audio to " + self.record_file)
             logging.info("Stopped listening to voice via VOSK")
             print("Stopped listening to voice via VOSK")
+            logging.info("Grammar match cache stats: " + json.dumps(self.grammar_parser.get_match_cache_stats()))
+            # Measuring the grammar walks all of it, which file recognition would otherwise pay for every file
+            if logging.getLogger().isEnabledFor(logging.INFO):
+                grammar_memory_stats = self.grammar_parser.get_memory_stats()
+                grammar_memory_stats.pop("bytes_per_rule")
+                logging.info("Grammar memory stats: " + json.dumps(grammar_memory_stats))
+            logging.info("Grammar cache stats: " + json.dumps(self.grammar_cache.get_stats()))
+            logging.info("Recognition metrics: " + json.dumps(self.recognition_metrics.get_stats()))
+            if self.early_match_count > 0:
+                logging.info("Early matches: " + str(self.early_match_count) + ", average " +
+                             str(round(self.early_match_saved_seconds / self.early_match_count * 1000)) +
+                             "ms ahead of the final result")
+            if voice_activity_gate:
+                voice_activity_stats = voice_activity_gate.get_stats()
+                if decoded_samples > 0:
+                    decode_cost = decode_seconds / (decoded_samples / audio_capture.sample_rate)
+                    voice_activity_stats["estimated_saved_cpu_seconds"] = \
+                        round(voice_activity_stats["skipped_seconds"] * decode_cost, 2)
+                logging.info("Voice activity detection stats: " + json.dumps(voice_activity_stats))
+            if wake_prefix_gate:
+                logging.info("Wake prefix stats: " + json.dumps(wake_prefix_gate.get_stats()))
+            logging.info("Endpointing stats: " + json.dumps(endpointer.get_stats()))
+            if speaking_gate:
+                speaking_stats = speaking_gate.get_stats()
+                if decoded_samples > 0 and speaking_gate.mode == SpeakingMode.Pause:
+                    decode_cost = decode_seconds / (decoded_samples / audio_capture.sample_rate)
+                    speaking_stats["estimated_saved_cpu_seconds"] = \
+                        round(speaking_stats["suppressed_seconds"] * decode_cost, 2)
+                logging.info("Speaking stats: " + json.dumps(speaking_stats))
         except KeyboardInterrupt:
             print('Finished recording due to keyboard interrupt')
             logging.error("Finished recording due to keyboard interrupt")
         except Exception as e:
+            self.listen_error = e
             print("Error from VOSK: " + str(e))
             logging.error("Error from VOSK: " + str(e))
             logging.error(e)
             logging.error(traceback.format_exc())
 
+    def run_decoder(self, function: Callable, *args):
+        # Runs a recognizer call that decodes audio or builds its results on the shared decode pool
+        return self.decode_executor.submit(function, *args).result()
+
+    @staticmethod
+    def __decode(recognizer: KaldiRecognizer, chunk: bytes) -> (bool, float):
+        decode_start = time.perf_counter()
+        accepted = recognizer.AcceptWaveform(chunk)
+        return accepted, time.perf_counter() - decode_start
+
+    def __post_result(self, recognized_text: str, endpoint_reason: str,
+                      voice_activity_gate: Optional[VoiceActivityGate]):
+        self.endpointer.end_utterance(endpoint_reason)
+        result_dict = json.loads(recognized_text)
+        result_dict["result_time"] = time.perf_counter()
+        if voice_activity_gate:
+            # Used to measure how long after the last speech the result was ready
+            result_dict["speech_end_time"] = result_dict["result_time"] - voice_activity_gate.get_seconds_since_speech()
+        result_dict["endpoint"] = endpoint_reason
+        result_dict["audio_position"] = round(self.audio_position, 3)
+        self.post_to_loop(self.recognition_queue, json.dumps(result_dict))
+
+    def get_recognizer_grammar(self) -> str:
+        # Either every phrase in the grammar, so VOSK only hears those phrases, or just the words, which VOSK can hear
+        # in any order
+        if self.phrase_grammar:
+            return json.dumps(self.grammar_parser.get_recognizer_phrases())
+        return json.dumps(self.grammar_parser.all_words)
+
+    def post_to_loop(self, target_queue: asyncio.Queue, item):
+        # asyncio queues are not thread safe, so items from the listen thread are put on the queue by the event loop
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(target_queue.put_nowait, item)
+
     async def process_speech(self, recognizer_result: str):
         try:
+            process_start = time.perf_counter()
             result_dict = json.loads(recognizer_result)
-            text_recognized = result_dict.get("text", "")
-            if not text_recognized == "":
+            if "partial" in result_dict:
+                await self.process_partial_speech(self.remove_unknown_words(result_dict.get("partial", "")),
+                                                  result_dict.get("utterance"))
+                return
+
+            # A final result ends the utterance, so any early match belongs to this result
+            early_match = self.early_match
+            self.early_match = None
+
+            texts_recognized = self.get_result_texts(result_dict)
+            if len(texts_recognized) > 0:
+                # Seconds spent in each stage for this utterance, timed from the end of speech when VAD is enabled
+                timings: dict[str, float] = {}
+                if "speech_end_time" in result_dict:
+                    timings["kaldi_result"] = result_dict["result_time"] - result_dict["speech_end_time"]
+                if "result_time" in result_dict:
+                    timings["queue"] = process_start - result_dict["result_time"]
 
-                match = self.grammar_parser.find_match(text_recognized, self.required_confidence)
+                match_start = time.perf_counter()
+                text_recognized = texts_recognized[0]
+                if len(texts_recognized) > 1:
+                    # Every alternative VOSK heard is matched at once, and the one closest to the grammar wins
+                    index, match = self.grammar_parser.find_best_match(texts_recognized, self.required_confidence)
+                    if index > 0:
+                        logging.info("Matched alternative " + str(index + 1) + " of " + str(len(texts_recognized)) +
+                                     " instead of \"" + text_recognized + "\"")
+                        text_recognized = texts_recognized[index]
+                else:
+                    match = self.grammar_parser.find_match(text_recognized, self.required_confidence)
+                timings["find_match"] = time.perf_counter() - match_start
+                timings.update(self.grammar_parser.match_timings)
+
+                if match is not None:
+                    self.recognition_metrics.add_count("matched")
+                elif self.grammar_parser.below_threshold_confidence > 0:
+                    self.recognition_metrics.add_count("below_threshold")
+                else:
+                    self.recognition_metrics.add_count("rejected")
+                if self.result_listener:
+                    self.result_listener(result_dict, text_recognized, match, timings)
 
                 if match is not None:
+                    if early_match is not None:
+                        saved_seconds = time.perf_counter() - self.early_match_time
+                        self.early_match_count += 1
+                        self.early_match_saved_seconds += saved_seconds
+                        logging.info("Early match was " + str(round(saved_seconds * 1000)) + "ms ahead of the final result")
+                        if early_match.rule == match.rule and early_match.values == match.values:
+                            logging.debug("Skipping final result already sent as an early match")
+                            self.recognition_metrics.add_timings(timings)
+                            return
                     logging.info("Matched text \"" + match.matched_text + "\" (heard \"" + text_recognized + "\"")
-                    if self.grpc_response_queue:
-                        response = speech_service_pb2.SpeechServiceResponse()
-                        response.speech_recognized.heard_text = text_recognized
-                        response.speech_recognized.recognized_text = match.matched_text
-                        response.speech_recognized.recognized_rule = match.rule
-                        response.speech_recognized.confidence = round(match.confidence, 2)
-                        response.speech_recognized.semantics.update(match.values)
-                        await self.grpc_response_queue.put(response)
-                    else:
-                        print("I heard: '" + text_recognized + "', but I am " + str(round(match.confidence, 2)) + "% sure you said '" + match.matched_text + "'")
-                        if self.stop_after_first_recognition:
-                            self.stop_speech_recognition()
+                    start_time = result_dict.get("speech_end_time", result_dict.get("result_time"))
+                    if start_time is not None:
+                        timings["total"] = time.perf_counter() - start_time
+                    self.recognition_metrics.add_timings(timings)
+                    logging.debug("Recognition timings: " +
+                                  json.dumps({stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}))
+                    await self.send_match(text_recognized, match, timings)
+                    if "speech_end_time" in result_dict and self.endpointer is not None:
+                        latency = time.perf_counter() - result_dict["speech_end_time"]
+                        self.endpointer.add_latency(latency)
+                        logging.info("Result was ready " + str(round(latency * 1000)) + "ms after the end of speech (" +
+                                     result_dict.get("endpoint", "") + " endpoint)")
                 else:
-                    logging.debug("Recognized text " + text_recognized)
+                    self.recognition_metrics.add_timings(timings)
+                    if self.grammar_parser.below_threshold_confidence > 0:
+                        logging.debug("Recognized text " + text_recognized + " below the required confidence (" +
+                                      str(round(self.grammar_parser.below_threshold_confidence, 2)) + ")")
+                    else:
+                        logging.debug("Recognized text " + text_recognized)
 
         except Exception as e:
             print("Error processing speech: " + str(e))
@@ -186,8 +543,113 @@ class SpeechRecognition:
             logging.error(e)
             logging.error(traceback.format_exc())
 
+    async def process_partial_speech(self, partial_text: str, utterance: Optional[int] = None):
+        if self.early_match is not None or partial_text == "":
+            return
+
+        # Nothing is done until no more words could extend the match, so "use the red" doesn't end the utterance or
+        # send a match before the rest of "use the red potion" is heard
+        match = self.grammar_parser.find_partial_match(partial_text, self.required_confidence)
+        if match is None or not match.is_complete:
+            return
+
+        if self.grammar_endpoint and self.endpointer is not None and utterance is not None:
+            # The listen thread ends the utterance with the next audio, instead of waiting for trailing silence
+            self.endpointer.set_complete(utterance)
+        if not self.early_match_enabled:
+            return
+
+        self.early_match = match
+        self.early_match_time = time.perf_counter()
+        logging.info("Early matched text \"" + match.matched_text + "\" (heard \"" + partial_text + "\"")
+        await self.send_match(partial_text, match)
+
+    @staticmethod
+    def get_result_texts(result_dict: dict) -> list[str]:
+        # With max alternatives set, VOSK returns a list of alternatives, best first, instead of the text
+        if "alternatives" in result_dict:
+            texts = [alternative.get("text", "") for alternative in result_dict["alternatives"]]
+        else:
+            texts = [result_dict.get("text", "")]
+        result_texts = []
+        for text in texts:
+            text = " ".join(SpeechRecognition.remove_unknown_words(text).split())
+            if text != "" and text not in result_texts:
+                result_texts.append(text)
+        return result_texts
+
+    @staticmethod
+    def remove_unknown_words(text: str) -> str:
+        # VOSK reports speech outside of a phrase grammar as [unk]
+        if "[unk]" not in text:
+            return text
+        return " ".join(word for word in text.split() if word != "[unk]")
+
+    async def send_match(self, text_recognized: str, match: GrammarElementMatch,
+                         timings: Optional[dict[str, float]] = None):
+        if self.grpc_response_queue:
+            response = speech_service_pb2.SpeechServiceResponse()
+            response.speech_recognized.heard_text = text_recognized
+            response.speech_recognized.recognized_text = match.matched_text
+            response.speech_recognized.recognized_rule = match.rule
+            response.speech_recognized.confidence = round(match.confidence, 2)
+            response.speech_recognized.semantics.update(match.values)
+            response.speech_recognized.session_id = self.session_id
+            if timings:
+                for stage, seconds in timings.items():
+                    setattr(response.speech_recognized.timings, stage + "_ms", round(seconds * 1000, 3))
+            await self.grpc_response_queue.put(response)
+        else:
+            print("I heard: '" + text_recognized + "', but I am " + str(round(match.confidence, 2)) + "% sure you said '" + match.matched_text + "'")
+            if self.stop_after_first_recognition:
+                self.stop_speech_recognition()
+
+    def add_client_audio(self, audio: bytes, sequence: int = 0, end_of_stream: bool = False):
+        client_audio_source = self.client_audio_source
+        if client_audio_source is None:
+            logging.debug("Ignoring client audio as speech recognition was not started with a client audio format")
+            return
+        if client_audio_source.write(audio, sequence, end_of_stream) and self.grpc_response_queue:
+            # Lets the client know how far behind recognition is, so it can slow down before audio is dropped
+            response = speech_service_pb2.SpeechServiceResponse()
+            response.client_audio_status.sequence = client_audio_source.sequence
+            response.client_audio_status.buffered_seconds = round(client_audio_source.get_buffered_seconds(), 3)
+            response.client_audio_status.dropped_samples = client_audio_source.ring_buffer.dropped_samples
+            response.client_audio_status.end_of_stream = client_audio_source.end_of_stream
+            response.client_audio_status.session_id = self.session_id
+            self.grpc_response_queue.put_nowait(response)
+
+    def send_recognition_metrics(self):
+        if self.grpc_response_queue:
+            response = speech_service_pb2.SpeechServiceResponse()
+            response.recognition_metrics.session_id = self.session_id
+            response.recognition_metrics.matched = self.recognition_metrics.counts["matched"]
+            response.recognition_metrics.rejected = self.recognition_metrics.counts["rejected"]
+            response.recognition_metrics.below_threshold = self.recognition_metrics.counts["below_threshold"]
+            for stage, stage_stats in self.recognition_metrics.get_stage_stats().items():
+                response.recognition_metrics.stages[stage].CopyFrom(
+                    speech_service_pb2.StageLatency(**stage_stats))
+            self.grpc_response_queue.put_nowait(response)
+
+    def set_speaking(self, is_speaking: bool):
+        self.is_speaking = is_speaking
+        speaking_gate = self.speaking_gate
+        if speaking_gate:
+            speaking_gate.set_speaking(is_speaking)
+
     def set_grpc_response_queue(self, queue: asyncio.Queue):
         self.grpc_response_queue = queue
+        # Grammars are compiled off the event loop, so their progress is posted through the queue's loop
+        with contextlib.suppress(RuntimeError):
+            self.loop = asyncio.get_running_loop()
+
+    def __post_grammar_progress(self, compiled_rules: int, total_rules: int):
+        if self.grpc_response_queue:
+            response = speech_service_pb2.SpeechServiceResponse()
+            response.grammar_compile_progress.compiled_rules = compiled_rules
+            response.grammar_compile_progress.total_rules = total_rules
+            response.grammar_compile_progress.session_id = self.session_id
+            self.post_to_loop(self.grpc_response_queue, response)
 
     def stop_speech_recognition(self):
         if self.stop_speech_recognition_event is not None:
@@ -13,53 +13,81 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14speech_service.proto\"\xa8\x03\n\x14SpeechServiceRequest\x12\x42\n\x18start_speech_recognition\x18\x01 \x01(\x0b\x32\x1e.StartSpeechRecognitionRequestH\x00\x12\x38\n\x13set_speech_settings\x18\x02 \x01(\x0b\x32\x19.SetSpeechSettingsRequestH\x00\x12\x1e\n\x05speak\x18\x03 \x01(\x0b\x32\r.SpeakRequestH\x00\x12-\n\rstop_speaking\x18\x04 \x01(\x0b\x32\x14.StopSpeakingRequestH\x00\x12$\n\x08shutdown\x18\x05 \x01(\x0b\x32\x10.ShutdownRequestH\x00\x12\x1c\n\x04ping\x18\x06 \x01(\x0b\x32\x0c.PingRequestH\x00\x12@\n\x17stop_speech_recognition\x18\x07 \x01(\x0b\x32\x1d.StopSpeechRecognitionRequestH\x00\x12-\n\nset_volume\x18\x08 \x01(\x0b\x32\x17.SetSpeechVolumeRequestH\x00\x42\x0e\n\x0cmessage_type\"\x85\x03\n\x15SpeechServiceResponse\x12,\n\x0cspeak_update\x18\x01 \x01(\x0b\x32\x14.SpeakUpdateResponseH\x00\x12\x37\n\x11speech_recognized\x18\x02 \x01(\x0b\x32\x1a.SpeechRecognitionResponseH\x00\x12$\n\x05\x65rror\x18\x03 \x01(\x0b\x32\x13.SpeechServiceErrorH\x00\x12\x1d\n\x04ping\x18\x04 \x01(\x0b\x32\r.PingResponseH\x00\x12\x45\n\x1aspeech_recognition_started\x18\x05 \x01(\x0b\x32\x1f.StartSpeechRecognitionResponseH\x00\x12\x39\n\x13speech_settings_set\x18\x06 \x01(\x0b\x32\x1a.SetSpeechSettingsResponseH\x00\x12.\n\nset_volume\x18\x07 \x01(\x0b\x32\x18.SetSpeechVolumeResponseH\x00\x42\x0e\n\x0cmessage_type\">\n\x12SpeechServiceError\x12\x15\n\rerror_message\x18\x01 \x01(\t\x12\x11\n\texception\x18\x02 \x01(\t\"f\n\x1dStartSpeechRecognitionRequest\x12\x12\n\nvosk_model\x18\x01 \x01(\t\x12\x14\n\x0cgrammar_file\x18\x02 \x01(\t\x12\x1b\n\x13required_confidence\x18\x03 \x01(\x01\"\x1e\n\x1cStopSpeechRecognitionRequest\"D\n\x18SetSpeechSettingsRequest\x12(\n\x0fspeech_settings\x18\x01 \x01(\x0b\x32\x0f.SpeechSettings\"\xc0\x01\n\x0eSpeechSettings\x12\x12\n\nmodel_name\x18\x01 \x01(\t\x12\x11\n\tonnx_path\x18\x02 \x01(\t\x12\x13\n\x0b\x63onfig_path\x18\x03 \x01(\t\x12\x16\n\x0e\x61lt_model_name\x18\x04 \x01(\t\x12\x15\n\ralt_onnx_path\x18\x05 \x01(\t\x12\x17\n\x0f\x61lt_config_path\x18\x06 \x01(\t\x12\r\n\x05speed\x18\x07 \x01(\x01\x12\x0c\n\x04gain\x18\x08 \x01(\x01\x12\r\n\x05pitch\x18\t \x01(\x01\"v\n\x0cSpeakRequest\x12\x0f\n\x07message\x18\x01 \x01(\t\x12-\n\x0fspeech_settings\x18\x02 \x01(\x0b\x32\x0f.SpeechSettingsH\x00\x88\x01\x01\x12\x12\n\nmessage_id\x18\x03 \x01(\x04\x42\x12\n\x10_speech_settings\"\x15\n\x13StopSpeakingRequest\"\xd2\x01\n\x13SpeakUpdateResponse\x12\x0f\n\x07message\x18\x01 \x01(\t\x12\r\n\x05\x63hunk\x18\x02 \x01(\t\x12\x1b\n\x13is_start_of_message\x18\x03 \x01(\x08\x12\x19\n\x11is_start_of_chunk\x18\x04 \x01(\x08\x12\x19\n\x11is_end_of_message\x18\x05 \x01(\x08\x12\x17\n\x0fis_end_of_chunk\x18\x06 \x01(\x08\x12\x1b\n\x13has_another_request\x18\x07 \x01(\x08\x12\x12\n\nmessage_id\x18\x08 \x01(\x04\"\xe5\x01\n\x19SpeechRecognitionResponse\x12\x12\n\nheard_text\x18\x01 \x01(\t\x12\x17\n\x0frecognized_text\x18\x02 \x01(\t\x12\x17\n\x0frecognized_rule\x18\x03 \x01(\t\x12\x12\n\nconfidence\x18\x04 \x01(\x01\x12<\n\tsemantics\x18\x05 \x03(\x0b\x32).SpeechRecognitionResponse.SemanticsEntry\x1a\x30\n\x0eSemanticsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\"\x11\n\x0fShutdownRequest\"\x1b\n\x0bPingRequest\x12\x0c\n\x04time\x18\x01 \x01(\t\"\x1c\n\x0cPingResponse\x12\x0c\n\x04time\x18\x01 \x01(\t\"4\n\x1eStartSpeechRecognitionResponse\x12\x12\n\nsuccessful\x18\x01 \x01(\x08\"/\n\x19SetSpeechSettingsResponse\x12\x12\n\nsuccessful\x18\x01 \x01(\x08\"(\n\x16SetSpeechVolumeRequest\x12\x0e\n\x06volume\x18\x01 \x01(\x01\"-\n\x17SetSpeechVolumeResponse\x12\x12\n\nsuccessful\x18\x01 \x01(\x08\x32X\n\rSpeechService\x12G\n\x12StartSpeechService\x12\x15.SpeechServiceRequest\x1a\x16.SpeechServiceResponse(\x01\x30\x01\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14speech_service.proto\"\xec\x04\n\x14SpeechServiceRequest\x12\x42\n\x18start_speech_recognition\x18\x01 \x01(\x0b\x32\x1e.StartSpeechRecognitionRequestH\x00\x12\x38\n\x13set_speech_settings\x18\x02 \x01(\x0b\x32\x19.SetSpeechSettingsRequestH\x00\x12\x1e\n\x05speak\x18\x03 \x01(\x0b\x32\r.SpeakRequestH\x00\x12-\n\rstop_speaking\x18\x04 \x01(\x0b\x32\x14.StopSpeakingRequestH\x00\x12$\n\x08shutdown\x18\x05 \x01(\x0b\x32\x10.ShutdownRequestH\x00\x12\x1c\n\x04ping\x18\x06 \x01(\x0b\x32\x0c.PingRequestH\x00\x12@\n\x17stop_speech_recognition\x18\x07 \x01(\x0b\x32\x1d.StopSpeechRecognitionRequestH\x00\x12-\n\nset_volume\x18\x08 \x01(\x0b\x32\x17.SetSpeechVolumeRequestH\x00\x12S\n!update_speech_recognition_grammar\x18\t \x01(\x0b\x32&.UpdateSpeechRecognitionGrammarRequestH\x00\x12+\n\x0c\x63lient_audio\x18\n \x01(\x0b\x32\x13.ClientAudioRequestH\x00\x12@\n\x17get_recognition_metrics\x18\x0b \x01(\x0b\x32\x1d.GetRecognitionMetricsRequestH\x00\x42\x0e\n\x0cmessage_type\"\x98\x05\n\x15SpeechServiceResponse\x12,\n\x0cspeak_update\x18\x01 \x01(\x0b\x32\x14.SpeakUpdateResponseH\x00\x12\x37\n\x11speech_recognized\x18\x02 \x01(\x0b\x32\x1a.SpeechRecognitionResponseH\x00\x12$\n\x05\x65rror\x18\x03 \x01(\x0b\x32\x13.SpeechServiceErrorH\x00\x12\x1d\n\x04ping\x18\x04 \x01(\x0b\x32\r.PingResponseH\x00\x12\x45\n\x1aspeech_recognition_started\x18\x05 \x01(\x0b\x32\x1f.StartSpeechRecognitionResponseH\x00\x12\x39\n\x13speech_settings_set\x18\x06 \x01(\x0b\x32\x1a.SetSpeechSettingsResponseH\x00\x12.\n\nset_volume\x18\x07 \x01(\x0b\x32\x18.SetSpeechVolumeResponseH\x00\x12U\n\"speech_recognition_grammar_updated\x18\x08 \x01(\x0b\x32\'.UpdateSpeechRecognitionGrammarResponseH\x00\x12\x39\n\x13\x63lient_audio_status\x18\t \x01(\x0b\x32\x1a.ClientAudioStatusResponseH\x00\x12\x43\n\x18grammar_compile_progress\x18\n \x01(\x0b\x32\x1f.GrammarCompileProgressResponseH\x00\x12:\n\x13recognition_metrics\x18\x0b \x01(\x0b\x32\x1b.RecognitionMetricsResponseH\x00\x42\x0e\n\x0cmessage_type\">\n\x12SpeechServiceError\x12\x15\n\rerror_message\x18\x01 \x01(\t\x12\x11\n\texception\x18\x02 \x01(\t\"\xc9\x05\n\x1dStartSpeechRecognitionRequest\x12\x12\n\nvosk_model\x18\x01 \x01(\t\x12\x14\n\x0cgrammar_file\x18\x02 \x01(\t\x12\x1b\n\x13required_confidence\x18\x03 \x01(\x01\x12\x13\n\x0b\x65\x61rly_match\x18\x04 \x01(\x08\x12%\n\x18voice_activity_detection\x18\x05 \x01(\x08H\x00\x88\x01\x01\x12\x16\n\x0einput_channels\x18\x06 \x01(\r\x12\x18\n\x10separate_process\x18\x07 \x01(\x08\x12\x13\n\x0brecord_file\x18\x08 \x01(\t\x12\x13\n\x0bwake_prefix\x18\t \x01(\x08\x12\x1b\n\x13wake_prefix_timeout\x18\n \x01(\x01\x12\x16\n\x0ephrase_grammar\x18\x0b \x01(\x08\x12\x18\n\x10max_alternatives\x18\x0c \x01(\r\x12\x18\n\x10\x65ndpoint_silence\x18\r \x01(\x01\x12\x1c\n\x14max_utterance_length\x18\x0e \x01(\x01\x12\x18\n\x10grammar_endpoint\x18\x0f \x01(\x08\x12(\n\x0c\x63lient_audio\x18\x10 \x01(\x0b\x32\x12.ClientAudioFormat\x12$\n\rspeaking_mode\x18\x11 \x01(\x0e\x32\r.SpeakingMode\x12\x1d\n\x15speaking_tail_seconds\x18\x12 \x01(\x01\x12\x12\n\nsession_id\x18\x13 \x01(\t\x12\x19\n\x0cinput_device\x18\x14 \x01(\x05H\x01\x88\x01\x01\x12\x14\n\x0cgrammar_data\x18\x15 \x01(\x0c\x12\x30\n\x13grammar_compression\x18\x16 \x01(\x0e\x32\x13.GrammarCompression\x12\x14\n\x0cgrammar_hash\x18\x17 \x01(\tB\x1b\n\x19_voice_activity_detectionB\x0f\n\r_input_device\"R\n\x11\x43lientAudioFormat\x12\x13\n\x0bsample_rate\x18\x01 \x01(\r\x12\x10\n\x08\x63hannels\x18\x02 \x01(\r\x12\x16\n\x0e\x62uffer_seconds\x18\x03 \x01(\x01\"`\n\x12\x43lientAudioRequest\x12\r\n\x05\x61udio\x18\x01 \x01(\x0c\x12\x10\n\x08sequence\x18\x02 \x01(\x04\x12\x15\n\rend_of_stream\x18\x03 \x01(\x08\x12\x12\n\nsession_id\x18\x04 \x01(\t\"\x8b\x01\n\x19\x43lientAudioStatusResponse\x12\x10\n\x08sequence\x18\x01 \x01(\x04\x12\x18\n\x10\x62uffered_seconds\x18\x02 \x01(\x01\x12\x17\n\x0f\x64ropped_samples\x18\x03 \x01(\x04\x12\x15\n\rend_of_stream\x18\x04 \x01(\x08\x12\x12\n\nsession_id\x18\x05 \x01(\t\"a\n\x1eGrammarCompileProgressResponse\x12\x16\n\x0e\x63ompiled_rules\x18\x01 \x01(\r\x12\x13\n\x0btotal_rules\x18\x02 \x01(\r\x12\x12\n\nsession_id\x18\x03 \x01(\t\"2\n\x1cGetRecognitionMetricsRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"\xe3\x01\n\x1aRecognitionMetricsResponse\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x0f\n\x07matched\x18\x02 \x01(\x04\x12\x10\n\x08rejected\x18\x03 \x01(\x04\x12\x17\n\x0f\x62\x65low_threshold\x18\x04 \x01(\x04\x12\x37\n\x06stages\x18\x05 \x03(\x0b\x32\'.RecognitionMetricsResponse.StagesEntry\x1a<\n\x0bStagesEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x1c\n\x05value\x18\x02 \x01(\x0b\x32\r.StageLatency:\x02\x38\x01\"M\n\x0cStageLatency\x12\r\n\x05\x63ount\x18\x01 \x01(\x04\x12\x0e\n\x06p50_ms\x18\x02 \x01(\x01\x12\x0e\n\x06p90_ms\x18\x03 \x01(\x01\x12\x0e\n\x06max_ms\x18\x04 \x01(\x01\"2\n\x1cStopSpeechRecognitionRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\"\x91\x01\n%UpdateSpeechRecognitionGrammarRequest\x12\x11\n\tadd_rules\x18\x01 \x01(\t\x12\x14\n\x0cremove_rules\x18\x02 \x03(\t\x12\x14\n\x0c\x65nable_rules\x18\x03 \x03(\t\x12\x15\n\rdisable_rules\x18\x04 \x03(\t\x12\x12\n\nsession_id\x18\x05 \x01(\t\"P\n&UpdateSpeechRecognitionGrammarResponse\x12\x12\n\nsuccessful\x18\x01 \x01(\x08\x12\x12\n\nsession_id\x18\x02 \x01(\t\"D\n\x18SetSpeechSettingsRequest\x12(\n\x0fspeech_settings\x18\x01 \x01(\x0b\x32\x0f.SpeechSettings\"\xc0\x01\n\x0eSpeechSettings\x12\x12\n\nmodel_name\x18\x01 \x01(\t\x12\x11\n\tonnx_path\x18\x02 \x01(\t\x12\x13\n\x0b\x63onfig_path\x18\x03 \x01(\t\x12\x16\n\x0e\x61lt_model_name\x18\x04 \x01(\t\x12\x15\n\ralt_onnx_path\x18\x05 \x01(\t\x12\x17\n\x0f\x61lt_config_path\x18\x06 \x01(\t\x12\r\n\x05speed\x18\x07 \x01(\x01\x12\x0c\n\x04gain\x18\x08 \x01(\x01\x12\r\n\x05pitch\x18\t \x01(\x01\"v\n\x0cSpeakRequest\x12\x0f\n\x07message\x18\x01 \x01(\t\x12-\n\x0fspeech_settings\x18\x02 \x01(\x0b\x32\x0f.SpeechSettingsH\x00\x88\x01\x01\x12\x12\n\nmessage_id\x18\x03 \x01(\x04\x42\x12\n\x10_speech_settings\"\x15\n\x13StopSpeakingRequest\"\xd2\x01\n\x13SpeakUpdateResponse\x12\x0f\n\x07message\x18\x01 \x01(\t\x12\r\n\x05\x63hunk\x18\x02 \x01(\t\x12\x1b\n\x13is_start_of_message\x18\x03 \x01(\x08\x12\x19\n\x11is_start_of_chunk\x18\x04 \x01(\x08\x12\x19\n\x11is_end_of_message\x18\x05 \x01(\x08\x12\x17\n\x0fis_end_of_chunk\x18\x06 \x01(\x08\x12\x1b\n\x13has_another_request\x18\x07 \x01(\x08\x12\x12\n\nmessage_id\x18\x08 \x01(\x04\"\xb0\x02\n\x19SpeechRecognitionResponse\x12\x12\n\nheard_text\x18\x01 \x01(\t\x12\x17\n\x0frecognized_text\x18\x02 \x01(\t\x12\x17\n\x0frecognized_rule\x18\x03 \x01(\t\x12\x12\n\nconfidence\x18\x04 \x01(\x01\x12<\n\tsemantics\x18\x05 \x03(\x0b\x32).SpeechRecognitionResponse.SemanticsEntry\x12\x12\n\nsession_id\x18\x06 \x01(\t\x12)\n\x07timings\x18\x07 \x01(\x0b\x32\x13.RecognitionTimingsH\x00\x88\x01\x01\x1a\x30\n\x0eSemanticsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t:\x02\x38\x01\x42\n\n\x08_timings\"\x8a\x03\n\x12RecognitionTimings\x12\x1c\n\x0fkaldi_result_ms\x18\x01 \x01(\x01H\x00\x88\x01\x01\x12\x15\n\x08queue_ms\x18\x02 \x01(\x01H\x01\x88\x01\x01\x12\x1a\n\rfind_match_ms\x18\x03 \x01(\x01H\x02\x88\x01\x01\x12\x16\n\tprefix_ms\x18\x04 \x01(\x01H\x03\x88\x01\x01\x12 \n\x13\x63\x61ndidate_search_ms\x18\x05 \x01(\x01H\x04\x88\x01\x01\x12!\n\x14key_value_scoring_ms\x18\x06 \x01(\x01H\x05\x88\x01\x01\x12\x1c\n\x0freplacements_ms\x18\x07 \x01(\x01H\x06\x88\x01\x01\x12\x15\n\x08total_ms\x18\x08 \x01(\x01H\x07\x88\x01\x01\x42\x12\n\x10_kaldi_result_msB\x0b\n\t_queue_msB\x10\n\x0e_find_match_msB\x0c\n\n_prefix_msB\x16\n\x14_candidate_search_msB\x17\n\x15_key_value_scoring_msB\x12\n\x10_replacements_msB\x0b\n\t_total_ms\"\x11\n\x0fShutdownRequest\"\x1b\n\x0bPingRequest\x12\x0c\n\x04time\x18\x01 \x01(\t\"\x1c\n\x0cPingResponse\x12\x0c\n\x04time\x18\x01 \x01(\t\"z\n\x1eStartSpeechRecognitionResponse\x12\x12\n\nsuccessful\x18\x01 \x01(\x08\x12\x12\n\nsession_id\x18\x02 \x01(\t\x12\x14\n\x0cgrammar_hash\x18\x03 \x01(\t\x12\x1a\n\x12grammar_not_cached\x18\x04 \x01(\x08\"/\n\x19SetSpeechSettingsResponse\x12\x12\n\nsuccessful\x18\x01 \x01(\x08\"(\n\x16SetSpeechVolumeRequest\x12\x0e\n\x06volume\x18\x01 \x01(\x01\"-\n\x17SetSpeechVolumeResponse\x12\x12\n\nsuccessful\x18\x01 \x01(\x08*P\n\x12GrammarCompression\x12\x1c\n\x18GRAMMAR_COMPRESSION_NONE\x10\x00\x12\x1c\n\x18GRAMMAR_COMPRESSION_GZIP\x10\x01*[\n\x0cSpeakingMode\x12\x1a\n\x16SPEAKING_MODE_CONTINUE\x10\x00\x12\x17\n\x13SPEAKING_MODE_PAUSE\x10\x01\x12\x16\n\x12SPEAKING_MODE_DUCK\x10\x02\x32X\n\rSpeechService\x12G\n\x12StartSpeechService\x12\x15.SpeechServiceRequest\x1a\x16.SpeechServiceResponse(\x01\x30\x01\x62\x06proto3')
 
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, globals())
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'speech_service_pb2', globals())
 if _descriptor._USE_C_DESCRIPTORS == False:
 
   DESCRIPTOR._options = None
+  _RECOGNITIONMETRICSRESPONSE_STAGESENTRY._options = None
+  _RECOGNITIONMETRICSRESPONSE_STAGESENTRY._serialized_options = b'8\001'
   _SPEECHRECOGNITIONRESPONSE_SEMANTICSENTRY._options = None
   _SPEECHRECOGNITIONRESPONSE_SEMANTICSENTRY._serialized_options = b'8\001'
+  _GRAMMARCOMPRESSION._serialized_start=4825
+  _GRAMMARCOMPRESSION._serialized_end=4905
+  _SPEAKINGMODE._serialized_start=4907
+  _SPEAKINGMODE._serialized_end=4998
   _SPEECHSERVICEREQUEST._serialized_start=25
-  _SPEECHSERVICEREQUEST._serialized_end=449
-  _SPEECHSERVICERESPONSE._serialized_start=452
-  _SPEECHSERVICERESPONSE._serialized_end=841
-  _SPEECHSERVICEERROR._serialized_start=843
-  _SPEECHSERVICEERROR._serialized_end=905
-  _STARTSPEECHRECOGNITIONREQUEST._serialized_start=907
-  _STARTSPEECHRECOGNITIONREQUEST._serialized_end=1009
-  _STOPSPEECHRECOGNITIONREQUEST._serialized_start=1011
-  _STOPSPEECHRECOGNITIONREQUEST._serialized_end=1041
-  _SETSPEECHSETTINGSREQUEST._serialized_start=1043
-  _SETSPEECHSETTINGSREQUEST._serialized_end=1111
-  _SPEECHSETTINGS._serialized_start=1114
-  _SPEECHSETTINGS._serialized_end=1306
-  _SPEAKREQUEST._serialized_start=1308
-  _SPEAKREQUEST._serialized_end=1426
-  _STOPSPEAKINGREQUEST._serialized_start=1428
-  _STOPSPEAKINGREQUEST._serialized_end=1449
-  _SPEAKUPDATERESPONSE._serialized_start=1452
-  _SPEAKUPDATERESPONSE._serialized_end=1662
-  _SPEECHRECOGNITIONRESPONSE._serialized_start=1665
-  _SPEECHRECOGNITIONRESPONSE._serialized_end=1894
-  _SPEECHRECOGNITIONRESPONSE_SEMANTICSENTRY._serialized_start=1846
-  _SPEECHRECOGNITIONRESPONSE_SEMANTICSENTRY._serialized_end=1894
-  _SHUTDOWNREQUEST._serialized_start=1896
-  _SHUTDOWNREQUEST._serialized_end=1913
-  _PINGREQUEST._serialized_start=1915
-  _PINGREQUEST._serialized_end=1942
-  _PINGRESPONSE._serialized_start=1944
-  _PINGRESPONSE._serialized_end=1972
-  _STARTSPEECHRECOGNITIONRESPONSE._serialized_start=1974
-  _STARTSPEECHRECOGNITIONRESPONSE._serialized_end=2026
-  _SETSPEECHSETTINGSRESPONSE._serialized_start=2028
-  _SETSPEECHSETTINGSRESPONSE._serialized_end=2075
-  _SETSPEECHVOLUMEREQUEST._serialized_start=2077
-  _SETSPEECHVOLUMEREQUEST._serialized_end=2117
-  _SETSPEECHVOLUMERESPONSE._serialized_start=2119
-  _SETSPEECHVOLUMERESPONSE._serialized_end=2164
-  _SPEECHSERVICE._serialized_start=2166
-  _SPEECHSERVICE._serialized_end=2254
+  _SPEECHSERVICEREQUEST._serialized_end=645
+  _SPEECHSERVICERESPONSE._serialized_start=648
+  _SPEECHSERVICERESPONSE._serialized_end=1312
+  _SPEECHSERVICEERROR._serialized_start=1314
+  _SPEECHSERVICEERROR._serialized_end=1376
+  _STARTSPEECHRECOGNITIONREQUEST._serialized_start=1379
+  _STARTSPEECHRECOGNITIONREQUEST._serialized_end=2092
+  _CLIENTAUDIOFORMAT._serialized_start=2094
+  _CLIENTAUDIOFORMAT._serialized_end=2176
+  _CLIENTAUDIOREQUEST._serialized_start=2178
+  _CLIENTAUDIOREQUEST._serialized_end=2274
+  _CLIENTAUDIOSTATUSRESPONSE._serialized_start=2277
+  _CLIENTAUDIOSTATUSRESPONSE._serialized_end=2416
+  _GRAMMARCOMPILEPROGRESSRESPONSE._serialized_start=2418
+  _GRAMMARCOMPILEPROGRESSRESPONSE._serialized_end=2515
+  _GETRECOGNITIONMETRICSREQUEST._serialized_start=2517
+  _GETRECOGNITIONMETRICSREQUEST._serialized_end=2567
+  _RECOGNITIONMETRICSRESPONSE._serialized_start=2570
+  _RECOGNITIONMETRICSRESPONSE._serialized_end=2797
+  _RECOGNITIONMETRICSRESPONSE_STAGESENTRY._serialized_start=2737
+  _RECOGNITIONMETRICSRESPONSE_STAGESENTRY._serialized_end=2797
+  _STAGELATENCY._serialized_start=2799
+  _STAGELATENCY._serialized_end=2876
+  _STOPSPEECHRECOGNITIONREQUEST._serialized_start=2878
+  _STOPSPEECHRECOGNITIONREQUEST._serialized_end=2928
+  _UPDATESPEECHRECOGNITIONGRAMMARREQUEST._serialized_start=2931
+  _UPDATESPEECHRECOGNITIONGRAMMARREQUEST._serialized_end=3076
+  _UPDATESPEECHRECOGNITIONGRAMMARRESPONSE._serialized_start=3078
+  _UPDATESPEECHRECOGNITIONGRAMMARRESPONSE._serialized_end=3158
+  _SETSPEECHSETTINGSREQUEST._serialized_start=3160
+  _SETSPEECHSETTINGSREQUEST._serialized_end=3228
+  _SPEECHSETTINGS._serialized_start=3231
+  _SPEECHSETTINGS._serialized_end=3423
+  _SPEAKREQUEST._serialized_start=3425
+  _SPEAKREQUEST._serialized_end=3543
+  _STOPSPEAKINGREQUEST._serialized_start=3545
+  _STOPSPEAKINGREQUEST._serialized_end=3566
+  _SPEAKUPDATERESPONSE._serialized_start=3569
+  _SPEAKUPDATERESPONSE._serialized_end=3779
+  _SPEECHRECOGNITIONRESPONSE._serialized_start=3782
+  _SPEECHRECOGNITIONRESPONSE._serialized_end=4086
+  _SPEECHRECOGNITIONRESPONSE_SEMANTICSENTRY._serialized_start=4026
+  _SPEECHRECOGNITIONRESPONSE_SEMANTICSENTRY._serialized_end=4074
+  _RECOGNITIONTIMINGS._serialized_start=4089
+  _RECOGNITIONTIMINGS._serialized_end=4483
+  _SHUTDOWNREQUEST._serialized_start=4485
+  _SHUTDOWNREQUEST._serialized_end=4502
+  _PINGREQUEST._serialized_start=4504
+  _PINGREQUEST._serialized_end=4531
+  _PINGRESPONSE._serialized_start=4533
+  _PINGRESPONSE._serialized_end=4561
+  _STARTSPEECHRECOGNITIONRESPONSE._serialized_start=4563
+  _STARTSPEECHRECOGNITIONRESPONSE._serialized_end=4685
+  _SETSPEECHSETTINGSRESPONSE._serialized_start=4687
+  _SETSPEECHSETTINGSRESPONSE._serialized_end=4734
+  _SETSPEECHVOLUMEREQUEST._serialized_start=4736
+  _SETSPEECHVOLUMEREQUEST._serialized_end=4776
+  _SETSPEECHVOLUMERESPONSE._serialized_start=4778
+  _SETSPEECHVOLUMERESPONSE._serialized_end=4823
+  _SPEECHSERVICE._serialized_start=5000
+  _SPEECHSERVICE._serialized_end=5088
 # @@protoc_insertion_point(module_scope)
@@ -0,0 +1,127 @@
+from collections import deque
+from typing import Optional
+
+import numpy
+
+
+class VoiceActivityGate:
+
+    def __init__(self, sample_rate: int, frame_seconds: float = 0.01, threshold_ratio: float = 3.0,
+                 min_energy: float = 100, hangover_seconds: float = 0.4, pre_roll_seconds: float = 0.3,
+                 noise_adapt_rate: float = 0.05, speech_noise_adapt_rate: float = 0.001, forward_silence: bool = False):
+        self.sample_rate = sample_rate
+        self.frame_size = max(1, int(sample_rate * frame_seconds))
+        self.threshold_ratio = threshold_ratio
+        self.min_energy = min_energy
+        self.hangover_frames = max(1, int(hangover_seconds / frame_seconds))
+        self.noise_adapt_rate = noise_adapt_rate
+        self.speech_noise_adapt_rate = speech_noise_adapt_rate
+        self.pre_roll = deque(maxlen=max(1, int(pre_roll_seconds / frame_seconds)))
+        self.remainder = numpy.zeros(0, dtype=numpy.int16)
+        self.noise_floor = None
+        self.is_speech_active = False
+        self.hangover_remaining = 0
+        self.total_frames = 0
+        self.forwarded_frames = 0
+        self.speech_segments = 0
+        self.last_loud_frame = 0
+        self.threshold_boost = 1
+        self.forward_silence = forward_silence
+
+    sample_rate: int
+    frame_size: int
+    threshold_ratio: float
+    min_energy: float
+    hangover_frames: int
+    noise_adapt_rate: float
+    speech_noise_adapt_rate: float
+    pre_roll: deque[numpy.ndarray]
+    remainder: numpy.ndarray
+    noise_floor: Optional[float]
+    is_speech_active: bool
+    hangover_remaining: int
+    total_frames: int
+    forwarded_frames: int
+    speech_segments: int
+    last_loud_frame: int
+    # Raises the threshold while other known sounds are playing
+    threshold_boost: float
+    # Forwards the audio outside of speech too, so the gate only marks where speech ends
+    forward_silence: bool
+
+    def process(self, data: bytes) -> list[Optional[bytes]]:
+        # Returns the audio to forward to the recognizer in order. None marks the end of a speech region, where the
+        # recognizer should be finalized since it won't receive the trailing silence it needs to end the utterance.
+        samples = numpy.concatenate((self.remainder, numpy.frombuffer(data, dtype=numpy.int16)))
+        frame_count = len(samples) // self.frame_size
+        self.remainder = samples[frame_count * self.frame_size:]
+        if frame_count == 0:
+            return []
+
+        frames = samples[:frame_count * self.frame_size].reshape(frame_count, self.frame_size)
+        energies = numpy.sqrt(numpy.mean(numpy.square(frames, dtype=numpy.float32), axis=1))
+        if self.noise_floor is None:
+            self.noise_floor = float(min(energies[0], self.min_energy))
+
+        output: list[Optional[bytes]] = []
+        forwarded: list[numpy.ndarray] = []
+        for frame, energy in zip(frames, energies):
+            self.total_frames += 1
+            is_loud = energy > max(self.noise_floor * self.threshold_ratio, self.min_energy) * self.threshold_boost
+
+            # The noise floor follows quiet frames quickly and loud frames slowly, so a gate stuck open by a change
+            # in background noise eventually closes
+            adapt_rate = self.speech_noise_adapt_rate if is_loud else self.noise_adapt_rate
+            self.noise_floor += adapt_rate * (float(energy) - self.noise_floor)
+
+            if is_loud:
+                if not self.is_speech_active:
+                    self.is_speech_active = True
+                    self.speech_segments += 1
+                    forwarded.extend(self.pre_roll)
+                    self.pre_roll.clear()
+                self.hangover_remaining = self.hangover_frames
+                self.last_loud_frame = self.total_frames
+                forwarded.append(frame)
+            elif self.is_speech_active:
+                forwarded.append(frame)
+                self.hangover_remaining -= 1
+                if self.hangover_remaining <= 0:
+                    self.is_speech_active = False
+                    output.append(self.__join_frames(forwarded))
+                    output.append(None)
+                    forwarded = []
+            elif self.forward_silence:
+                forwarded.append(frame)
+            else:
+                self.pre_roll.append(frame)
+
+        if len(forwarded) > 0:
+            output.append(self.__join_frames(forwarded))
+        return output
+
+    def reset(self):
+        # Forgets audio in progress, for when the audio stops being forwarded part way through
+        self.pre_roll.clear()
+        self.remainder = numpy.zeros(0, dtype=numpy.int16)
+        self.is_speech_active = False
+        self.hangover_remaining = 0
+
+    def get_seconds_since_speech(self) -> float:
+        return (self.total_frames - self.last_loud_frame + len(self.remainder) / self.frame_size) * \
+            self.frame_size / self.sample_rate
+
+    def get_stats(self) -> dict[str, float]:
+        frame_seconds = self.frame_size / self.sample_rate
+        return {
+            "processed_seconds": round(self.total_frames * frame_seconds, 2),
+            "forwarded_seconds": round(self.forwarded_frames * frame_seconds, 2),
+            "skipped_seconds": round((self.total_frames - self.forwarded_frames) * frame_seconds, 2),
+            "skipped_ratio": round(1 - self.forwarded_frames / self.total_frames, 3) if self.total_frames > 0 else 0,
+            "speech_segments": self.speech_segments,
+            "noise_floor": round(self.noise_floor, 1) if self.noise_floor is not None else 0
+        }
+
+    def __join_frames(self, frames: list[numpy.ndarray]) -> bytes:
+        self.forwarded_frames += len(frames)
+        return numpy.concatenate(frames).tobytes()
@@ -0,0 +1,118 @@
+import json
+from collections import deque
+from typing import Callable, Optional
+
+from vosk import Model, KaldiRecognizer
+
+
+class WakePrefixGate:
+    # While idle, audio only goes to a recognizer that can hear the grammar's prefix words. Once the prefix is heard,
+    # the recent audio is replayed into the full grammar recognizer and everything after it is forwarded until a phrase
+    # is recognized or the timeout passes.
+
+    def __init__(self, model: Model, sample_rate: int, prefix: list[str], recognizer: KaldiRecognizer,
+                 timeout_seconds: float = 10, buffer_seconds: float = 3, run_decoder: Optional[Callable] = None):
+        self.sample_rate = sample_rate
+        self.run_decoder = run_decoder if run_decoder else WakePrefixGate.__run
+        self.recognizer = recognizer
+        self.timeout_samples = int(sample_rate * timeout_seconds)
+        self.buffer_samples = int(sample_rate * buffer_seconds)
+        self.buffer = deque()
+        self.buffered_samples = 0
+        self.is_awake = False
+        self.awake_samples = 0
+        self.total_samples = 0
+        self.total_awake_samples = 0
+        self.wake_count = 0
+        self.recognized_count = 0
+        self.prefix = ""
+        self.wake_recognizer = KaldiRecognizer(model, sample_rate, json.dumps([" ".join(prefix), "[unk]"]))
+        self.set_prefix(prefix)
+
+    sample_rate: int
+    recognizer: KaldiRecognizer
+    timeout_samples: int
+    buffer_samples: int
+    buffer: deque[bytes]
+    buffered_samples: int
+    is_awake: bool
+    awake_samples: int
+    total_samples: int
+    total_awake_samples: int
+    wake_count: int
+    recognized_count: int
+    prefix: str
+    wake_recognizer: KaldiRecognizer
+    # Runs the recognizer calls that decode audio, such as on the speech recognition decode pool
+    run_decoder: Callable
+
+    def set_prefix(self, prefix: list[str]):
+        self.prefix = " ".join(prefix).lower()
+        self.wake_recognizer.SetGrammar(json.dumps([self.prefix, "[unk]"]))
+        self.wake_recognizer.Reset()
+
+    def process(self, chunk: Optional[bytes]) -> list[Optional[bytes]]:
+        # Returns the audio for the full grammar recognizer, where None marks the end of a speech region
+        if chunk is None:
+            if self.is_awake:
+                return [None]
+            if self.__heard_prefix(self.run_decoder(self.wake_recognizer.FinalResult), "text"):
+                return self.__wake()
+            self.buffer.clear()
+            self.buffered_samples = 0
+            return []
+
+        samples = len(chunk) // 2
+        self.total_samples += samples
+        if self.is_awake and self.awake_samples + samples > self.timeout_samples:
+            self.sleep()
+        if self.is_awake:
+            self.awake_samples += samples
+            self.total_awake_samples += samples
+            return [chunk]
+
+        self.buffer.append(chunk)
+        self.buffered_samples += samples
+        while self.buffered_samples - len(self.buffer[0]) // 2 >= self.buffer_samples:
+            self.buffered_samples -= len(self.buffer.popleft()) // 2
+
+        if self.run_decoder(self.wake_recognizer.AcceptWaveform, chunk):
+            if self.__heard_prefix(self.run_decoder(self.wake_recognizer.Result), "text"):
+                return self.__wake()
+        elif self.__heard_prefix(self.run_decoder(self.wake_recognizer.PartialResult), "partial"):
+            return self.__wake()
+        return []
+
+    def sleep(self, recognized: bool = False):
+        if recognized:
+            self.recognized_count += 1
+        self.is_awake = False
+        self.recognizer.Reset()
+        self.wake_recognizer.Reset()
+
+    def get_stats(self) -> dict[str, float]:
+        return {
+            "wake_count": self.wake_count,
+            "recognized_count": self.recognized_count,
+            "awake_seconds": round(self.total_awake_samples / self.sample_rate, 2),
+            "idle_seconds": round((self.total_samples - self.total_awake_samples) / self.sample_rate, 2),
+            "awake_ratio": round(self.total_awake_samples / self.total_samples, 3) if self.total_samples > 0 else 0
+        }
+
+    @staticmethod
+    def __run(function: Callable, *args):
+        return function(*args)
+
+    def __heard_prefix(self, result: str, field: str) -> bool:
+        return self.prefix != "" and self.prefix in json.loads(result).get(field, "")
+
+    def __wake(self) -> list[Optional[bytes]]:
+        self.is_awake = True
+        self.awake_samples = self.buffered_samples
+        self.total_awake_samples += self.buffered_samples
+        self.wake_count += 1
+        self.wake_recognizer.Reset()
+        buffered = list(self.buffer)
+        self.buffer.clear()
+        self.buffered_samples = 0
+        return buffered
@@ -0,0 +1,60 @@
+import json
+
+from py_speech_service.aho_corasick import AhoCorasick
+from py_speech_service.grammar_parser import GrammarParser
+from test_grammar_parser import key_value_element, rule, string_element
+
+
+def get_matches(aho_corasick: AhoCorasick, text: str) -> list[tuple[int, int, str]]:
+    return [(match.start, match.end, match.pattern) for match in aho_corasick.find_all(text)]
+
+
+def test_matches_only_whole_words():
+    aho_corasick = AhoCorasick(["red"])
+
+    assert get_matches(aho_corasick, "i am bored") == []
+    assert get_matches(aho_corasick, "reddish red") == [(8, 11, "red")]
+    assert get_matches(aho_corasick, "red, then red") == [(0, 3, "red"), (10, 13, "red")]
+
+
+def test_overlapping_keys_take_the_leftmost_longest_match():
+    aho_corasick = AhoCorasick(["red", "red potion", "potion of healing"])
+
+    assert get_matches(aho_corasick, "use the red potion of healing") == [(8, 18, "red potion")]
+    assert get_matches(aho_corasick, "use the potion of healing") == [(8, 25, "potion of healing")]
+
+
+def test_finds_every_key_in_the_text():
+    aho_corasick = AhoCorasick(["red", "blue", "green"])
+
+    assert get_matches(aho_corasick, "red blue red green") == \
+           [(0, 3, "red"), (4, 8, "blue"), (9, 12, "red"), (13, 18, "green")]
+
+
+def test_expand_produces_every_combination_of_alternatives():
+    aho_corasick = AhoCorasick(["light", "on"])
+    alternatives = {"light": ["light", "lamp"], "on": ["on", "up"]}
+
+    assert sorted(aho_corasick.expand("turn on the light", alternatives)) == \
+           ["turn on the lamp", "turn on the light", "turn up the lamp", "turn up the light"]
+    assert aho_corasick.expand("open the door", alternatives) == ["open the door"]
+
+
+def test_replace_swaps_each_match():
+    aho_corasick = AhoCorasick(["lamp", "switch on"])
+
+    assert aho_corasick.replace("switch on the lamp by the lamppost", {"lamp": "light", "switch on": "turn on"}) == \
+           "turn on the light by the lamppost"
+
+
+def test_replacements_are_applied_to_the_matched_text():
+    grammar_parser = GrammarParser()
+    grammar_parser.set_grammar_json(json.dumps({
+        "Rules": [rule("lights", string_element("turn on the"), key_value_element("item", {"light": "LIGHT"}))],
+        "Replacements": {"lamp": "light"}
+    }))
+
+    match = grammar_parser.find_match("turn on the lamp")
+
+    assert match.values == {"item": "LIGHT"}
+    assert match.matched_text == "turn on the light"
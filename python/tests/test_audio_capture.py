@@ -0,0 +1,62 @@
+import threading
+import time
+
+import numpy
+import pytest
+
+try:
+    from py_speech_service.audio_capture import AudioRingBuffer
+except (ImportError, OSError) as e:
+    # sounddevice needs the PortAudio library, which isn't available everywhere
+    pytest.skip("Audio capture dependencies unavailable: " + str(e), allow_module_level=True)
+
+
+def create_samples(start: int, count: int) -> numpy.ndarray:
+    return numpy.arange(start, start + count, dtype=numpy.int16)
+
+
+def test_reads_return_the_audio_in_order_across_the_wrap():
+    ring_buffer = AudioRingBuffer(10)
+    ring_buffer.write(create_samples(0, 7))
+    assert numpy.array_equal(ring_buffer.read(5, 0), create_samples(0, 5))
+
+    ring_buffer.write(create_samples(7, 6))
+
+    assert numpy.array_equal(ring_buffer.read(100, 0), create_samples(5, 8))
+    assert ring_buffer.overflow_count == 0
+
+
+def test_overflow_drops_the_oldest_audio_and_counts_it():
+    ring_buffer = AudioRingBuffer(10)
+    ring_buffer.write(create_samples(0, 8))
+    ring_buffer.write(create_samples(8, 5))
+
+    assert ring_buffer.overflow_count == 1
+    assert ring_buffer.dropped_samples == 3
+    assert numpy.array_equal(ring_buffer.read(100, 0), create_samples(3, 10))
+
+
+def test_a_write_larger_than_the_buffer_keeps_the_newest_audio():
+    ring_buffer = AudioRingBuffer(10)
+    ring_buffer.write(create_samples(0, 4))
+    ring_buffer.write(create_samples(4, 15))
+
+    assert ring_buffer.dropped_samples == 9
+    assert numpy.array_equal(ring_buffer.read(100, 0), create_samples(9, 10))
+
+
+def test_a_read_times_out_without_audio():
+    ring_buffer = AudioRingBuffer(10)
+
+    start = time.perf_counter()
+    assert ring_buffer.read(5, 0.1) is None
+    assert time.perf_counter() - start >= 0.09
+
+
+def test_a_waiting_read_returns_when_audio_is_written():
+    ring_buffer = AudioRingBuffer(10)
+    writer = threading.Timer(0.05, ring_buffer.write, [create_samples(0, 3)])
+    writer.start()
+
+    assert numpy.array_equal(ring_buffer.read(5, 5), create_samples(0, 3))
+    writer.join()
@@ -0,0 +1,44 @@
+import numpy
+import pytest
+
+from py_speech_service.audio_resampler import AudioResampler
+
+
+def create_sine(sample_rate: int, frequency: float, seconds: float) -> numpy.ndarray:
+    times = numpy.arange(int(sample_rate * seconds)) / sample_rate
+    return (numpy.sin(2 * numpy.pi * frequency * times) * 10000).astype(numpy.int16)
+
+
+def process_in_chunks(resampler: AudioResampler, samples: numpy.ndarray, chunk_size: int) -> numpy.ndarray:
+    return numpy.concatenate([resampler.process(samples[start:start + chunk_size])
+                              for start in range(0, len(samples), chunk_size)])
+
+
+@pytest.mark.parametrize("input_rate", [44100, 48000, 22050])
+def test_output_length_follows_the_rate_ratio(input_rate: int):
+    resampler = AudioResampler(input_rate, 16000)
+    output = process_in_chunks(resampler, numpy.zeros(input_rate * 2, dtype=numpy.int16), 1000)
+
+    assert abs(len(output) - 32000) <= 1
+
+
+@pytest.mark.parametrize("input_rate", [44100, 48000])
+def test_a_sine_keeps_its_frequency(input_rate: int):
+    output = AudioResampler(input_rate, 16000).process(create_sine(input_rate, 1000, 1))
+
+    # Skips the filter's start up before looking for the strongest frequency
+    spectrum = numpy.abs(numpy.fft.rfft(output[1000:9000] * numpy.hanning(8000)))
+    peak_frequency = numpy.argmax(spectrum) * 16000 / 8000
+
+    assert peak_frequency == pytest.approx(1000, abs=2)
+    assert numpy.max(numpy.abs(output[1000:])) == pytest.approx(10000, rel=0.05)
+
+
+@pytest.mark.parametrize("input_rate", [44100, 48000])
+def test_chunk_boundaries_do_not_change_the_output(input_rate: int):
+    samples = create_sine(input_rate, 440, 1)
+    whole = AudioResampler(input_rate, 16000).process(samples)
+
+    for chunk_size in [1, 441, 1023, 4800]:
+        chunked = process_in_chunks(AudioResampler(input_rate, 16000), samples, chunk_size)
+        assert numpy.array_equal(chunked, whole)
@@ -0,0 +1,53 @@
+import numpy
+import pytest
+
+try:
+    from py_speech_service.client_audio import ClientAudioSource
+except (ImportError, OSError) as e:
+    # sounddevice needs the PortAudio library, which isn't available everywhere
+    pytest.skip("Client audio dependencies unavailable: " + str(e), allow_module_level=True)
+
+
+def create_audio(start: int, count: int, channels: int = 1) -> bytes:
+    return numpy.repeat(numpy.arange(start, start + count, dtype=numpy.int16), channels).tobytes()
+
+
+def test_stereo_frames_split_across_messages_are_mixed_to_mono():
+    client_audio_source = ClientAudioSource(16000, channels=2)
+    audio = create_audio(0, 100, channels=2)
+
+    client_audio_source.write(audio[:101], sequence=1)
+    client_audio_source.write(audio[101:], sequence=2)
+
+    assert client_audio_source.sequence == 2
+    assert client_audio_source.received_samples == 100
+    assert client_audio_source.read(0) == create_audio(0, 100)
+
+
+def test_a_status_is_due_every_status_interval_and_at_the_end_of_the_stream():
+    client_audio_source = ClientAudioSource(16000, status_seconds=0.5)
+
+    status_due = [client_audio_source.write(create_audio(0, 1600), sequence) for sequence in range(12)]
+    assert status_due == [False, False, False, False, True] * 2 + [False, False]
+
+    assert client_audio_source.write(b"", 12, end_of_stream=True)
+    assert client_audio_source.end_of_stream
+
+
+def test_the_stream_finishes_once_its_audio_is_read():
+    client_audio_source = ClientAudioSource(16000)
+    client_audio_source.write(create_audio(0, 800), 1, end_of_stream=True)
+
+    assert client_audio_source.read(0) == create_audio(0, 800)
+    assert not client_audio_source.is_finished
+    assert client_audio_source.read(0) is None
+    assert client_audio_source.is_finished
+
+
+def test_audio_is_resampled_to_the_recognizer_rate():
+    client_audio_source = ClientAudioSource(48000, max_read_seconds=1)
+    client_audio_source.set_sample_rate(16000)
+    client_audio_source.write(bytes(48000 * 2))
+
+    assert abs(len(client_audio_source.read(0)) // 2 - 16000) <= 1
+    assert client_audio_source.get_buffered_seconds() == 0
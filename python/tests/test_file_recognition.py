@@ -0,0 +1,109 @@
+import json
+import wave
+
+import numpy
+import pytest
+
+from py_speech_service.model_manager import ModelManager
+
+try:
+    from py_speech_service import speech_recognition
+    from py_speech_service.file_recognition import FileRecognition
+except (ImportError, OSError) as e:
+    # VOSK and the audio libraries need native libraries that aren't available everywhere
+    pytest.skip("Speech recognition dependencies unavailable: " + str(e), allow_module_level=True)
+
+from test_grammar_parser import rule, string_element
+
+
+class PhraseRecognizer:
+    # Hears the same phrase at the end of the audio, so tests don't need a VOSK model
+
+    def __init__(self, model, sample_rate: int, grammar: str):
+        pass
+
+    def SetWords(self, words: bool):
+        pass
+
+    def SetGrammar(self, grammar: str):
+        pass
+
+    def AcceptWaveform(self, data: bytes) -> bool:
+        return False
+
+    def PartialResult(self) -> str:
+        return json.dumps({"partial": ""})
+
+    def FinalResult(self) -> str:
+        return json.dumps({"text": "turn on the lights"})
+
+
+def create_file_recognition(monkeypatch, **settings) -> FileRecognition:
+    monkeypatch.setattr(speech_recognition, "KaldiRecognizer", PhraseRecognizer)
+    monkeypatch.setattr(ModelManager, "get_model", lambda self, model_path: None)
+    monkeypatch.setattr(ModelManager, "get_vosk_model_sample_rate", staticmethod(lambda model_path: 16000))
+    grammar_json = json.dumps({"Rules": [rule("lights", string_element("turn on the lights"))], "Replacements": {}})
+    return FileRecognition(grammar_json, "test-model", **settings)
+
+
+@pytest.fixture
+def file_recognition(monkeypatch) -> FileRecognition:
+    return create_file_recognition(monkeypatch)
+
+
+def write_wave_file(path: str, seconds: float = 1, tone_start: float = 0, tone_seconds: float = 0):
+    samples = numpy.zeros(int(16000 * seconds), dtype=numpy.int16)
+    tone = numpy.arange(int(16000 * tone_start), int(16000 * (tone_start + tone_seconds)))
+    samples[tone] = (numpy.sin(tone * 2 * numpy.pi * 440 / 16000) * 3000).astype(numpy.int16)
+    with wave.open(path, 'wb') as wave_file:
+        wave_file.setnchannels(1)
+        wave_file.setsampwidth(2)
+        wave_file.setframerate(16000)
+        wave_file.writeframes(samples.tobytes())
+
+
+def test_recognize_file(file_recognition, tmp_path):
+    path = str(tmp_path / "lights.wav")
+    write_wave_file(path)
+
+    result = file_recognition.recognize_file(path)
+
+    assert result["successful"]
+    assert [file_result["recognized_rule"] for file_result in result["results"]] == ["lights"]
+
+
+def test_a_file_that_fails_to_decode_is_not_successful(file_recognition, tmp_path):
+    # Cutting the last byte off leaves half a sample, which can't be read as 16 bit audio
+    path = str(tmp_path / "truncated.wav")
+    write_wave_file(path)
+    with open(path, 'r+b') as fp:
+        fp.truncate(fp.seek(0, 2) - 1)
+
+    result = file_recognition.recognize_file(path)
+
+    assert not result["successful"]
+    assert "error" in result
+
+
+@pytest.mark.parametrize("endpoint_silence", [0.3, 1.0])
+def test_endpoint_silence_finishes_the_utterance_without_voice_activity_detection(monkeypatch, tmp_path,
+                                                                                  endpoint_silence):
+    path = str(tmp_path / "speech.wav")
+    write_wave_file(path, seconds=3, tone_start=0.5, tone_seconds=0.5)
+    file_recognition = create_file_recognition(monkeypatch, endpoint_silence=endpoint_silence)
+
+    results = file_recognition.recognize_file(path)["results"]
+
+    assert results[0]["endpoint"] == "silence"
+    # Speech ends at 1 second, and audio is read a tenth of a second at a time
+    assert 1 + endpoint_silence <= results[0]["audio_position"] <= 1 + endpoint_silence + 0.2
+
+
+def test_without_endpoint_silence_or_voice_activity_detection_vosk_finishes_the_utterance(monkeypatch, tmp_path):
+    path = str(tmp_path / "speech.wav")
+    write_wave_file(path, seconds=3, tone_start=0.5, tone_seconds=0.5)
+    file_recognition = create_file_recognition(monkeypatch)
+
+    results = file_recognition.recognize_file(path)["results"]
+
+    assert [result["endpoint"] for result in results] == ["recognizer"]
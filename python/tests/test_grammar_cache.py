@@ -0,0 +1,34 @@
+from py_speech_service.grammar_cache import GrammarCache
+from test_grammar_parser import load_grammar, rule, string_element
+
+
+def test_cached_parsers_are_shared():
+    grammar_cache = GrammarCache()
+    grammar_parser = load_grammar([rule("lights", string_element("turn on the lights"))])
+    grammar_cache.add("ABC", None, grammar_parser)
+
+    assert grammar_cache.get("abc").grammar_parser is grammar_parser
+    assert grammar_cache.get_stats()["bytes"] >= grammar_parser.get_estimated_bytes()
+
+
+def test_least_recently_used_grammars_are_removed_over_the_size_limit():
+    grammar_parsers = [load_grammar([rule("rule " + str(index), string_element("say the phrase number " + str(index)))])
+                       for index in range(3)]
+    size_bytes = max(grammar_parser.get_estimated_bytes() for grammar_parser in grammar_parsers)
+    grammar_cache = GrammarCache(max_grammars=4, max_bytes=size_bytes * 2)
+    grammar_cache.add("0", None, grammar_parsers[0])
+    grammar_cache.add("1", None, grammar_parsers[1])
+    grammar_cache.get("0")
+    grammar_cache.add("2", None, grammar_parsers[2])
+
+    assert grammar_cache.contains("0")
+    assert not grammar_cache.contains("1")
+    assert grammar_cache.contains("2")
+    assert grammar_cache.get_stats()["bytes"] <= size_bytes * 2
+
+
+def test_a_grammar_larger_than_the_size_limit_is_still_kept():
+    grammar_cache = GrammarCache(max_bytes=1)
+    grammar_cache.add("0", "{}", load_grammar([rule("lights", string_element("turn on the lights"))]))
+
+    assert grammar_cache.contains("0")
@@ -0,0 +1,133 @@
+import json
+
+from py_speech_service.grammar_parser import GrammarParser
+
+
+def string_element(text: str) -> dict:
+    return {"Type": 1, "Key": None, "Data": text}
+
+
+def key_value_element(key: str, items: dict[str, str]) -> dict:
+    return {"Type": 4, "Key": key, "Data": [{"Key": item_key, "Value": value} for item_key, value in items.items()]}
+
+
+def optional_element(*texts: str) -> dict:
+    return {"Type": 3, "Key": None, "Data": list(texts)}
+
+
+def rule(key: str, *elements: dict) -> dict:
+    return {"Type": 0, "Key": key, "Data": list(elements)}
+
+
+def load_grammar(rules: list[dict], grammar_parser: GrammarParser = None) -> GrammarParser:
+    grammar_parser = grammar_parser if grammar_parser else GrammarParser()
+    grammar_parser.set_grammar_json(json.dumps({"Rules": rules, "Replacements": {}}))
+    return grammar_parser
+
+
+def test_duplicate_rule_keys_keep_every_rules_words():
+    grammar_parser = load_grammar([
+        rule("lights", string_element("turn on the lights")),
+        rule("lights", string_element("switch off the lamp"))
+    ])
+
+    assert {"turn", "on", "the", "lights", "switch", "off", "lamp"} <= set(grammar_parser.all_words)
+    assert grammar_parser.find_match("turn on the lights").rule == "lights"
+    assert grammar_parser.find_match("switch off the lamp").rule == "lights"
+
+
+def test_duplicate_rule_keys_compiled_in_parallel_keep_every_rules_words():
+    grammar_parser = GrammarParser()
+    grammar_parser.compile_workers = 2
+    grammar_parser.parallel_min_rules = 2
+    rules = [rule("lights", string_element("turn on the lights"))] + \
+            [rule("rule " + str(index), string_element("say the phrase number " + str(index))) for index in range(600)] + \
+            [rule("lights", string_element("switch off the lamp"))]
+    load_grammar(rules, grammar_parser)
+
+    assert {"lights", "switch", "lamp"} <= set(grammar_parser.all_words)
+    assert len(grammar_parser.rule_items["lights"]) == 2
+    assert grammar_parser.find_match("switch off the lamp").rule == "lights"
+
+
+def test_removing_a_duplicate_rule_key_removes_every_rule():
+    grammar_parser = load_grammar([
+        rule("lights", string_element("turn on the lights")),
+        rule("lights", string_element("switch off the lamp")),
+        rule("music", string_element("play some music"))
+    ])
+    grammar_parser.remove_rules(["lights"])
+
+    assert "lamp" not in grammar_parser.all_words
+    assert "lights" not in grammar_parser.all_words
+    assert grammar_parser.find_match("switch off the lamp") is None
+
+
+def test_match_is_incomplete_while_a_longer_item_could_follow():
+    grammar_parser = load_grammar([
+        rule("use", string_element("use the"), key_value_element("item", {"red": "RED", "red potion": "RED POTION"}))
+    ])
+
+    partial_match = grammar_parser.find_match("use the red")
+    assert partial_match.values == {"item": "RED"}
+    assert not partial_match.is_complete
+
+    full_match = grammar_parser.find_match("use the red potion")
+    assert full_match.values == {"item": "RED POTION"}
+    assert full_match.is_complete
+
+
+def test_match_is_incomplete_while_an_optional_ending_could_follow():
+    grammar_parser = load_grammar([
+        rule("drop", string_element("drop the"), key_value_element("item", {"sword": "SWORD", "shield": "SHIELD"}),
+             optional_element("right now"))
+    ])
+
+    assert not grammar_parser.find_partial_match("drop the sword").is_complete
+    assert grammar_parser.find_partial_match("drop the sword right now").is_complete
+
+
+def test_final_matching_still_skips_an_optional_ending_that_only_ties():
+    grammar_parser = load_grammar([
+        rule("drop", string_element("drop the"), key_value_element("item", {"sword": "SWORD", "shield": "SHIELD"}),
+             optional_element("right now"))
+    ])
+
+    assert grammar_parser.find_match("drop the sword").values == {"item": "SWORD"}
+    assert grammar_parser.find_match("drop the sword right now") is None
+
+
+def test_match_is_complete_when_nothing_could_follow():
+    grammar_parser = load_grammar([
+        rule("use", string_element("use the"), key_value_element("item", {"red potion": "RED POTION", "sword": "SWORD"}))
+    ])
+
+    match = grammar_parser.find_match("use the sword")
+    assert match.values == {"item": "SWORD"}
+    assert match.is_complete
+
+
+def test_rules_added_after_a_parallel_compile_share_its_slots():
+    grammar_parser = GrammarParser()
+    grammar_parser.compile_workers = 2
+    grammar_parser.parallel_min_rules = 2
+    items = {"sword": "SWORD", "shield": "SHIELD"}
+    load_grammar([rule("drop " + str(index), string_element("drop number " + str(index)), key_value_element("item", items))
+                  for index in range(600)], grammar_parser)
+    grammar_parser.add_rules([rule("take", string_element("take the"), key_value_element("item", items))])
+
+    slots = {id(item.grammar_element.slots[0]) for items in grammar_parser.rule_items.values() for item in items}
+    assert len(slots) == 1
+    assert len(grammar_parser.slot_pool) == 1
+
+
+def test_estimated_size_is_close_to_the_measured_size():
+    grammar_parser = load_grammar([
+        rule("use " + str(index), string_element("use the"),
+             key_value_element("item", {"item " + str(index) + " " + str(item): str(item) for item in range(20)}),
+             optional_element("now", "please"))
+        for index in range(200)
+    ])
+
+    measured_bytes = grammar_parser.get_memory_stats()["total_bytes"]
+    assert measured_bytes * 0.75 <= grammar_parser.get_estimated_bytes() <= measured_bytes * 1.5
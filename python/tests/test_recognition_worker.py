@@ -0,0 +1,52 @@
+import json
+import multiprocessing
+
+from py_speech_service import recognition_worker
+from py_speech_service.recognition_worker import RecognitionWorker
+from test_grammar_parser import rule, string_element
+
+
+class RecordedProcess:
+    # Records what a worker process would be started with, without starting one
+
+    started: list["RecordedProcess"] = []
+
+    def __init__(self, target, args, daemon):
+        self.args = args
+        self.pid = 0
+
+    def start(self):
+        RecordedProcess.started.append(self)
+
+    def is_alive(self) -> bool:
+        return False
+
+
+def start_process(monkeypatch, worker: RecognitionWorker) -> RecordedProcess:
+    context = multiprocessing.get_context("spawn")
+    monkeypatch.setattr(context, "Process", RecordedProcess)
+    monkeypatch.setattr(recognition_worker.multiprocessing, "get_context", lambda method: context)
+    worker._RecognitionWorker__start_process()
+    return RecordedProcess.started[-1]
+
+
+def create_worker() -> RecognitionWorker:
+    worker = RecognitionWorker("session")
+    grammar_json = json.dumps({"Rules": [rule("lights", string_element("turn on the lights"))], "Replacements": {}})
+    assert worker.set_speech_recognition_details(None, "", grammar_data=grammar_json.encode("utf-8"))
+    return worker
+
+
+def test_speaking_before_the_worker_starts_is_passed_to_it(monkeypatch):
+    worker = create_worker()
+    worker.set_speaking(True)
+
+    assert start_process(monkeypatch, worker).args[2] is True
+
+
+def test_speaking_is_passed_to_a_restarted_worker(monkeypatch):
+    worker = create_worker()
+    assert start_process(monkeypatch, worker).args[2] is False
+    worker.set_speaking(True)
+
+    assert start_process(monkeypatch, worker).args[2] is True
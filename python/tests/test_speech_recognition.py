@@ -0,0 +1,100 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from py_speech_service.endpointing import Endpointer
+
+try:
+    from py_speech_service import wake_prefix
+    from py_speech_service.speech_recognition import SpeechRecognition
+except (ImportError, OSError) as e:
+    # VOSK and the audio libraries need native libraries that aren't available everywhere
+    pytest.skip("Speech recognition dependencies unavailable: " + str(e), allow_module_level=True)
+from test_grammar_parser import load_grammar, rule, string_element, key_value_element, optional_element
+
+
+def create_speech_recognition(rules: list[dict]) -> SpeechRecognition:
+    speech_recognition = SpeechRecognition()
+    speech_recognition.grammar_parser = load_grammar(rules)
+    speech_recognition.grammar_endpoint = True
+    speech_recognition.endpointer = Endpointer(16000, grammar_endpoint=True)
+    return speech_recognition
+
+
+def test_grammar_endpoint_waits_while_an_item_could_be_extended():
+    speech_recognition = create_speech_recognition([
+        rule("use", string_element("use the"), key_value_element("item", {"red": "RED", "red potion": "RED POTION"}))
+    ])
+
+    asyncio.run(speech_recognition.process_partial_speech("use the red", 0))
+    assert speech_recognition.endpointer.add_audio(1600) is None
+
+    asyncio.run(speech_recognition.process_partial_speech("use the red potion", 0))
+    assert speech_recognition.endpointer.add_audio(1600) == "grammar"
+
+
+def test_grammar_endpoint_waits_while_an_optional_ending_could_follow():
+    speech_recognition = create_speech_recognition([
+        rule("drop", string_element("drop the"), key_value_element("item", {"sword": "SWORD", "shield": "SHIELD"}),
+             optional_element("right now"))
+    ])
+
+    asyncio.run(speech_recognition.process_partial_speech("drop the sword", 0))
+    assert speech_recognition.endpointer.add_audio(1600) is None
+
+    asyncio.run(speech_recognition.process_partial_speech("drop the sword right now", 0))
+    assert speech_recognition.endpointer.add_audio(1600) == "grammar"
+
+
+def test_grammar_updates_do_not_change_the_cached_grammar_other_sessions_use():
+    grammar_json = json.dumps({"Rules": [rule("lights", string_element("turn on the lights")),
+                                         rule("music", string_element("play some music"))], "Replacements": {}})
+    first_session = SpeechRecognition("first")
+    second_session = SpeechRecognition("second")
+    assert first_session.set_speech_recognition_details(None, "", grammar_json=grammar_json)
+    assert second_session.set_speech_recognition_details(None, "", grammar_json=grammar_json)
+    assert first_session.grammar_parser is second_session.grammar_parser
+
+    assert first_session.update_grammar(disable_rules=["music"])
+
+    assert first_session.grammar_parser.find_match("play some music") is None
+    assert second_session.grammar_parser.find_match("play some music").rule == "music"
+
+
+def test_decoder_calls_run_on_the_shared_decode_pool():
+    speech_recognition = SpeechRecognition()
+
+    assert speech_recognition.run_decoder(lambda: threading.current_thread().name).startswith("vosk_decode")
+
+
+def test_wake_prefix_decoding_runs_through_the_decoder(monkeypatch):
+    class PrefixRecognizer:
+        def __init__(self, model, sample_rate: int, grammar: str):
+            pass
+
+        def SetGrammar(self, grammar: str):
+            pass
+
+        def Reset(self):
+            pass
+
+        def AcceptWaveform(self, data: bytes) -> bool:
+            return False
+
+        def PartialResult(self) -> str:
+            return json.dumps({"partial": ""})
+
+    decoded = []
+
+    def run_decoder(function, *args):
+        decoded.append(function.__name__)
+        return function(*args)
+
+    monkeypatch.setattr(wake_prefix, "KaldiRecognizer", PrefixRecognizer)
+    wake_prefix_gate = wake_prefix.WakePrefixGate(None, 16000, ["hey", "computer"], PrefixRecognizer(None, 16000, ""),
+                                                  run_decoder=run_decoder)
+    wake_prefix_gate.process(bytes(3200))
+
+    assert decoded == ["AcceptWaveform", "PartialResult"]
@@ -0,0 +1,68 @@
+import numpy
+
+from py_speech_service.voice_activity import VoiceActivityGate
+
+SAMPLE_RATE = 16000
+FRAME_SIZE = 160
+
+
+def create_frames(amplitude: int, frame_count: int, start: int = 0) -> numpy.ndarray:
+    # Each frame starts with its index so the forwarded frames can be identified
+    frames = numpy.full((frame_count, FRAME_SIZE), amplitude, dtype=numpy.int16)
+    frames[:, 0] = numpy.arange(start, start + frame_count)
+    return frames.reshape(-1)
+
+
+def get_frame_indexes(data: bytes) -> list[int]:
+    return numpy.frombuffer(data, dtype=numpy.int16).reshape(-1, FRAME_SIZE)[:, 0].tolist()
+
+
+def process_burst(voice_activity_gate: VoiceActivityGate) -> list:
+    # 50 quiet frames, 20 loud frames, then 100 quiet frames
+    samples = numpy.concatenate((create_frames(10, 50), create_frames(5000, 20, 50), create_frames(10, 100, 70)))
+    return voice_activity_gate.process(samples.tobytes())
+
+
+def test_speech_is_forwarded_with_pre_roll_and_hangover():
+    voice_activity_gate = VoiceActivityGate(SAMPLE_RATE, pre_roll_seconds=0.1, hangover_seconds=0.2)
+
+    output = process_burst(voice_activity_gate)
+
+    assert len(output) == 2
+    assert output[1] is None
+    # 10 frames of pre-roll, the 20 loud frames and 20 frames of hangover
+    assert get_frame_indexes(output[0]) == list(range(40, 90))
+    assert voice_activity_gate.get_stats()["speech_segments"] == 1
+    assert voice_activity_gate.get_stats()["forwarded_seconds"] == 0.5
+
+
+def test_silence_is_not_forwarded():
+    voice_activity_gate = VoiceActivityGate(SAMPLE_RATE)
+
+    assert voice_activity_gate.process(create_frames(10, 100).tobytes()) == []
+    assert voice_activity_gate.get_stats()["skipped_ratio"] == 1
+
+
+def test_partial_frames_are_kept_for_the_next_chunk():
+    voice_activity_gate = VoiceActivityGate(SAMPLE_RATE, pre_roll_seconds=0.1, hangover_seconds=0.2)
+    data = numpy.concatenate((create_frames(10, 50), create_frames(5000, 20, 50), create_frames(10, 100, 70))).tobytes()
+
+    output = []
+    for start in range(0, len(data), 250):
+        output.extend(voice_activity_gate.process(data[start:start + 250]))
+
+    forwarded = b"".join(chunk for chunk in output if chunk is not None)
+    assert get_frame_indexes(forwarded) == list(range(40, 90))
+    assert output.count(None) == 1
+
+
+def test_forwarding_silence_still_marks_the_end_of_speech():
+    voice_activity_gate = VoiceActivityGate(SAMPLE_RATE, pre_roll_seconds=0.1, hangover_seconds=0.2,
+                                            forward_silence=True)
+
+    output = process_burst(voice_activity_gate)
+
+    assert output[1] is None
+    assert get_frame_indexes(output[0]) + get_frame_indexes(output[2]) == list(range(170))
+    assert get_frame_indexes(output[0])[-1] == 89
+    assert voice_activity_gate.get_seconds_since_speech() == 1